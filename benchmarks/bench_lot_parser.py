@@ -0,0 +1,148 @@
+"""
+Benchmark of lot description parsing: guitar_auctions_v1.parse_lot_data vs
+lot_parser.parse_lot_data, and parse_lot_data_batch into a LotBatch.
+
+guitar_auctions_v1 can't be imported without its LLM and Google dependencies and
+its parse_lot_data calls the LLM inline, so v1_parse_lot_data below is a copy of
+it with the LLM call removed.
+
+Usage (from repo root):
+    python -m benchmarks.bench_lot_parser [--records 20000]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from src.scraping.lot_parser import parse_lot_data, parse_lot_data_batch
+
+GUITARS = [
+    "Fender Stratocaster electric guitar, made in USA",
+    "Gibson Les Paul Standard electric guitar, made in USA",
+    "Lowden F22 acoustic guitar, made in Ireland",
+    "Heritage H-575 hollow body electric guitar, made in USA",
+    "Gibson EB-5 five string bass guitar, made in USA",
+    "Martin D-28 acoustic guitar",
+]
+SPECS = [
+    "Body: three tone sunburst finished alder, refinished at some point",
+    "Neck: maple, clay dot inlays",
+    "Fretboard: rosewood",
+    "Frets: refretted",
+    "Electrics: working, pots dated 1965",
+    "Hardware: some tarnishing to the bridge saddles, tuners replaced",
+    "Case: original tolex hard case",
+    "Weight: 3.45kg",
+    "Overall condition: good, with wear commensurate with age",
+    "Serial no. 123456",
+]
+
+
+def v1_parse_lot_data(lot_data):
+    # Initialize a dictionary for results.
+    result = {}
+
+    estimate = lot_data["estimate"]
+    match = re.search(r"£(\d+)-(\d+)", estimate)
+    if match:
+        estimate_low = int(match.group(1))   # 3500
+        result["estimate_low"] = estimate_low
+        estimate_high = int(match.group(2))  # 5000
+        result["estimate_high"] = estimate_high
+
+    description = lot_data["description"]
+    result["full_description"] = description
+
+    body, *notes = description.split("*")
+
+    if notes:
+        result["notes"] = [note.strip() for note in notes if note.strip()]
+
+    # Split the description on semicolons.
+    parts = [part.strip() for part in body.split(";") if part.strip()]
+
+    # The first part is the main description.
+    if parts:
+        summary = parts[0]
+        match = re.match(r"^(?P<year>\d{4})\s+(?P<title>.+)$", summary)
+        if match:
+            result["year"] = match.group("year")
+            result["title"] = match.group("title")
+        else:
+            result["title"] = summary
+
+        # Look for a "made in" phrase in the summary.
+        made_in_match = re.search(r"made in\s+([^,;]+)", summary, re.IGNORECASE)
+        if made_in_match:
+            result["made_in"] = made_in_match.group(1).strip()
+
+    # Define the expected keys.
+    keys = ["body", "neck", "fretboard", "frets", "electrics", "hardware", "case", "weight", "overall condition"]
+
+    # Process each remaining part.
+    for part in parts[1:]:
+        # Look for the key: value pattern.
+        if ":" in part:
+            key, value = part.split(":", 1)
+            key = key.strip().lower()  # normalize key to lowercase
+            value = value.strip()
+            if key == "weight":
+                value = float(value.replace("kg", ""))
+            # Only save if the key is one of our expected keys.
+            if key in keys:
+                result[key] = value
+            else:
+                # If key not found in expected list, add to notes.
+                result.setdefault("notes", []).append(part)
+        else:
+            # If no colon, treat it as an additional note.
+            result.setdefault("notes", []).append(part)
+
+    return result
+
+
+def make_records(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        summary = f"{rng.randint(1955, 2020)} {rng.choice(GUITARS)}"
+        specs = rng.sample(SPECS, rng.randint(4, len(SPECS)))
+        notes = " * ".join(["Lot sold with original receipt"] * rng.randint(0, 2))
+        low = rng.choice([200, 500, 1200, 3500])
+        records.append({
+            "description": "; ".join([summary, *specs]) + (f" * {notes}" if notes else ""),
+            "estimate": f"Estimate: £{low}-{low * 3 // 2}",
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    assert all(v1_parse_lot_data(r) == parse_lot_data(r) for r in records[:1000])
+
+    def best_of_3(func):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    v1_seconds = best_of_3(lambda: [v1_parse_lot_data(record) for record in records])
+    seconds = best_of_3(lambda: [parse_lot_data(record) for record in records])
+    lot_records = [[f"/sale/249/lot/{number}", record] for number, record in enumerate(records)]
+    batch_seconds = best_of_3(lambda: parse_lot_data_batch(lot_records))
+
+    print(f"v1 parse_lot_data      {args.records / v1_seconds:10.0f} records/s")
+    print(f"parse_lot_data         {args.records / seconds:10.0f} records/s")
+    print(f"parse_lot_data_batch   {args.records / batch_seconds:10.0f} records/s (into a LotBatch)")
+    print(f"speedup: {v1_seconds / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
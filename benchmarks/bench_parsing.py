@@ -0,0 +1,78 @@
+"""
+Micro-benchmark of listing and lot page extraction on the saved fixture pages.
+
+Compares the original path (a BeautifulSoup tree built by fetch_page, then the
+document parsed again by get_lot_links and get_base_url) with the single-parse
+lxml path in src.scraping.parsing.
+
+Usage (from repo root):
+    python -m benchmarks.bench_parsing [--repeat 200]
+"""
+
+import argparse
+import timeit
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from src.scraping.parsing import (
+    _extract_lot_details_soup,
+    extract_base_href,
+    extract_lot_details,
+    extract_lot_links,
+    parse_tree,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BASE_URL = "https://www.guitar-auctions.co.uk"
+
+
+def original_listing(html):
+    # fetch_page parse, then get_lot_links and get_base_url each parse again
+    BeautifulSoup(html, "lxml")
+    lot_links = extract_lot_links(BeautifulSoup(html, "lxml"), BASE_URL)
+    base_href = extract_base_href(BeautifulSoup(html, "lxml"))
+    return lot_links, base_href
+
+
+def fast_listing(html):
+    tree = parse_tree(html)
+    return extract_lot_links(tree, BASE_URL), extract_base_href(tree)
+
+
+def original_lot(html):
+    return _extract_lot_details_soup(BeautifulSoup(html, "lxml"))
+
+
+def fast_lot(html):
+    return extract_lot_details(html)
+
+
+def bench(name, func, html, repeat):
+    seconds = min(timeit.repeat(lambda: func(html), number=repeat, repeat=3)) / repeat
+    print(f"{name:<20} {seconds * 1000:8.3f} ms/page  {1 / seconds:8.0f} pages/s")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    listing_html = (FIXTURES / "sale_listing.html").read_text(encoding="utf-8")
+    lot_html = (FIXTURES / "lot_detail.html").read_text(encoding="utf-8")
+
+    assert original_listing(listing_html) == fast_listing(listing_html)
+    assert original_lot(lot_html) == fast_lot(lot_html)
+
+    for page, original, fast, html in [
+        ("listing", original_listing, fast_listing, listing_html),
+        ("lot", original_lot, fast_lot, lot_html),
+    ]:
+        slow = bench(f"{page} original", original, html, args.repeat)
+        quick = bench(f"{page} fast", fast, html, args.repeat)
+        print(f"{page} speedup: {slow / quick:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
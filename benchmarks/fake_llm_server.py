@@ -0,0 +1,117 @@
+"""
+Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+Answers title-parsing prompts with brand/model/type JSON and anything else with
+a valuation, after a configurable latency. A fraction of requests can be
+answered with 429 (with Retry-After) or 503 to exercise retries, or with
+content that isn't a JSON object to exercise response validation.
+
+Usage (from repo root):
+    python -m benchmarks.fake_llm_server --port 8900 --latency 0.5 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 ...
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+
+from aiohttp import web
+
+_TITLE = re.compile(r'following title:\s*"(?P<title>[^"]*)"')
+
+
+def _answer(prompt: str) -> dict:
+    title = _TITLE.search(prompt)
+    if title:
+        words = title.group("title").split()
+        guitar_type = next(
+            (t for t in ["hollow body electric", "electric", "acoustic", "bass"]
+             if t in title.group("title").lower()),
+            "other",
+        )
+        return {
+            "brand": words[0] if words else "",
+            "model": " ".join(words[1:3]),
+            "type": guitar_type,
+        }
+    return {
+        "value_estimate_low": 1000,
+        "value_estimate_high": 1500,
+        "rationale": "Stand-in valuation.",
+    }
+
+
+def make_app(
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        malformed_rate: float = 0.0,
+    ) -> web.Application:
+    """Builds the stand-in app. Counters are kept in app["stats"]."""
+    app = web.Application()
+    app["stats"] = {"requests": 0, "throttled": 0, "errors": 0, "malformed": 0}
+
+    async def chat_completions(request):
+        stats = request.app["stats"]
+        stats["requests"] += 1
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+        roll = random.random()
+        if roll < throttle_rate:
+            stats["throttled"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached"}},
+                status=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+        if roll < throttle_rate + error_rate:
+            stats["errors"] += 1
+            return web.json_response({"error": {"message": "Overloaded"}}, status=503)
+        prompt = body["messages"][-1]["content"]
+        if roll < throttle_rate + error_rate + malformed_rate:
+            stats["malformed"] += 1
+            content = json.dumps(list(_answer(prompt).values()))
+        else:
+            content = json.dumps(_answer(prompt))
+        return web.json_response({
+            "id": "chatcmpl-local",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        })
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(
+        make_app(args.latency, args.error_rate, args.throttle_rate, malformed_rate=args.malformed_rate),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local stand-in for guitar-auctions.co.uk built from the recorded fixture pages.
+
+Serves one sale with a configurable number of listing pages (48 lots each,
+with pagination links), a lot page for every lot and the photos in its
+gallery (random bytes of a given size, the last photo of every lot being the
+same stock image). Responses can be delayed, and a fraction answered with 503
+or with 429 and Retry-After.
+
+Usage (from repo root):
+    python -m benchmarks.fake_site --port 8901 --pages 10 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import re
+from pathlib import Path
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SALE_PATH = "/sale/249/the-guitar-auction-(december)---day-one"
+LOTS_PER_PAGE = 48
+
+_LOT_HREF = re.compile(re.escape(SALE_PATH) + r"/(\d+)-")
+_PAGINATION = re.compile(r'<ul class="pagination.*?</ul>', re.DOTALL)
+_LOT_NUMBER = re.compile(r"Lot 112")
+_ESTIMATE = re.compile(r"&pound;3500-5000")
+_IMAGE_SRC = re.compile(r"/images/lots/249/112_")
+STOCK_IMAGE = 12
+
+
+def listing_page(template: str, page: int, pages: int) -> str:
+    """Renders listing page number page, empty past the last page."""
+    if page > pages:
+        return _PAGINATION.sub("", template.split('<div class="grid-x grid-padding-x small-up-1')[0])
+    first_lot = 100 + (page - 1) * LOTS_PER_PAGE
+    # Each cell links to its lot twice (image and button)
+    links_seen = itertools.count()
+    html = _LOT_HREF.sub(lambda m: f"{SALE_PATH}/{first_lot + next(links_seen) // 2}-", template)
+    links = "".join(
+        f'<li><a href="{SALE_PATH}?page={p}">{p}</a></li>'
+        for p in range(max(1, page - 2), min(pages, page + 2) + 1)
+    )
+    if pages > page + 2:
+        links += f'<li class="ellipsis"></li><li><a href="{SALE_PATH}?page={pages}">{pages}</a></li>'
+    return _PAGINATION.sub(f'<ul class="pagination text-center">{links}</ul>', html)
+
+
+def lot_page(template: str, lot: int) -> str:
+    low = 100 + (lot * 37) % 50 * 100
+    html = _LOT_NUMBER.sub(f"Lot {lot}", template)
+    html = _IMAGE_SRC.sub(f"/images/lots/249/{lot}_", html)
+    return _ESTIMATE.sub(f"&pound;{low}-{low * 3 // 2}", html)
+
+
+def image_body(name: str, size: int) -> bytes:
+    """Deterministic bytes for an image, the same for every lot's stock image."""
+    if name.endswith(f"_{STOCK_IMAGE}"):
+        name = "stock"
+    return random.Random(name).randbytes(size)
+
+
+def make_app(
+        pages: int = 5,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        image_size: int = 200_000,
+    ) -> web.Application:
+    """Builds the stand-in site. Request counters are kept in app["stats"] and served at /_stats."""
+    listing_template = (FIXTURES / "sale_listing.html").read_text(encoding="utf-8")
+    lot_template = (FIXTURES / "lot_detail.html").read_text(encoding="utf-8")
+    app = web.Application()
+    app["stats"] = {"requests": 0, "throttled": 0, "errors": 0}
+
+    async def respond(request, render, content_type="text/html"):
+        stats = request.app["stats"]
+        stats["requests"] += 1
+        if latency:
+            # Jitter around the mean so percentiles are meaningful
+            await asyncio.sleep(random.expovariate(1 / latency))
+        roll = random.random()
+        if roll < throttle_rate:
+            stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(retry_after)})
+        if roll < throttle_rate + error_rate:
+            stats["errors"] += 1
+            return web.Response(status=503)
+        body = render()
+        if isinstance(body, str):
+            return web.Response(text=body, content_type=content_type)
+        return web.Response(body=body, content_type=content_type)
+
+    async def listing(request):
+        page = int(request.query.get("page", 1))
+        return await respond(request, lambda: listing_page(listing_template, page, pages))
+
+    async def lot(request):
+        lot_number = int(request.match_info["lot"].split("-", 1)[0])
+        return await respond(request, lambda: lot_page(lot_template, lot_number))
+
+    async def image(request):
+        name = request.match_info["name"]
+        return await respond(request, lambda: image_body(name, image_size), "image/jpeg")
+
+    async def stats(request):
+        return web.json_response(request.app["stats"])
+
+    app.router.add_get("/_stats", stats)
+    app.router.add_get(SALE_PATH, listing)
+    app.router.add_get(SALE_PATH + "/{lot}", lot)
+    app.router.add_get("/images/lots/249/{name}.jpg", image)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--image-size", type=int, default=200_000, help="Bytes per photo")
+    args = parser.parse_args()
+    web.run_app(
+        make_app(args.pages, args.latency, args.error_rate, args.throttle_rate, args.retry_after, args.image_size),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+End-to-end crawl benchmark against the local stand-in site (benchmarks.fake_site).
+
+Starts the stand-in in a separate process, discovers the sale's lots with
+GuitarAuctionScraper.iter_sale_lot_links, then crawls them with scrape_lots at
+each --concurrency setting, with and without a ParsePool. A sequential
+BaseScraper.fetch_page baseline and a warm-cache pass are run as well.
+
+For each run it records lots/s, fetch latency p50/p99, parse time per page,
+PageCache stats, failed fetches, the stand-in's request counters and peak RSS.
+Results are written as JSON tagged with the current git commit, so runs can be
+compared between commits.
+
+Usage (from repo root):
+    python -m benchmarks.run_benchmarks [--pages 10] [--latency 0.05] [--concurrency 4 8 16]
+        [--error-rate 0.01] [--throttle-rate 0.01] [--output benchmarks/results/run.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+from aiohttp import web
+
+from benchmarks.fake_site import LOTS_PER_PAGE, SALE_PATH, make_app
+from src.scraping.base_scraper import BaseScraper
+from src.scraping.cache import PageCache
+from src.scraping.guitar_auctions_scraper import GuitarAuctionScraper
+from src.scraping.parse_pool import ParsePool
+from src.scraping.pipeline import scrape_lots
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _serve(port, pages, latency, error_rate, throttle_rate, retry_after):
+    web.run_app(
+        make_app(pages, latency, error_rate, throttle_rate, retry_after),
+        host="127.0.0.1",
+        port=port,
+        print=None,
+        handle_signals=False,
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_site(args) -> tuple[multiprocessing.Process, str]:
+    """Starts the stand-in site in a child process and waits until it accepts connections."""
+    port = _free_port()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(port, args.pages, args.latency, args.error_rate, args.throttle_rate, args.retry_after),
+        daemon=True,
+    )
+    process.start()
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline or not process.is_alive():
+                process.terminate()
+                raise RuntimeError("The stand-in site did not start")
+            time.sleep(0.05)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def site_stats(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/_stats") as response:
+        return json.load(response)
+
+
+def git_sha() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its finished children (e.g. parse workers)."""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+    }
+
+
+def summarize(timings: list[float]) -> dict:
+    """p50/p99/mean of a list of durations, in milliseconds."""
+    if not timings:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "mean_ms": None}
+    if len(timings) == 1:
+        p50 = p99 = timings[0]
+    else:
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        p50, p99 = percentiles[49], percentiles[98]
+    return {
+        "count": len(timings),
+        "p50_ms": p50 * 1000,
+        "p99_ms": p99 * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+    }
+
+
+def instrument(scraper: GuitarAuctionScraper, parse_pool: ParsePool | None = None) -> dict:
+    """
+    Wraps the scraper's fetch and parse methods (and parse_pool's) on the instance
+    to record durations. Returns the dict of timing lists they append to.
+    """
+    timings = {"fetch": [], "parse": [], "failed_fetches": 0}
+
+    # Measured as the pipeline sees it, so waiting for a per-host slot counts as latency
+    fetch_raw_async = scraper.fetch_raw_async
+    async def timed_fetch(*args, **kwargs):
+        start = time.perf_counter()
+        html_content = await fetch_raw_async(*args, **kwargs)
+        timings["fetch"].append(time.perf_counter() - start)
+        if html_content is None:
+            timings["failed_fetches"] += 1
+        return html_content
+    scraper.fetch_raw_async = timed_fetch
+
+    def timed(func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings["parse"].append(time.perf_counter() - start)
+            return result
+        return wrapper
+
+    if parse_pool is None:
+        # The in-process path parses twice: the BeautifulSoup tree, then the lot fields
+        parse_html, parse_lot_page = timed(scraper.parse_html), timed(scraper.parse_lot_page)
+        scraper.parse_html = parse_html
+        scraper.parse_lot_page = parse_lot_page
+    else:
+        parse_lot = parse_pool.parse_lot
+        async def timed_parse_lot(html_content):
+            start = time.perf_counter()
+            result = await parse_lot(html_content)
+            timings["parse"].append(time.perf_counter() - start)
+            return result
+        parse_pool.parse_lot = timed_parse_lot
+    return timings
+
+
+def _result(name, settings, lots, seconds, timings, scraper, site, site_before, cache_before=None) -> dict:
+    site_after = site_stats(site)
+    parse_seconds = sum(timings["parse"])
+    cache = scraper.cache.stats()
+    cache_before = cache_before or {}
+    lookups = sum(cache[key] - cache_before.get(key, 0) for key in ["hits", "misses"])
+    return {
+        "name": name,
+        **settings,
+        "lots": lots,
+        "seconds": seconds,
+        "lots_per_second": lots / seconds if seconds else None,
+        "fetch_latency": summarize(timings["fetch"]),
+        "failed_fetches": timings["failed_fetches"],
+        "parse_ms_per_page": parse_seconds * 1000 / lots if lots else None,
+        "cache": cache,
+        "cache_hit_rate": (cache["hits"] - cache_before.get("hits", 0)) / lookups if lookups else None,
+        "site_requests": {key: site_after[key] - site_before.get(key, 0) for key in site_after},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def bench_discovery(site: str, concurrency: int) -> tuple[list[str], dict]:
+    sale_url = site + SALE_PATH
+    async with GuitarAuctionScraper(site, max_concurrency_per_host=concurrency) as scraper:
+        timings = instrument(scraper)
+        site_before = site_stats(site)
+        start = time.perf_counter()
+        lot_urls = [url async for url in scraper.iter_sale_lot_links(sale_url)]
+        seconds = time.perf_counter() - start
+        result = _result(
+            "discovery",
+            {"concurrency": concurrency},
+            len(lot_urls),
+            seconds,
+            timings,
+            scraper,
+            site,
+            site_before,
+        )
+    # Per listing page rather than per lot
+    result["parse_ms_per_page"] = sum(timings["parse"]) * 1000 / max(1, len(timings["fetch"]))
+    return lot_urls, result
+
+
+async def bench_crawl(
+        site: str,
+        lot_urls: list[str],
+        concurrency: int,
+        parse_pool: ParsePool | None,
+        output_dir: str,
+    ) -> list[dict]:
+    """Cold crawl of lot_urls followed by a second, warm-cache pass on the same scraper."""
+    settings = {"concurrency": concurrency, "parse_pool": parse_pool is not None}
+    results = []
+    async with GuitarAuctionScraper(
+        site,
+        max_concurrency_per_host=concurrency,
+        cache=PageCache(max_entries=len(lot_urls) + 1),
+    ) as scraper:
+        for name in ["crawl", "crawl_cached"]:
+            timings = instrument(scraper, parse_pool)
+            site_before, cache_before = site_stats(site), scraper.cache.stats()
+            filename = os.path.join(output_dir, f"{name}_{concurrency}_{parse_pool is not None}.jsonl")
+            start = time.perf_counter()
+            lots = await scrape_lots(scraper, lot_urls, filename, resume=False, parse_pool=parse_pool)
+            seconds = time.perf_counter() - start
+            results.append(
+                _result(name, settings, lots, seconds, timings, scraper, site, site_before, cache_before)
+            )
+            # Unwrap before instrumenting again for the next pass
+            for attribute in ["fetch_raw_async", "parse_html", "parse_lot_page"]:
+                scraper.__dict__.pop(attribute, None)
+            if parse_pool is not None:
+                parse_pool.__dict__.pop("parse_lot", None)
+    return results
+
+
+def bench_sync_baseline(site: str, lot_urls: list[str]) -> dict:
+    """Sequential BaseScraper.fetch_page, the pre-async way of crawling."""
+    scraper = BaseScraper(site)
+    fetch_timings = []
+    failed = 0
+    site_before = site_stats(site)
+    start = time.perf_counter()
+    for lot_url in lot_urls:
+        fetch_start = time.perf_counter()
+        soup = scraper.fetch_page(lot_url, use_cached=False)
+        fetch_timings.append(time.perf_counter() - fetch_start)
+        if soup is None:
+            failed += 1
+    seconds = time.perf_counter() - start
+    scraper.close()
+    timings = {"fetch": fetch_timings, "parse": [], "failed_fetches": failed}
+    result = _result("sync_baseline", {"concurrency": 1}, len(lot_urls), seconds, timings, scraper, site, site_before)
+    # fetch_page parses as part of the fetch, so parse time isn't separated here
+    result["parse_ms_per_page"] = None
+    return result
+
+
+async def run(args, site: str) -> list[dict]:
+    results = []
+    lot_urls, discovery = await bench_discovery(site, max(args.concurrency))
+    results.append(discovery)
+    print(f"discovered {len(lot_urls)} lots in {discovery['seconds']:.2f}s")
+
+    with tempfile.TemporaryDirectory() as output_dir, ParsePool(args.workers) as parse_pool:
+        for concurrency in args.concurrency:
+            for pool in [None, parse_pool]:
+                for result in await bench_crawl(site, lot_urls, concurrency, pool, output_dir):
+                    results.append(result)
+                    print(
+                        f"{result['name']:<14} concurrency={concurrency:<3} parse_pool={pool is not None!s:<5} "
+                        f"{result['lots_per_second']:8.1f} lots/s  "
+                        f"fetch p50={result['fetch_latency']['p50_ms'] or 0:7.1f}ms "
+                        f"p99={result['fetch_latency']['p99_ms'] or 0:7.1f}ms  "
+                        f"parse={result['parse_ms_per_page'] or 0:6.2f}ms/page  "
+                        f"cache hits={result['cache_hit_rate'] or 0:.0%}  failed={result['failed_fetches']}"
+                    )
+
+    if args.baseline_lots:
+        baseline = bench_sync_baseline(site, lot_urls[:args.baseline_lots])
+        results.append(baseline)
+        print(f"{'sync_baseline':<14} {baseline['lots_per_second']:8.1f} lots/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=10, help=f"Listing pages, {LOTS_PER_PAGE} lots each")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16],
+                        help="max_concurrency_per_host settings to compare")
+    parser.add_argument("--workers", type=int, default=None, help="ParsePool workers")
+    parser.add_argument("--baseline-lots", type=int, default=50,
+                        help="Lots fetched by the sequential baseline, 0 to skip it")
+    parser.add_argument("--output", default=None,
+                        help="JSON results path, defaults to benchmarks/results/<time>-<commit>.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    process, site = start_site(args)
+    try:
+        results = asyncio.run(run(args, site))
+    finally:
+        process.terminate()
+        process.join()
+
+    sha = git_sha()
+    started = datetime.now(timezone.utc)
+    report = {
+        "git_sha": sha,
+        "timestamp": started.isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{started:%Y%m%dT%H%M%S}-{(sha or 'nogit')[:10]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
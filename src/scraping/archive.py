@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class ArchivedResponse:
+    """Metadata for one archived response. The body is stored separately by sha256."""
+    url: str
+    sha256: str
+    status: int
+    headers: dict
+    fetched_at: str
+
+
+class ResponseArchive():
+    """
+    Append-only, content-addressed archive of raw HTTP responses on local disk.
+
+    Layout under root:
+        index.jsonl          one ArchivedResponse per line, latest line per URL wins
+        objects/ab/abcd...gz gzip-compressed response bodies keyed by sha256
+
+    Identical bodies (e.g. a page refetched unchanged) are only stored once.
+
+    Example Usage:
+        archive = ResponseArchive("data/archive")
+        scraper = BaseScraper(base_url, archive=archive)               # live, records
+        scraper = BaseScraper(base_url, archive=archive, replay=True)  # offline
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._latest: dict[str, ArchivedResponse] = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        valid_bytes = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Truncated by a crash mid-write
+                    break
+                if line.strip():
+                    try:
+                        entry = ArchivedResponse(**json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                    self._latest[entry.url] = entry
+                valid_bytes += len(line.encode("utf-8"))
+        # Drop a truncated tail so new records start on a fresh line
+        with open(self.index_path, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / f"{sha256}.gz"
+
+    def store(
+            self,
+            url: str,
+            body: bytes,
+            status: int,
+            headers: dict,
+            fetched_at: str | None = None,
+        ) -> ArchivedResponse:
+        """Writes body (if not already present) and appends an index record for url."""
+        sha256 = hashlib.sha256(body).hexdigest()
+        path = self._object_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(body))
+            os.replace(tmp_path, path)
+        entry = ArchivedResponse(
+            url=url,
+            sha256=sha256,
+            status=status,
+            headers=dict(headers),
+            fetched_at=fetched_at or datetime.now(timezone.utc).isoformat(),
+        )
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry.__dict__) + "\n")
+        self._latest[url] = entry
+        return entry
+
+    def latest(self, url: str) -> ArchivedResponse | None:
+        """Returns the most recent archived response for url, if any."""
+        return self._latest.get(url)
+
+    def read_body(self, entry: ArchivedResponse) -> bytes:
+        """Returns the decompressed body of an archived response."""
+        with open(self._object_path(entry.sha256), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def conditional_headers(self, url: str) -> dict:
+        """Builds If-None-Match/If-Modified-Since headers from the last response for url."""
+        entry = self._latest.get(url)
+        if entry is None:
+            return {}
+        # Header names are case-insensitive, stored names keep the server's casing
+        stored = {name.lower(): value for name, value in entry.headers.items()}
+        headers = {}
+        if "etag" in stored:
+            headers["If-None-Match"] = stored["etag"]
+        if "last-modified" in stored:
+            headers["If-Modified-Since"] = stored["last-modified"]
+        return headers
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
@@ -1,28 +1,133 @@
+import asyncio
+import hashlib
 import logging
+import os
+import time
+from collections.abc import AsyncGenerator, Callable, Iterable
+from typing import Literal, overload
 
+import aiohttp
 import requests
 from urllib.parse import urljoin, urlparse
 
 from bs4 import BeautifulSoup
 
+from .archive import ResponseArchive
+from .cache import PageCache
+from .concurrency import (
+    RETRY_STATUSES,
+    THROTTLE_STATUSES,
+    AdaptiveLimiter,
+    backoff_delay,
+    retry_after_seconds,
+)
+from .frontier import TRACKING_PARAMS, canonicalize_url
+from .metrics import Metrics
+from .parsing import extract_base_href
+
 class BaseScraper():
     """Base class for web scrapers."""
 
-    def __init__(self, base_url):
+    # Query parameters dropped from URLs when canonicalizing them
+    DROP_QUERY_PARAMS: frozenset[str] = TRACKING_PARAMS
+    # Query parameters dropped when they have this value, e.g. {"page": "1"}
+    DEFAULT_QUERY_PARAMS: dict[str, str] = {}
+
+    def __init__(
+            self,
+            base_url,
+            max_concurrency_per_host: int = 8,
+            timeout: float = 30.0,
+            cache: PageCache | None = None,
+            archive: ResponseArchive | None = None,
+            replay: bool = False,
+            metrics: Metrics | None = None,
+            max_retries: int = 3,
+            backoff_base: float = 0.5,
+            backoff_max: float = 60.0,
+            adaptive_concurrency: bool = True,
+            min_concurrency_per_host: int = 1,
+            initial_concurrency_per_host: int | None = None,
+        ):
         self.base_url = base_url
-        self.cache = dict()
+        # Holds raw HTML only, pages are re-parsed on a cache hit
+        self.cache = cache if cache is not None else PageCache()
+        # Raw responses on disk; replay serves fetches from it without network access
+        if replay and archive is None:
+            raise ValueError("replay=True requires an archive")
+        self.archive = archive
+        self.replay = replay
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.timeout = timeout
+        # Transient failures (timeouts, connection errors, 429/5xx) are retried
+        # with jittered exponential backoff, or after Retry-After when given
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Async fetches to each host are limited by an AdaptiveLimiter that
+        # starts at initial_concurrency_per_host and moves between the min and
+        # max with the host's health, or stays at the max if not adaptive
+        self.adaptive_concurrency = adaptive_concurrency
+        self.min_concurrency_per_host = min_concurrency_per_host
+        if initial_concurrency_per_host is None:
+            initial_concurrency_per_host = max(min_concurrency_per_host, max_concurrency_per_host // 2)
+        self.initial_concurrency_per_host = initial_concurrency_per_host
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.add_callback(self._collect_cache_metrics)
+        self.metrics.add_callback(self._collect_limiter_metrics)
+        # Pooled keep-alive sessions, created lazily on first use
+        self._session = requests.Session()
+        self._async_session: aiohttp.ClientSession | None = None
+        self._host_limiters: dict[str, AdaptiveLimiter] = {}
 
     def parse_html(self, html_content) -> BeautifulSoup:
         """Parses HTML content and returns a BeautifulSoup object."""
-        return BeautifulSoup(html_content, "lxml")
+        with self.metrics.parse_seconds.time("html"):
+            return BeautifulSoup(html_content, "lxml")
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the fetch, parse, cache, pipeline and (if the LLM
+        client shares this scraper's Metrics) LLM metrics.
+
+        Example Usage:
+            snapshot = scraper.stats()
+            snapshot["fetch_seconds"]["host=www.guitar-auctions.co.uk,status=200"]["p99"]
+        """
+        return self.metrics.snapshot()
+
+    def _collect_cache_metrics(self, metrics: Metrics):
+        for name, value in self.cache.stats().items():
+            metrics.gauge(f"page_cache_{name}", f"PageCache {name.replace('_', ' ')}.").set(value)
+
+    def _collect_limiter_metrics(self, metrics: Metrics):
+        for host, limiter in self._host_limiters.items():
+            metrics.host_concurrency_limit.set(int(limiter.limit), host)
+
+    def _record_fetch(self, full_url, status, start, body=None):
+        host = urlparse(full_url).netloc
+        self.metrics.fetch_seconds.observe(time.perf_counter() - start, host, status)
+        if body is not None:
+            self.metrics.fetch_bytes.inc(len(body), host)
     
     def get_base_url(self, html_content) -> str | None:
-        """Extracts the base URL from the HTML content if a <base> tag is present."""
-        soup = self.parse_html(html_content)
-        base_tag = soup.find('base')
-        if base_tag and base_tag.get('href'):
-            return base_tag['href']
-        return None
+        """
+        Extracts the base URL from the HTML content if a <base> tag is present.
+
+        Accepts raw HTML or an already-parsed BeautifulSoup object.
+        """
+        return extract_base_href(html_content)
+
+    def _get_cached(self, full_url) -> bytes | None:
+        """Returns the cached raw HTML for full_url, if present."""
+        html_content = self.cache.get(full_url)
+        self.metrics.cache_lookups.inc(1, "miss" if html_content is None else "hit")
+        if html_content is not None:
+            logging.info(
+                "Using cached page from %s",
+                full_url
+            )
+        return html_content
 
     def fetch_page(
             self,
@@ -32,75 +137,490 @@ class BaseScraper():
             use_cached=True
         ) -> BeautifulSoup | None:
         """Fetches a webpage and returns its HTML content as a BeautifulSoup object."""
+        html_content = self.fetch_raw(url, base_url, cache_content, use_cached)
+        if html_content is None:
+            return None
+        return self.parse_html(html_content)
+
+    def fetch_raw(
+            self,
+            url,
+            base_url=None,
+            cache_content=True,
+            use_cached=True
+        ) -> bytes | None:
+        """Fetches a webpage and returns its raw HTML without parsing it."""
         if base_url is None:
             base_url = self.base_url
         full_url = urljoin(base_url, url)
-        if use_cached and self.cache.get(full_url):
-            logging.info(
-                "Using cached page from %s",
-                full_url
+        if use_cached:
+            html_content = self._get_cached(full_url)
+            if html_content is not None:
+                return html_content
+        if self.replay:
+            html_content = self._replay_raw(full_url)
+        else:
+            html_content = self._download(full_url)
+            if html_content is None:
+                return None
+        if html_content is not None and cache_content:
+            self.cache.set(full_url, html_content)
+        return html_content
+
+    def _download(self, full_url) -> bytes | None:
+        """GETs full_url with the requests session, retrying transient failures."""
+        host = urlparse(full_url).netloc
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self._session.get(
+                    full_url,
+                    headers=self._conditional_headers(full_url),
+                    timeout=self.timeout,
+                )
+                self._record_fetch(full_url, response.status_code, start, response.content)
+                if response.status_code in RETRY_STATUSES:
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    error = f"HTTP {response.status_code}"
+                else:
+                    response.raise_for_status()
+                    return self._record_response(
+                        full_url, response.status_code, response.headers, response.content
+                    )
+            except requests.RequestException as e:
+                if e.response is not None:
+                    # Non-retryable status, e.g. 404
+                    logging.warning("Error fetching %s: %s", full_url, e)
+                    return None
+                self._record_fetch(full_url, "error", start)
+                error = str(e) or type(e).__name__
+            if attempt == self.max_retries:
+                break
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+            self.metrics.fetch_retries.inc(1, host)
+            logging.info("Fetching %s failed (%s), retrying in %.1fs", full_url, error, delay)
+            time.sleep(delay)
+        logging.warning("Error fetching %s: giving up after %i attempts (%s)", full_url, self.max_retries + 1, error)
+        return None
+
+    def _conditional_headers(self, full_url) -> dict:
+        """Revalidation headers for full_url taken from the archive, if any."""
+        if self.archive is None:
+            return {}
+        return self.archive.conditional_headers(full_url)
+
+    def _record_response(self, full_url, status, headers, body) -> bytes | None:
+        """
+        Archives a live response and returns the page body.
+
+        A 304 Not Modified is resolved to the previously archived body, and
+        is neither archived nor returned if there is none.
+        """
+        if self.archive is None:
+            return body
+        previous = self.archive.latest(full_url)
+        if status == 304:
+            if previous is None:
+                logging.warning("Got 304 Not Modified for %s with no archived response", full_url)
+                return None
+            body = self.archive.read_body(previous)
+            updated = {name.lower() for name in headers}
+            headers = {
+                **{k: v for k, v in previous.headers.items() if k.lower() not in updated},
+                **headers,
+            }
+            status = previous.status
+        self.archive.store(full_url, body, status, headers)
+        return body
+
+    def _replay_raw(self, full_url) -> bytes | None:
+        """Serves full_url from the archive without touching the network."""
+        if self.archive is None:
+            return None
+        entry = self.archive.latest(full_url)
+        if entry is None:
+            logging.warning("No archived response for %s", full_url)
+            return None
+        return self.archive.read_body(entry)
+
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        """Returns the shared aiohttp session, creating it on first use."""
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_concurrency_per_host,
+                keepalive_timeout=30,
             )
-            return self.cache[full_url]
-        try:
-            response = requests.get(full_url)
-            response.raise_for_status()
-            parsed_html = self.parse_html(response.text)
-            if cache_content:
-                self.cache[full_url] = parsed_html
-            return parsed_html
-        except requests.RequestException as e:
-            print(f"Error fetching {url}: {e}")
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._host_limiters = {}
+        return self._async_session
+
+    def _host_limiter(self, url: str) -> AdaptiveLimiter:
+        """Returns the limiter for concurrent requests to the host of url."""
+        host = urlparse(url).netloc
+        if host not in self._host_limiters:
+            if self.adaptive_concurrency:
+                self._host_limiters[host] = AdaptiveLimiter(
+                    initial=self.initial_concurrency_per_host,
+                    min_limit=self.min_concurrency_per_host,
+                    max_limit=self.max_concurrency_per_host,
+                )
+            else:
+                self._host_limiters[host] = AdaptiveLimiter(
+                    initial=self.max_concurrency_per_host,
+                    min_limit=self.max_concurrency_per_host,
+                    max_limit=self.max_concurrency_per_host,
+                )
+        return self._host_limiters[host]
+
+    async def fetch_page_async(
+            self,
+            url,
+            base_url=None,
+            cache_content=True,
+            use_cached=True
+        ) -> BeautifulSoup | None:
+        """Async counterpart of fetch_page using the pooled aiohttp session."""
+        html_content = await self.fetch_raw_async(url, base_url, cache_content, use_cached)
+        if html_content is None:
             return None
+        return self.parse_html(html_content)
 
-    def extract_links(
+    async def fetch_raw_async(
             self,
-            soup: BeautifulSoup,
-            check_func: callable,
-            base_url: str | None = None,
-        ) -> list[str]:
+            url,
+            base_url=None,
+            cache_content=True,
+            use_cached=True
+        ) -> bytes | None:
+        """Async counterpart of fetch_raw using the pooled aiohttp session."""
+        if base_url is None:
+            base_url = self.base_url
+        full_url = urljoin(base_url, url)
+        if use_cached:
+            html_content = self._get_cached(full_url)
+            if html_content is not None:
+                return html_content
+        if self.replay:
+            html_content = self._replay_raw(full_url)
+        else:
+            html_content = await self._download_async(full_url)
+            if html_content is None:
+                return None
+        if html_content is not None and cache_content:
+            self.cache.set(full_url, html_content)
+        return html_content
+
+    async def _download_async(self, full_url) -> bytes | None:
         """
-        Extracts full URLs from <a> tags in a BeautifulSoup object where check_func(href) is True.
+        GETs full_url with the aiohttp session within the host's concurrency
+        limit, retrying transient failures and reporting each outcome to the limiter.
+        """
+        session = await self._get_async_session()
+        limiter = self._host_limiter(full_url)
+        host = urlparse(full_url).netloc
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            body = None
+            retry_after = None
+            try:
+                async with limiter:
+                    # Latency for the limiter excludes time spent waiting for a slot
+                    request_start = time.perf_counter()
+                    async with session.get(
+                        full_url,
+                        headers=self._conditional_headers(full_url),
+                    ) as response:
+                        body = await response.read()
+                        self._record_fetch(full_url, response.status, start, body)
+                        if response.status in RETRY_STATUSES:
+                            error = f"HTTP {response.status}"
+                            if response.status in THROTTLE_STATUSES:
+                                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                                limiter.on_throttle(retry_after)
+                            else:
+                                limiter.on_error()
+                        else:
+                            latency = time.perf_counter() - request_start
+                            # Error statuses, e.g. 404, shouldn't grow the limit
+                            response.raise_for_status()
+                            limiter.on_success(latency)
+                            return self._record_response(
+                                full_url, response.status, dict(response.headers), body
+                            )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if body is not None or isinstance(e, aiohttp.ClientResponseError):
+                    # Non-retryable status, e.g. 404
+                    if body is None:
+                        self._record_fetch(full_url, "error", start)
+                    logging.warning("Error fetching %s: %s", full_url, e)
+                    return None
+                self._record_fetch(full_url, "error", start)
+                limiter.on_error()
+                error = str(e) or type(e).__name__
+            if attempt == self.max_retries:
+                break
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+            self.metrics.fetch_retries.inc(1, host)
+            logging.info("Fetching %s failed (%s), retrying in %.1fs", full_url, error, delay)
+            await asyncio.sleep(delay)
+        logging.warning("Error fetching %s: giving up after %i attempts (%s)", full_url, self.max_retries + 1, error)
+        return None
 
-        Args:
-            soup: BeautifulSoup object of the HTML.
-            base_url: Base URL string.
-            check_func: Callable that takes href (str) and returns bool.
+    async def download_async(
+            self,
+            url,
+            path: str | os.PathLike,
+            base_url=None,
+            chunk_size: int = 64 * 1024,
+        ) -> tuple[dict, str, int] | None:
+        """
+        Streams the body of url into the file at path in chunks, so large files
+        are never held in memory.
+
+        Uses the pooled aiohttp session, host concurrency limits and retries of
+        fetch_raw_async, but neither the page cache nor the archive. The file is
+        rewritten on every attempt and may be left incomplete if all of them
+        fail, for the caller to remove.
 
         Returns:
-            List of full URLs.
+            (response headers, sha256 hex digest of the body, body size in bytes),
+            or None if the download failed.
+        """
+        if base_url is None:
+            base_url = self.base_url
+        full_url = urljoin(base_url, url)
+        if self.replay:
+            logging.warning("Not downloading %s while replaying", full_url)
+            return None
+        session = await self._get_async_session()
+        limiter = self._host_limiter(full_url)
+        host = urlparse(full_url).netloc
+        # The session's total timeout would cap the size of what can be streamed
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                async with limiter:
+                    request_start = time.perf_counter()
+                    async with session.get(full_url, timeout=timeout) as response:
+                        if response.status in RETRY_STATUSES:
+                            self._record_fetch(full_url, response.status, start)
+                            error = f"HTTP {response.status}"
+                            if response.status in THROTTLE_STATUSES:
+                                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                                limiter.on_throttle(retry_after)
+                            else:
+                                limiter.on_error()
+                        else:
+                            # Time to the response headers, so big files don't read as a slow host
+                            latency = time.perf_counter() - request_start
+                            response.raise_for_status()
+                            limiter.on_success(latency)
+                            digest = hashlib.sha256()
+                            size = 0
+                            with open(path, "wb") as f:
+                                async for chunk in response.content.iter_chunked(chunk_size):
+                                    digest.update(chunk)
+                                    f.write(chunk)
+                                    size += len(chunk)
+                            self._record_fetch(full_url, response.status, start)
+                            self.metrics.fetch_bytes.inc(size, host)
+                            return dict(response.headers), digest.hexdigest(), size
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, aiohttp.ClientResponseError):
+                    # Non-retryable status, e.g. 404
+                    self._record_fetch(full_url, e.status, start)
+                    logging.warning("Error downloading %s: %s", full_url, e)
+                    return None
+                self._record_fetch(full_url, "error", start)
+                limiter.on_error()
+                error = str(e) or type(e).__name__
+            if attempt == self.max_retries:
+                break
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+            self.metrics.fetch_retries.inc(1, host)
+            logging.info("Downloading %s failed (%s), retrying in %.1fs", full_url, error, delay)
+            await asyncio.sleep(delay)
+        logging.warning("Error downloading %s: giving up after %i attempts (%s)", full_url, self.max_retries + 1, error)
+        return None
+
+    @overload
+    def fetch_many(
+            self,
+            urls: Iterable[str],
+            base_url=None,
+            cache_content=True,
+            use_cached=True,
+            max_in_flight: int | None = None,
+            raw: Literal[False] = False,
+        ) -> AsyncGenerator[tuple[str, BeautifulSoup | None], None]: ...
+
+    @overload
+    def fetch_many(
+            self,
+            urls: Iterable[str],
+            base_url=None,
+            cache_content=True,
+            use_cached=True,
+            max_in_flight: int | None = None,
+            *,
+            raw: Literal[True],
+        ) -> AsyncGenerator[tuple[str, bytes | None], None]: ...
+
+    @overload
+    def fetch_many(
+            self,
+            urls: Iterable[str],
+            base_url=None,
+            cache_content=True,
+            use_cached=True,
+            max_in_flight: int | None = None,
+            raw: bool = False,
+        ) -> AsyncGenerator[tuple[str, BeautifulSoup | bytes | None], None]: ...
+
+    async def fetch_many(
+            self,
+            urls: Iterable[str],
+            base_url=None,
+            cache_content=True,
+            use_cached=True,
+            max_in_flight: int | None = None,
+            raw: bool = False,
+        ) -> AsyncGenerator[tuple[str, BeautifulSoup | bytes | None], None]:
+        """
+        Fetches many pages concurrently and yields them as they complete.
+
+        Concurrency per host is bounded by max_concurrency_per_host. Pages are
+        yielded in completion order, not input order. urls is consumed lazily and
+        at most max_in_flight pages are fetched or waiting to be consumed at once,
+        so a slow consumer doesn't cause every page to be held in memory.
+
+        Args:
+            urls: URLs (absolute or relative to base_url) to fetch.
+            base_url: Base URL string, defaults to self.base_url.
+            max_in_flight: Defaults to 4 * max_concurrency_per_host.
+            raw: Yield raw HTML bytes instead of parsed pages, e.g. to parse them elsewhere.
+
+        Yields:
+            (url, soup) tuples, where soup is None if the fetch failed.
 
         Example Usage:
-            check_func = lambda href: href.startswith("match_pattern")
-            links = extract_links(soup, base_url, check_func)
+            async with scraper:
+                async for url, soup in scraper.fetch_many(lot_urls):
+                    ...
+        """
+        if max_in_flight is None:
+            max_in_flight = 4 * self.max_concurrency_per_host
+
+        fetch = self.fetch_raw_async if raw else self.fetch_page_async
+
+        async def fetch_one(url):
+            return url, await fetch(url, base_url, cache_content, use_cached)
 
+        in_flight = self.metrics.stage_in_flight
+        remaining = iter(urls)
+        pending = set()
+        try:
+            while True:
+                for url in remaining:
+                    pending.add(asyncio.ensure_future(fetch_one(url)))
+                    if len(pending) >= max_in_flight:
+                        break
+                in_flight.set(len(pending), "fetch")
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            # Don't leave requests running if the consumer stops early
+            for task in pending:
+                task.cancel()
+            in_flight.set(0, "fetch")
+
+    async def aclose(self):
+        """Closes the pooled aiohttp session."""
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+
+    def close(self):
+        """Closes the pooled requests session."""
+        self._session.close()
+
+    async def __aenter__(self):
+        await self._get_async_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def extract_image_links(
+            self,
+            soup: BeautifulSoup,
+            check_func: Callable[[str], bool] | None = None,
+            base_url: str | None = None,
+        ) -> list[str]:
+        """
+        Extracts full URLs from the src of <img> tags in a BeautifulSoup object,
+        in page order without repeats, where check_func(src) is True if given.
+
+        Example Usage:
+            check_func = lambda src: "/images/lots/" in src
+            image_urls = scraper.extract_image_links(soup, check_func)
         """
         if base_url is None:
             base_url = self.base_url
-        links = []
-        for a in soup.find_all('a', href=True):
-            if check_func(a['href']):
-                full_url = urljoin(base_url, a['href'])
-                links.append(full_url)
-        return links
+        links: dict[str, None] = {}
+        for img in soup.find_all("img", src=True):
+            src = str(img["src"])
+            if check_func is None or check_func(src):
+                links.setdefault(urljoin(base_url, src), None)
+        return list(links)
+
+    def canonicalize_url(self, url: str, base_url: str | None = None) -> str:
         """
-        Extracts full URLs from <a> tags in soup where check_func(href) is True.
-        
+        Returns the canonical form of url (resolved against base_url, default
+        self.base_url), so variants of the same page compare equal.
+        """
+        if base_url is None:
+            base_url = self.base_url
+        return canonicalize_url(url, base_url, self.DROP_QUERY_PARAMS, self.DEFAULT_QUERY_PARAMS)
+
+    def extract_links(
+            self,
+            soup: BeautifulSoup,
+            check_func: Callable[[str], bool],
+            base_url: str | None = None,
+        ) -> list[str]:
+        """
+        Extracts canonical full URLs from <a> tags in a BeautifulSoup object where
+        check_func(href) is True, in page order without repeats.
+
         Args:
             soup: BeautifulSoup object of the HTML.
-            base_url: Base URL string.
             check_func: Callable that takes href (str) and returns bool.
-        
+            base_url: Base URL string.
+
         Returns:
             List of full URLs.
-        
+
         Example Usage:
             check_func = lambda href: href.startswith("match_pattern")
-            links = extract_links(soup, base_url, check_func)
-
+            links = scraper.extract_links(soup, check_func)
         """
-        links = []
+        if base_url is None:
+            base_url = self.base_url
+        links: dict[str, None] = {}
         for a in soup.find_all('a', href=True):
-            if check_func(a['href']):
-                full_url = urljoin(base_url, a['href'])
-                links.append(full_url)
-        return links
\ No newline at end of file
+            href = str(a['href'])
+            if check_func(href):
+                links.setdefault(self.canonicalize_url(href, base_url), None)
+        return list(links)
@@ -0,0 +1,240 @@
+"""
+Scraping of JavaScript-rendered pages (bid history, lazy-loaded galleries)
+with Playwright.
+
+One browser is launched per scraper and a fixed pool of warm browser contexts,
+each with one open page, is reused across URLs. Images, media, fonts and
+analytics requests are aborted before they leave the browser, so a render
+costs little more than the HTML and scripts it needs.
+"""
+
+import asyncio
+import logging
+import time
+from urllib.parse import urljoin, urlparse
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, Route, async_playwright
+from playwright.async_api import Error as PlaywrightError
+
+from .base_scraper import BaseScraper
+
+BLOCKED_RESOURCE_TYPES = frozenset(["image", "media", "font"])
+
+# Requests to these hosts (and their subdomains) are aborted
+BLOCKED_HOSTS = frozenset([
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com",
+    "doubleclick.net", "facebook.net", "facebook.com", "hotjar.com", "clarity.ms",
+    "scorecardresearch.com", "adservice.google.com",
+])
+
+
+def _is_blocked_host(host: str | None, blocked_hosts: frozenset[str]) -> bool:
+    while host:
+        if host in blocked_hosts:
+            return True
+        _, _, host = host.partition(".")
+    return False
+
+
+class _BrowserSlot():
+    """
+    A browser context with one open page, and how many URLs it has rendered.
+
+    A slot whose context was closed but couldn't be replaced stays in the pool
+    marked stale, and the next render replaces it first.
+    """
+
+    __slots__ = ("context", "page", "uses", "stale")
+
+    def __init__(self, context: BrowserContext, page: Page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.stale = False
+
+
+class BrowserScraper(BaseScraper):
+    """
+    Scraper that renders pages in a headless browser before parsing them.
+
+    fetch_page_async, fetch_raw_async and fetch_many return the rendered DOM with
+    the same interface as BaseScraper, so it can be combined with a site scraper
+    to run its extraction code on rendered pages. The sync fetch_page and
+    fetch_raw still make plain HTTP requests.
+
+    Concurrency is bounded by pool_size, the number of browser contexts. Each
+    context is replaced after max_uses renders, or after a failed one, so leaked
+    page state and memory don't accumulate.
+
+    Example Usage:
+        class BrowserGuitarAuctionScraper(BrowserScraper, GuitarAuctionScraper):
+            pass
+
+        async with BrowserGuitarAuctionScraper(pool_size=4) as scraper:
+            soup = await scraper.fetch_page_async(lot_url)
+            lot_data = scraper.parse_lot_page(soup)
+    """
+
+    def __init__(
+            self,
+            *args,
+            pool_size: int = 4,
+            browser_type: str = "chromium",
+            headless: bool = True,
+            wait_until: str = "load",
+            wait_for_selector: str | None = None,
+            max_uses: int = 200,
+            block_resource_types: frozenset[str] = BLOCKED_RESOURCE_TYPES,
+            blocked_hosts: frozenset[str] = BLOCKED_HOSTS,
+            **kwargs,
+        ):
+        super().__init__(*args, **kwargs)
+        self.pool_size = pool_size
+        self.browser_type = browser_type
+        self.headless = headless
+        self.wait_until = wait_until
+        self.wait_for_selector = wait_for_selector
+        self.max_uses = max_uses
+        self.block_resource_types = frozenset(block_resource_types)
+        self.blocked_hosts = frozenset(blocked_hosts)
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._slots: asyncio.Queue[_BrowserSlot] | None = None
+        self._start_lock = asyncio.Lock()
+        self.blocked_requests = 0
+
+    async def _route(self, route: Route):
+        request = route.request
+        if (
+            request.resource_type in self.block_resource_types
+            or _is_blocked_host(urlparse(request.url).hostname, self.blocked_hosts)
+        ):
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_slot(self) -> _BrowserSlot:
+        if self._browser is None:
+            raise RuntimeError("The browser isn't running")
+        context = await self._browser.new_context()
+        try:
+            await context.route("**/*", self._route)
+            return _BrowserSlot(context, await context.new_page())
+        except BaseException:
+            await context.close()
+            raise
+
+    async def _start_browser(self) -> asyncio.Queue:
+        """Launches the browser and opens the context pool on first use."""
+        async with self._start_lock:
+            if self._slots is None:
+                self._playwright = await async_playwright().start()
+                launcher = getattr(self._playwright, self.browser_type)
+                self._browser = await launcher.launch(headless=self.headless)
+                slots: asyncio.Queue[_BrowserSlot] = asyncio.Queue()
+                for slot in await asyncio.gather(*(self._new_slot() for _ in range(self.pool_size))):
+                    slots.put_nowait(slot)
+                self._slots = slots
+        return self._slots
+
+    async def _recycle(self, slot: _BrowserSlot) -> _BrowserSlot:
+        """
+        Closes slot's context and returns a slot with a new one, or slot itself
+        marked stale if the new context couldn't be created.
+        """
+        if not slot.stale:
+            slot.stale = True
+            try:
+                await slot.context.close()
+            except PlaywrightError as e:
+                logging.warning("Error closing browser context: %s", e)
+        try:
+            return await self._new_slot()
+        except Exception as e:
+            logging.warning("Error creating browser context: %s", e)
+            return slot
+
+    async def render(self, full_url: str) -> tuple[int, dict, bytes] | None:
+        """
+        Loads full_url in a pooled page and returns (status, headers, rendered HTML),
+        or None if navigation failed.
+        """
+        slots = await self._start_browser()
+        slot = await slots.get()
+        healthy = False
+        try:
+            if slot.stale:
+                slot = await self._recycle(slot)
+            response = await slot.page.goto(
+                full_url,
+                wait_until=self.wait_until,
+                timeout=self.timeout * 1000,
+            )
+            if self.wait_for_selector is not None:
+                await slot.page.wait_for_selector(self.wait_for_selector, timeout=self.timeout * 1000)
+            content = (await slot.page.content()).encode("utf-8")
+            slot.uses += 1
+            healthy = True
+        except PlaywrightError as e:
+            logging.warning("Error rendering %s: %s", full_url, e)
+            return None
+        finally:
+            # The pool must get a slot back even if replacing this one fails or is cancelled
+            try:
+                if not healthy or slot.uses >= self.max_uses:
+                    slot = await self._recycle(slot)
+            finally:
+                slots.put_nowait(slot)
+        if response is None:
+            # Same-document navigation, there is no new response to report
+            return 200, {}, content
+        return response.status, await response.all_headers(), content
+
+    async def fetch_raw_async(
+            self,
+            url,
+            base_url=None,
+            cache_content=True,
+            use_cached=True
+        ) -> bytes | None:
+        """Renders a webpage in the browser and returns the resulting HTML."""
+        if base_url is None:
+            base_url = self.base_url
+        full_url = urljoin(base_url, url)
+        if use_cached:
+            html_content = self._get_cached(full_url)
+            if html_content is not None:
+                return html_content
+        if self.replay:
+            html_content = self._replay_raw(full_url)
+        else:
+            start = time.perf_counter()
+            rendered = await self.render(full_url)
+            if rendered is None:
+                self._record_fetch(full_url, "error", start)
+                return None
+            status, headers, body = rendered
+            self._record_fetch(full_url, status, start, body)
+            if status >= 400:
+                logging.warning("Error fetching %s: HTTP %i", url, status)
+                return None
+            # The archive holds the rendered DOM, so replay reproduces what was parsed
+            html_content = self._record_response(full_url, status, headers, body)
+        if html_content is not None and cache_content:
+            self.cache.set(full_url, html_content)
+        return html_content
+
+    async def aclose(self):
+        """Closes the browser contexts, the browser and the pooled aiohttp session."""
+        if self._slots is not None:
+            while not self._slots.empty():
+                await self._slots.get_nowait().context.close()
+            self._slots = None
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        await super().aclose()
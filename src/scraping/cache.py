@@ -0,0 +1,104 @@
+import time
+import zlib
+from collections import OrderedDict
+
+
+class PageCache():
+    """
+    Bounded in-memory cache of raw page HTML.
+
+    Pages are stored zlib-compressed and evicted least-recently-used first
+    once either max_entries or max_bytes (compressed size) is exceeded.
+    Entries older than ttl seconds are treated as misses. Callers re-parse
+    the HTML on a hit, which keeps memory proportional to the compressed
+    HTML rather than to the much larger parsed trees.
+
+    Any object exposing get(url), set(url, html) and stats() can be passed
+    to BaseScraper in place of this class.
+
+    Example Usage:
+        cache = PageCache(max_bytes=50 * 1024 * 1024, ttl=3600)
+        scraper = BaseScraper(base_url, cache=cache)
+    """
+
+    def __init__(
+            self,
+            max_entries: int | None = 10_000,
+            max_bytes: int | None = 100 * 1024 * 1024,
+            ttl: float | None = None,
+            compression_level: int = 6,
+        ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compression_level = compression_level
+        # url -> (stored_at, compressed html)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, url: str) -> bytes | None:
+        """Returns the raw HTML cached for url, or None on a miss."""
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, compressed = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            self._remove(url)
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return zlib.decompress(compressed)
+
+    def set(self, url: str, html: bytes | str):
+        """Stores the raw HTML for url, evicting old entries if over budget."""
+        if isinstance(html, str):
+            html = html.encode("utf-8")
+        compressed = zlib.compress(html, self.compression_level)
+        if self.max_bytes is not None and len(compressed) > self.max_bytes:
+            # Would evict everything else and still not fit
+            return
+        if url in self._entries:
+            self._remove(url)
+        self._entries[url] = (time.monotonic(), compressed)
+        self.size_bytes += len(compressed)
+        self._evict()
+
+    def _remove(self, url: str):
+        _, compressed = self._entries.pop(url)
+        self.size_bytes -= len(compressed)
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.size_bytes > self.max_bytes)
+        ):
+            _, (_, compressed) = self._entries.popitem(last=False)
+            self.size_bytes -= len(compressed)
+            self.evictions += 1
+
+    def clear(self):
+        """Removes all entries. Counters are kept."""
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the cache counters."""
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,475 @@
+"""
+guitar-safari command line interface.
+
+Subcommands:
+    crawl    Scrape every lot of a sale to JSON Lines, optionally enriching and storing them.
+    reparse  Re-parse lot descriptions in a JSON Lines file without network access.
+    enrich   Add LLM title fields and valuations to a JSON Lines file.
+    images   Download the photos of every lot of a sale into a content-addressed store.
+    export   Append a JSON Lines file to a partitioned Parquet dataset.
+    comparables  Look up recent sales of a brand and model in the database.
+    relistings   Find lots in a JSON Lines file whose descriptions nearly duplicate earlier ones.
+    bench    Run a benchmark, or time the startup of each subcommand.
+
+Only argparse is imported up front. Each subcommand imports what it needs when
+it runs, so `--help` and short offline jobs don't pay for aiohttp, SQLAlchemy,
+bs4 or pyarrow, and SDK clients are only created by the commands that use them.
+
+Usage:
+    guitar-safari crawl https://www.guitar-auctions.co.uk/sale/249/... -o sale_249.jsonl.gz --enrich
+    python -m src.scraping.cli export sale_249.jsonl.gz data/lots
+"""
+
+import argparse
+import logging
+import sys
+
+COMMANDS = ["crawl", "reparse", "enrich", "images", "export", "comparables", "relistings", "bench"]
+
+# Modules of this package each subcommand imports when run (with its default options), for time_startup
+COMMAND_MODULES = {
+    "crawl": ["guitar_auctions_scraper", "pipeline", "lot_parser"],
+    "reparse": ["jsonl", "lot_parser"],
+    "enrich": ["jsonl", "pipeline", "llm", "lot_parser"],
+    "images": ["guitar_auctions_scraper", "images", "jsonl"],
+    "export": ["export", "jsonl"],
+    "comparables": ["comparables"],
+    "relistings": ["jsonl", "relistings"],
+}
+
+# Benchmark modules runnable through `guitar-safari bench <name>`, from a repo checkout
+BENCHMARKS = {
+    "crawl": "benchmarks.run_benchmarks",
+    "parsing": "benchmarks.bench_parsing",
+    "lot-parser": "benchmarks.bench_lot_parser",
+}
+
+
+def _add_llm_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--model", default=None, help="LLM model, defaults to LLMClient's")
+    parser.add_argument("--enrich-concurrency", type=int, default=16, help="Lots enriched at once")
+    parser.add_argument("--llm-cache", action="store_true", help="Memoize LLM responses in the database")
+    parser.add_argument("--gazetteer", default=None,
+                        help="Title gazetteer JSON, titles are then parsed locally where possible")
+
+
+def _make_enricher(args, metrics=None):
+    """Returns (enrich, client) for the LLM arguments, enrich taking and returning a lot dict."""
+    from .llm import LLMClient, LLMEnricher
+    from .lot_parser import parse_lot_data
+
+    cache = None
+    if args.llm_cache:
+        from .llm_cache import LLMCache
+        cache = LLMCache()
+    client_kwargs = {"model": args.model} if args.model else {}
+    client = LLMClient(cache=cache, metrics=metrics, **client_kwargs)
+    title_parser = None
+    if args.gazetteer:
+        from .titles import Gazetteer, TitleParser
+        title_parser = TitleParser(Gazetteer.load(args.gazetteer), llm=client)
+    enricher = LLMEnricher(client, max_workers=args.enrich_concurrency, title_parser=title_parser)
+
+    async def enrich(lot_data: dict) -> dict:
+        # Lots from files written before crawls parsed them only have a description and estimate
+        if "title" not in lot_data and "description" in lot_data:
+            lot_data = lot_data | parse_lot_data(lot_data)
+        return await enricher.enrich(lot_data)
+
+    return enrich, client
+
+
+def crawl(args) -> int:
+    import asyncio
+    from contextlib import ExitStack
+    from urllib.parse import urlparse
+
+    from .guitar_auctions_scraper import GuitarAuctionScraper
+    from .pipeline import scrape_lots
+
+    async def run(stack: ExitStack) -> int:
+        archive = None
+        if args.archive:
+            from .archive import ResponseArchive
+            archive = ResponseArchive(args.archive)
+        parse_pool = state = writer = None
+        if args.parse_workers:
+            from .parse_pool import ParsePool
+            parse_pool = stack.enter_context(ParsePool(args.parse_workers))
+        if args.state:
+            from .state import LotStateStore
+            state = stack.enter_context(LotStateStore())
+        if args.db:
+            from .writer import LotWriter
+            writer = stack.enter_context(LotWriter())
+
+        sale_url = urlparse(args.sale_url)
+        scraper = GuitarAuctionScraper(
+            f"{sale_url.scheme}://{sale_url.netloc}",
+            max_concurrency_per_host=args.max_concurrency,
+            archive=archive,
+            replay=args.replay,
+        )
+        enrich = client = None
+        if args.enrich:
+            enrich, client = _make_enricher(args, scraper.metrics)
+        frontier = None
+        if args.frontier:
+            from .frontier import CrawlFrontier
+            frontier = stack.enter_context(CrawlFrontier(args.frontier, canonicalize=scraper.canonicalize_url))
+            frontier.add(args.sale_url, scraper.sale_priority(closed=args.closed))
+        relistings = None
+        if args.relistings:
+            from .relistings import RelistingIndex
+            relistings = stack.enter_context(RelistingIndex(args.relistings))
+        try:
+            async with scraper:
+                if frontier is None:
+                    lot_urls = [
+                        url async for url in scraper.iter_sale_lot_links(args.sale_url, parse_pool=parse_pool)
+                    ]
+                    logging.info("Found %i lots", len(lot_urls))
+                else:
+                    # Listing pages are crawled from the frontier along with the lots
+                    lot_urls = []
+                written = await scrape_lots(
+                    scraper,
+                    lot_urls,
+                    args.output,
+                    enrich=enrich,
+                    state=state,
+                    writer=writer,
+                    resume=not args.no_resume,
+                    enrich_concurrency=args.enrich_concurrency,
+                    parse_pool=parse_pool,
+                    frontier=frontier,
+                    relistings=relistings,
+                )
+        finally:
+            if client is not None:
+                await client.aclose()
+            if args.metrics_file:
+                scraper.metrics.write_prometheus(args.metrics_file)
+        if writer is not None:
+            # Flush queued lots so the price summaries include them
+            writer.close()
+            if writer.engine.dialect.name == "postgresql":
+                from .comparables import ComparableSales
+                refreshed = ComparableSales(writer.engine).refresh_price_summary(writer.models_written)
+                logging.info("Refreshed the price summaries of %i models", refreshed)
+        if frontier is None:
+            print(f"Wrote {written} of {len(lot_urls)} lots to {args.output}")
+        else:
+            stats = frontier.stats()
+            print(
+                f"Wrote {written} lots to {args.output}, {stats['pending']} URLs left in the frontier, "
+                f"{stats['duplicates']} duplicate links skipped"
+            )
+        return 0
+
+    with ExitStack() as stack:
+        return asyncio.run(run(stack))
+
+
+def reparse(args) -> int:
+    from .jsonl import load_data_from_disk, save_data_to_disk
+    from .lot_parser import parse_lot_data
+
+    counts = {"reparsed": 0, "skipped": 0}
+
+    def reparsed():
+        for lot_url, entry in load_data_from_disk(args.input):
+            if "description" in entry and "estimate" in entry:
+                entry = entry | parse_lot_data(entry)
+                counts["reparsed"] += 1
+            else:
+                counts["skipped"] += 1
+            yield [lot_url, entry]
+
+    save_data_to_disk(reparsed(), args.output)
+    print(f"Re-parsed {counts['reparsed']} lots into {args.output}, {counts['skipped']} without a description")
+    return 0
+
+
+def enrich(args) -> int:
+    import asyncio
+
+    from .jsonl import JsonlSink, completed_lot_urls, load_data_from_disk
+    from .pipeline import enrich_stage
+
+    async def run() -> int:
+        enrich_lot, client = _make_enricher(args)
+        done = completed_lot_urls(args.output)
+
+        async def lots():
+            for lot_url, entry in load_data_from_disk(args.input):
+                if lot_url not in done:
+                    yield lot_url, entry
+
+        try:
+            with JsonlSink(args.output) as sink:
+                async for lot_url, _, record in enrich_stage(
+                    lots(), enrich_lot, args.enrich_concurrency, client.metrics
+                ):
+                    sink.write([lot_url, record])
+        finally:
+            await client.aclose()
+        print(
+            f"Enriched {sink.records_written} lots into {args.output} "
+            f"({client.prompt_tokens} prompt and {client.completion_tokens} completion tokens)"
+        )
+        return 0
+
+    return asyncio.run(run())
+
+
+def images(args) -> int:
+    import asyncio
+    import os
+    from contextlib import ExitStack
+    from urllib.parse import urlparse
+
+    from .guitar_auctions_scraper import GuitarAuctionScraper
+    from .images import ImageDownloader, ImageStore, download_lot_images
+    from .jsonl import JsonlSink, completed_lot_urls
+
+    store = ImageStore(args.root)
+    # [lot_url, [sha256 of each photo, in gallery order]] per lot with all its photos stored,
+    # so lots with failed downloads are tried again on the next run
+    lots_path = os.path.join(args.root, "lots.jsonl")
+
+    async def run(stack: ExitStack) -> int:
+        thumbnail_pool = None
+        if args.thumbnail_size:
+            from .parse_pool import ParsePool
+            thumbnail_pool = stack.enter_context(ParsePool(args.thumbnail_workers))
+        sale_url = urlparse(args.sale_url)
+        scraper = GuitarAuctionScraper(
+            f"{sale_url.scheme}://{sale_url.netloc}",
+            max_concurrency_per_host=args.max_concurrency,
+        )
+        downloader = ImageDownloader(scraper, store, thumbnail_pool, args.thumbnail_size)
+        done = completed_lot_urls(lots_path)
+        photos = 0
+        incomplete_lots = 0
+        async with scraper:
+            lot_urls = [url async for url in scraper.iter_sale_lot_links(args.sale_url) if url not in done]
+            logging.info("Downloading photos of %i lots", len(lot_urls))
+            with JsonlSink(lots_path) as sink:
+                async for lot_url, lot_images in download_lot_images(
+                    scraper, lot_urls, downloader, args.lot_concurrency
+                ):
+                    stored = [image.sha256 for image in lot_images if image is not None]
+                    photos += len(stored)
+                    if len(stored) < len(lot_images):
+                        logging.warning(
+                            "%i of %i photos of %s failed to download, it will be retried on the next run",
+                            len(lot_images) - len(stored), len(lot_images), lot_url,
+                        )
+                        incomplete_lots += 1
+                        continue
+                    sink.write([lot_url, stored])
+        stats = store.stats()
+        print(
+            f"Stored {photos} photos of {sink.records_written} lots in {args.root}, "
+            f"{stats['objects']} distinct images, {stats['duplicates']} duplicates skipped"
+        )
+        if incomplete_lots:
+            print(f"{incomplete_lots} lots have photos that failed to download, run again to retry them")
+        return 0
+
+    with ExitStack() as stack:
+        return asyncio.run(run(stack))
+
+
+def export(args) -> int:
+    from .export import export_lots
+    from .jsonl import load_data_from_disk
+
+    written = export_lots(load_data_from_disk(args.input), args.root, batch_size=args.batch_size)
+    print(f"Exported {written} lots to {args.root}")
+    return 0
+
+
+def _year_range(value: str) -> int | tuple[int | None, int | None]:
+    """Parses "1959", "1958-1960", "1958-" or "-1960"."""
+    if "-" not in value:
+        return int(value)
+    first, last = value.split("-", 1)
+    return (int(first) if first else None, int(last) if last else None)
+
+
+def comparables(args) -> int:
+    from .comparables import ComparableSales
+
+    sales = ComparableSales()
+    lots = sales.comparables(args.brand, args.model, year=args.year, limit=args.limit, fuzzy=args.fuzzy)
+    for lot in lots:
+        estimate = f"£{lot.estimate_low}-{lot.estimate_high}" if lot.estimate_low is not None else "no estimate"
+        print(f"{lot.sale_id or '':>5} {lot.year or '':>4} {estimate:>14}  {lot.title or ''}  {lot.lot_url}")
+    if sales.is_postgresql:
+        summary = sales.price_summary(args.brand, args.model)
+        if summary is not None:
+            print(
+                f"{summary['lots']} lots of {summary['brand']} {summary['model']} "
+                f"({summary['min_year']}-{summary['max_year']}), median estimate £{summary['median_estimate']:.0f}"
+            )
+    return 0
+
+
+def relistings(args) -> int:
+    from .jsonl import load_data_from_disk, save_data_to_disk
+    from .relistings import RelistingIndex
+
+    with RelistingIndex(args.index, threshold=args.threshold) as index:
+        found = index.add_many(load_data_from_disk(args.input))
+        indexed = len(index)
+    if args.output:
+        links = (
+            [lot_url, similar_url, similarity]
+            for lot_url, similar in found.items()
+            for similar_url, similarity in similar
+        )
+        save_data_to_disk(links, args.output)
+    print(f"{len(found)} lots look like relistings, {indexed} lots in {args.index}")
+    return 0
+
+
+def time_startup(repeat: int = 5) -> dict[str, dict[str, float]]:
+    """
+    Best-of-repeat wall times in seconds, per subcommand, of a fresh process
+    running `--help` and of one importing everything the subcommand needs.
+    """
+    import subprocess
+    import time
+
+    def best_time(argv):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    timings = {}
+    for command in [None, *COMMANDS]:
+        help_argv = [sys.executable, "-m", f"{__package__}.cli", *([command] if command else []), "--help"]
+        modules = ["cli", *COMMAND_MODULES.get(command or "", [])]
+        imports = ", ".join(f"{__package__}.{module}" for module in modules)
+        timings[command or "(none)"] = {
+            "help": best_time(help_argv),
+            "ready": best_time([sys.executable, "-c", f"import {imports}"]),
+        }
+    return timings
+
+
+def bench(args) -> int:
+    if args.benchmark == "startup":
+        print(f"{'command':<10} {'--help':>9} {'imports':>9}")
+        for command, timings in time_startup(args.repeat).items():
+            print(f"{command:<10} {timings['help'] * 1000:6.0f} ms {timings['ready'] * 1000:6.0f} ms")
+        return 0
+    import importlib
+
+    module = importlib.import_module(BENCHMARKS[args.benchmark])
+    sys.argv = [module.__name__, *args.benchmark_args]
+    module.main()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="guitar-safari", description=__doc__.splitlines()[1])
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    crawl_parser = subparsers.add_parser("crawl", help="Scrape every lot of a sale")
+    crawl_parser.add_argument("sale_url", help="First listing page of the sale")
+    crawl_parser.add_argument("-o", "--output", default="scraped_data.jsonl",
+                              help="JSON Lines output, gzip-compressed if it ends in .gz")
+    crawl_parser.add_argument("--max-concurrency", type=int, default=8, help="Maximum requests per host")
+    crawl_parser.add_argument("--parse-workers", type=int, default=0,
+                              help="Parse lot pages in this many worker processes")
+    crawl_parser.add_argument("--enrich", action="store_true", help="Add LLM title fields and valuations")
+    crawl_parser.add_argument("--state", action="store_true",
+                              help="Skip lots unchanged since they were last enriched")
+    crawl_parser.add_argument("--db", action="store_true", help="Also write lots to the database")
+    crawl_parser.add_argument("--archive", default=None, help="Directory to archive raw responses in")
+    crawl_parser.add_argument("--replay", action="store_true", help="Serve pages from --archive only")
+    crawl_parser.add_argument("--no-resume", action="store_true", help="Re-scrape lots already in the output")
+    crawl_parser.add_argument("--frontier", default=None,
+                              help="Crawl through a persistent frontier log here, resuming it if it exists")
+    crawl_parser.add_argument("--closed", action="store_true",
+                              help="The sale is closed, its pages come after open sales' in the frontier")
+    crawl_parser.add_argument("--relistings", default=None,
+                              help="Relisting index to add lots to, similar earlier lots go in similar_lots")
+    crawl_parser.add_argument("--metrics-file", default=None, help="Write Prometheus metrics here when done")
+    _add_llm_arguments(crawl_parser)
+    crawl_parser.set_defaults(func=crawl)
+
+    reparse_parser = subparsers.add_parser("reparse", help="Re-parse lot descriptions offline")
+    reparse_parser.add_argument("input")
+    reparse_parser.add_argument("output")
+    reparse_parser.set_defaults(func=reparse)
+
+    enrich_parser = subparsers.add_parser("enrich", help="Add LLM fields to scraped lots")
+    enrich_parser.add_argument("input")
+    enrich_parser.add_argument("output", help="Appended to, lots already in it are skipped")
+    _add_llm_arguments(enrich_parser)
+    enrich_parser.set_defaults(func=enrich)
+
+    images_parser = subparsers.add_parser("images", help="Download the photos of a sale's lots")
+    images_parser.add_argument("sale_url", help="First listing page of the sale")
+    images_parser.add_argument("root", help="Image store directory, lots already in it are skipped")
+    images_parser.add_argument("--max-concurrency", type=int, default=8, help="Maximum requests per host")
+    images_parser.add_argument("--lot-concurrency", type=int, default=8, help="Lots whose photos download at once")
+    images_parser.add_argument("--thumbnail-size", type=int, default=0,
+                               help="Also make thumbnails this many pixels across (needs Pillow)")
+    images_parser.add_argument("--thumbnail-workers", type=int, default=None,
+                               help="Processes making thumbnails, defaults to the CPU count")
+    images_parser.set_defaults(func=images)
+
+    export_parser = subparsers.add_parser("export", help="Append lots to a Parquet dataset")
+    export_parser.add_argument("input")
+    export_parser.add_argument("root", help="Dataset directory")
+    export_parser.add_argument("--batch-size", type=int, default=100_000)
+    export_parser.set_defaults(func=export)
+
+    comparables_parser = subparsers.add_parser("comparables", help="Look up recent sales of a model")
+    comparables_parser.add_argument("brand")
+    comparables_parser.add_argument("model")
+    comparables_parser.add_argument("--year", type=_year_range, default=None,
+                                    help="Year or range, e.g. 1959, 1958-1960 or 1958-")
+    comparables_parser.add_argument("--limit", type=int, default=20)
+    comparables_parser.add_argument("--fuzzy", action="store_true",
+                                    help="Match similar model names (PostgreSQL only)")
+    comparables_parser.set_defaults(func=comparables)
+
+    relistings_parser = subparsers.add_parser("relistings", help="Index lots and find likely relistings")
+    relistings_parser.add_argument("input", help="JSON Lines lots, oldest first")
+    relistings_parser.add_argument("index", help="Relisting index, created or added to")
+    relistings_parser.add_argument("-o", "--output", default=None,
+                                   help="Write [lot_url, similar_url, similarity] lines here")
+    relistings_parser.add_argument("--threshold", type=float, default=0.7,
+                                   help="Estimated description similarity counted as a relisting")
+    relistings_parser.set_defaults(func=relistings)
+
+    bench_parser = subparsers.add_parser("bench", help="Run a benchmark or time CLI startup")
+    bench_parser.add_argument("benchmark", choices=["startup", *BENCHMARKS])
+    bench_parser.add_argument("--repeat", type=int, default=5, help="Runs per command for startup")
+    bench_parser.add_argument("benchmark_args", nargs=argparse.REMAINDER,
+                              help="Passed on to the benchmark's own arguments")
+    bench_parser.set_defaults(func=bench)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Comparable-sales queries over the lots table.
+
+The question asked of the database most is "recent sales of this brand and
+model, maybe within a year range". Brand and model are matched
+case-insensitively through expression indexes on lower(brand) and
+lower(model) (see db.Lot), so a lookup walks one model's index entries,
+newest sale first, and stops after limit rows rather than scanning the
+table. On PostgreSQL, models can also be matched by trigram similarity.
+
+Per-model price summaries (lot count, year span, median estimate and
+valuation) are kept in the lot_price_summary table, rebuilt in full or for
+just the models a crawl wrote.
+
+Example Usage:
+    for lot in comparables("Gibson", "Les Paul Standard", year=(1958, 1960), limit=10):
+        print(lot.lot_url, lot.estimate_low, lot.estimate_high)
+"""
+
+import functools
+from collections.abc import Iterable
+from itertools import islice
+
+from sqlalchemy import delete, func, insert, select, text, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from . import models
+from .db import Lot, LotPriceSummary, get_engine
+
+# Columns returned for each comparable, leaving out the long description fields
+COMPARABLE_COLUMNS = [
+    Lot.lot_url, Lot.sale_id, Lot.title, Lot.type, Lot.brand, Lot.model, Lot.year, Lot.made_in,
+    Lot.overall_condition, Lot.estimate_low, Lot.estimate_high, Lot.value_estimate_low,
+    Lot.value_estimate_high, Lot.scraped_at,
+]
+
+# Models refreshed per statement by refresh_price_summary
+REFRESH_CHUNK_SIZE = 1000
+
+
+def _median(expression):
+    return func.percentile_cont(0.5).within_group(expression)
+
+
+class ComparableSales():
+    """
+    Comparable-sales lookups and per-model price summaries over a pooled engine.
+
+    Creates any lots table indexes that don't exist yet, which is a one-off
+    index build on a table that predates them.
+
+    Example Usage:
+        sales = ComparableSales()
+        lots = sales.comparables("Fender", "Stratocaster", year=(1960, 1965), limit=20)
+        summary = sales.price_summary("Fender", "Stratocaster")
+    """
+
+    def __init__(self, engine: Engine | None = None, pool_size: int = 10, create_indexes: bool = True):
+        self.engine = engine if engine is not None else get_engine(pool_size=pool_size, pool_pre_ping=True)
+        if create_indexes:
+            self.create_indexes()
+
+    @property
+    def is_postgresql(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+    def create_indexes(self):
+        """Creates the lots table indexes that don't exist yet."""
+        with self.engine.begin() as conn:
+            if self.is_postgresql:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for index in Lot.__table__.indexes:
+                if index.dialect_options["postgresql"]["using"] and not self.is_postgresql:
+                    # The trigram index
+                    continue
+                # Rather than checkfirst, which can't see expression indexes on SQLite
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+    def comparables(
+            self,
+            brand: str,
+            model: str,
+            year: int | tuple[int | None, int | None] | None = None,
+            estimate: tuple[int | None, int | None] | None = None,
+            limit: int = 20,
+            fuzzy: bool = False,
+        ) -> list[models.Lot]:
+        """
+        Returns the most recent lots of a brand and model, newest sale first.
+
+        Args:
+            brand: Matched case-insensitively.
+            model: Matched case-insensitively.
+            year: A year, or an inclusive (first, last) range with None for an open end.
+            estimate: (low, high), keeps lots whose house estimate overlaps it.
+            limit: Most lots returned.
+            fuzzy: Match models by trigram similarity instead, most similar first,
+                so "Strat" finds "Stratocaster" (PostgreSQL only).
+
+        Returns:
+            Lots with the COMPARABLE_COLUMNS fields set.
+        """
+        model_key = func.lower(Lot.model)
+        statement = select(*COMPARABLE_COLUMNS).where(func.lower(Lot.brand) == brand.lower())
+        if fuzzy:
+            if not self.is_postgresql:
+                raise ValueError("Fuzzy model matching needs PostgreSQL with pg_trgm")
+            statement = statement.where(model_key.op("%")(model.lower())).order_by(
+                func.similarity(model_key, model.lower()).desc()
+            )
+        else:
+            statement = statement.where(model_key == model.lower())
+        if isinstance(year, tuple):
+            first, last = year
+            if first is not None:
+                statement = statement.where(Lot.year >= first)
+            if last is not None:
+                statement = statement.where(Lot.year <= last)
+        elif year is not None:
+            statement = statement.where(Lot.year == year)
+        if estimate is not None:
+            low, high = estimate
+            if high is not None:
+                statement = statement.where(Lot.estimate_low <= high)
+            if low is not None:
+                statement = statement.where(Lot.estimate_high >= low)
+        statement = statement.order_by(Lot.sale_id.desc(), Lot.lot_url.desc()).limit(limit)
+        with self.engine.connect() as conn:
+            return [models.Lot.from_row(row) for row in conn.execute(statement).mappings()]
+
+    def price_summary(self, brand: str, model: str) -> dict | None:
+        """Returns the lot_price_summary row of a brand and model, or None if it has none."""
+        statement = select(LotPriceSummary.__table__).where(
+            LotPriceSummary.brand_key == brand.lower(),
+            LotPriceSummary.model_key == model.lower(),
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(statement).mappings().first()
+        return dict(row) if row is not None else None
+
+    def refresh_price_summary(self, brand_models: Iterable[tuple[str | None, str | None]] | None = None) -> int:
+        """
+        Recomputes lot_price_summary from the lots table, for only the given
+        (brand, model) pairs if any (e.g. LotWriter.models_written after a
+        crawl), in one transaction so readers never see it half refreshed.
+        Needs PostgreSQL for the medians.
+
+        Returns:
+            Number of summary rows written.
+        """
+        if not self.is_postgresql:
+            raise ValueError(f"Price summaries are not supported for {self.engine.dialect.name}")
+        brand_key, model_key = func.lower(Lot.brand), func.lower(Lot.model)
+        summary = select(
+            brand_key,
+            model_key,
+            func.mode().within_group(Lot.brand),
+            func.mode().within_group(Lot.model),
+            func.count(),
+            func.min(Lot.year),
+            func.max(Lot.year),
+            func.max(Lot.sale_id),
+            func.min(Lot.estimate_low),
+            func.max(Lot.estimate_high),
+            _median((Lot.estimate_low + Lot.estimate_high) / 2.0),
+            _median((Lot.value_estimate_low + Lot.value_estimate_high) / 2.0),
+        ).where(Lot.brand.is_not(None), Lot.model.is_not(None)).group_by(brand_key, model_key)
+        columns = [
+            "brand_key", "model_key", "brand", "model", "lots", "min_year", "max_year", "latest_sale_id",
+            "min_estimate", "max_estimate", "median_estimate", "median_valuation",
+        ]
+        summary_key = tuple_(LotPriceSummary.brand_key, LotPriceSummary.model_key)
+
+        def refresh(rows):
+            # INSERT ... SELECT rowcounts aren't reliable across drivers, count what was returned
+            return insert(LotPriceSummary).from_select(columns, rows).returning(LotPriceSummary.brand_key)
+
+        written = 0
+        with self.engine.begin() as conn:
+            if brand_models is None:
+                conn.execute(delete(LotPriceSummary))
+                return len(conn.execute(refresh(summary)).all())
+            keys = iter({(brand.lower(), model.lower()) for brand, model in brand_models if brand and model})
+            while chunk := list(islice(keys, REFRESH_CHUNK_SIZE)):
+                conn.execute(delete(LotPriceSummary).where(summary_key.in_(chunk)))
+                written += len(conn.execute(refresh(summary.where(tuple_(brand_key, model_key).in_(chunk)))).all())
+        return written
+
+
+@functools.cache
+def _default() -> ComparableSales:
+    return ComparableSales()
+
+
+def comparables(
+        brand: str,
+        model: str,
+        year: int | tuple[int | None, int | None] | None = None,
+        limit: int = 20,
+        **kwargs,
+    ) -> list[models.Lot]:
+    """
+    ComparableSales.comparables on a shared pooled engine for DATABASE_URL,
+    created on first use.
+    """
+    return _default().comparables(brand, model, year=year, limit=limit, **kwargs)
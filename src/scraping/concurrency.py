@@ -0,0 +1,179 @@
+"""
+Adaptive per-host concurrency and retry backoff.
+
+AdaptiveLimiter is an AIMD (additive increase, multiplicative decrease)
+concurrency limit, like TCP congestion control: every healthy response grows
+the limit by 1/limit, i.e. by about one slot per round of requests, while a
+throttled or failed response, or a windowed p95 latency well above the
+lowest seen, cuts it by backoff_factor at most once per round trip.
+Retry-After pauses new requests to the host until it has passed.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Responses worth retrying, 429 and 503 also mean the server wants us to slow down
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parses a Retry-After header, given in seconds or as an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(
+        attempt: int,
+        base: float,
+        maximum: float,
+        retry_after: float | None = None,
+    ) -> float:
+    """Seconds to wait before retry number attempt: Retry-After if given, else full jitter."""
+    if retry_after is not None:
+        return min(retry_after, maximum)
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class AdaptiveLimiter():
+    """
+    AIMD concurrency limit for one host, used as an async context manager around
+    each request.
+
+    Example Usage:
+        async with limiter:
+            start = time.perf_counter()
+            response = await session.get(url)
+        if response.status in THROTTLE_STATUSES:
+            limiter.on_throttle(retry_after_seconds(response.headers.get("Retry-After")))
+        else:
+            limiter.on_success(time.perf_counter() - start)
+    """
+
+    def __init__(
+            self,
+            initial: int = 4,
+            min_limit: int = 1,
+            max_limit: int = 32,
+            backoff_factor: float = 0.5,
+            latency_window: int = 100,
+            latency_tolerance: float = 2.0,
+        ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+        self._check_every = max(latency_window // 10, 1)
+        self._successes = 0
+        self._baseline_p95: float | None = None
+        self._last_decrease = float("-inf")
+        self._resume_at = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Pass on the wake-up this task received
+                    self._wake()
+                else:
+                    with suppress(ValueError):
+                        self._waiters.remove(waiter)
+                raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _round_trip(self) -> float:
+        if not self._latencies:
+            return 0.1
+        return sorted(self._latencies)[len(self._latencies) // 2]
+
+    def _decrease(self):
+        now = time.monotonic()
+        # Responses to requests sent in the same round trip count as one signal
+        if now - self._last_decrease < self._round_trip():
+            return
+        self._last_decrease = now
+        new_limit = max(float(self.min_limit), self.limit * self.backoff_factor)
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.decreases += 1
+
+    def on_success(self, latency: float):
+        """Records a healthy response that took latency seconds once it had a slot."""
+        self._latencies.append(latency)
+        self._successes += 1
+        if self._successes % self._check_every == 0 and len(self._latencies) >= self._check_every:
+            ordered = sorted(self._latencies)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            if self._baseline_p95 is not None and p95 > self.latency_tolerance * self._baseline_p95:
+                self._decrease()
+                # Let the baseline drift up so a lasting slowdown becomes the new normal
+                self._baseline_p95 *= 1.05
+                return
+            self._baseline_p95 = p95 if self._baseline_p95 is None else min(p95, self._baseline_p95 * 1.05)
+        if self.limit < self.max_limit:
+            previous = int(self.limit)
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            if int(self.limit) > previous:
+                self.increases += 1
+                self._wake()
+
+    def on_throttle(self, retry_after: float | None = None):
+        """Records a 429/503 response, pausing the host for retry_after seconds if given."""
+        self._decrease()
+        if retry_after:
+            self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+
+    def on_error(self):
+        """Records a failed request (timeout, connection error or 5xx)."""
+        self._decrease()
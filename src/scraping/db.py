@@ -0,0 +1,172 @@
+"""
+SQLAlchemy models and engine setup for scraped data.
+
+Uses DATABASE_URL (e.g. the Postgres from docker-compose.yaml) when set,
+otherwise a local SQLite file.
+"""
+
+import os
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from dotenv import load_dotenv
+from sqlalchemy import (
+    DDL, JSON, DateTime, Float, Index, Integer, String, Text, create_engine, event, func,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+DEFAULT_DATABASE_URL = "sqlite:///guitar_safari.db"
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class LotState(Base):
+    """Per-lot crawl state used to skip lots that haven't changed since the last run."""
+    __tablename__ = "lot_state"
+    lot_url: Mapped[str] = mapped_column(String, primary_key=True)
+    # sha256 of the extracted description and estimate
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    # content_hash at the time the lot was last enriched by the LLM
+    enriched_hash: Mapped[str | None] = mapped_column(String(64))
+    last_fetched_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_enriched_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class Lot(Base):
+    """One scraped and enriched auction lot."""
+    __tablename__ = "lots"
+    lot_url: Mapped[str] = mapped_column(String, primary_key=True)
+    sale_id: Mapped[int | None] = mapped_column(Integer, index=True)
+    title: Mapped[str | None] = mapped_column(Text)
+    type: Mapped[str | None] = mapped_column(String)
+    brand: Mapped[str | None] = mapped_column(String)
+    model: Mapped[str | None] = mapped_column(String)
+    year: Mapped[int | None] = mapped_column(Integer)
+    made_in: Mapped[str | None] = mapped_column(String)
+    weight: Mapped[float | None] = mapped_column(Float)
+    overall_condition: Mapped[str | None] = mapped_column(Text)
+    estimate_low: Mapped[int | None] = mapped_column(Integer)
+    estimate_high: Mapped[int | None] = mapped_column(Integer)
+    value_estimate_low: Mapped[int | None] = mapped_column(Integer)
+    value_estimate_high: Mapped[int | None] = mapped_column(Integer)
+    rationale: Mapped[str | None] = mapped_column(Text)
+    body: Mapped[str | None] = mapped_column(Text)
+    neck: Mapped[str | None] = mapped_column(Text)
+    fretboard: Mapped[str | None] = mapped_column(Text)
+    frets: Mapped[str | None] = mapped_column(Text)
+    electrics: Mapped[str | None] = mapped_column(Text)
+    hardware: Mapped[str | None] = mapped_column(Text)
+    case: Mapped[str | None] = mapped_column(Text)
+    notes: Mapped[Any | None] = mapped_column(JSON)
+    full_description: Mapped[str | None] = mapped_column(Text)
+    scraped_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    # Comparable-sales lookups match brand and model case-insensitively, see comparables.py
+    __table_args__ = (
+        # Most recent lots of a model first, in index order
+        Index("ix_lots_brand_model_sale", func.lower(brand), func.lower(model), sale_id, lot_url),
+        # A model's lots within a year range
+        Index("ix_lots_brand_model_year", func.lower(brand), func.lower(model), year),
+        Index("ix_lots_year", year),
+        Index("ix_lots_estimate", estimate_low, estimate_high),
+        # Similar model names ("Strat" for "Stratocaster") with pg_trgm
+        Index(
+            "ix_lots_model_trgm",
+            func.lower(model).label("model_lower"),
+            postgresql_using="gin",
+            postgresql_ops={"model_lower": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# The trigram index needs the extension, which the database user must be allowed to create
+event.listen(
+    Lot.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+class LotPriceSummary(Base):
+    """
+    Price summary per brand and model of the lots table, kept up to date by
+    comparables.refresh_price_summary like a materialized view that can be
+    refreshed one model at a time.
+    """
+    __tablename__ = "lot_price_summary"
+    # lower(brand) and lower(model)
+    brand_key: Mapped[str] = mapped_column(String, primary_key=True)
+    model_key: Mapped[str] = mapped_column(String, primary_key=True)
+    # Most common spelling
+    brand: Mapped[str] = mapped_column(String, nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    lots: Mapped[int] = mapped_column(Integer, nullable=False)
+    min_year: Mapped[int | None] = mapped_column(Integer)
+    max_year: Mapped[int | None] = mapped_column(Integer)
+    latest_sale_id: Mapped[int | None] = mapped_column(Integer)
+    min_estimate: Mapped[int | None] = mapped_column(Integer)
+    max_estimate: Mapped[int | None] = mapped_column(Integer)
+    # Medians of the house estimate and LLM valuation midpoints
+    median_estimate: Mapped[float | None] = mapped_column(Float)
+    median_valuation: Mapped[float | None] = mapped_column(Float)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class LotSimilarity(Base):
+    """A lot whose description nearly duplicates an earlier lot's, e.g. a guitar relisted in a later sale."""
+    __tablename__ = "lot_similarity"
+    lot_url: Mapped[str] = mapped_column(String, primary_key=True)
+    similar_url: Mapped[str] = mapped_column(String, primary_key=True, index=True)
+    # Estimated Jaccard similarity of the descriptions' word shingles, see relistings.py
+    similarity: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class LLMCacheEntry(Base):
+    """A memoized LLM response, keyed on a hash of model, system, prompt and temperature."""
+    __tablename__ = "llm_cache"
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    response: Mapped[Any] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[float] = mapped_column(Float, nullable=False)
+    last_used_at: Mapped[float] = mapped_column(Float, nullable=False, index=True)
+
+
+def get_database_url() -> str:
+    """Returns DATABASE_URL from the environment (or .env), or the local SQLite default."""
+    load_dotenv()
+    return os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URL)
+
+
+def get_engine(database_url: str | None = None, **kwargs) -> Engine:
+    """Creates an engine and makes sure all tables exist."""
+    engine = create_engine(database_url or get_database_url(), **kwargs)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def upsert(engine: Engine, table, index_elements: list[str]):
+    """
+    Returns an INSERT ... ON CONFLICT DO UPDATE builder for the engine's dialect.
+
+    Call the result with the list of columns to update on conflict.
+    """
+    insert: Callable
+    if engine.dialect.name == "postgresql":
+        insert = postgresql.insert
+    elif engine.dialect.name == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise ValueError(f"Upserts are not supported for {engine.dialect.name}")
+
+    def build(update_columns: list[str]):
+        statement = insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: statement.excluded[column] for column in update_columns},
+        )
+    return build
@@ -0,0 +1,223 @@
+"""
+Columnar export of scraped lots to a Parquet dataset.
+
+Lots are written with typed columns (integer estimates, valuations and year,
+float weight, a UTC timestamp), with brand, type and made-in dictionary
+encoded, and hive-partitioned by sale and scrape date:
+
+    <root>/sale_id=249/scraped_date=2026-10-18/part-<token>-0.parquet
+
+Each export adds new files and never rewrites existing ones, so a nightly
+crawl can append to the same dataset. Rows are sorted by brand and estimate
+within each file, so row group statistics let filters on those columns skip
+most of the data.
+"""
+
+import uuid
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from itertools import count, islice
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from .models import Lot, LotBatch
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = pa.schema([
+    pa.field("lot_url", pa.string(), nullable=False),
+    pa.field("sale_id", pa.int32()),
+    pa.field("scraped_date", pa.date32()),
+    pa.field("scraped_at", pa.timestamp("ms", tz="UTC")),
+    pa.field("title", pa.string()),
+    pa.field("type", _CATEGORY),
+    pa.field("brand", _CATEGORY),
+    pa.field("model", pa.string()),
+    pa.field("year", pa.int16()),
+    pa.field("made_in", _CATEGORY),
+    pa.field("weight", pa.float32()),
+    pa.field("overall_condition", pa.string()),
+    pa.field("estimate_low", pa.int32()),
+    pa.field("estimate_high", pa.int32()),
+    pa.field("value_estimate_low", pa.int32()),
+    pa.field("value_estimate_high", pa.int32()),
+    # LLM mean valuation minus house mean estimate, as in the Google Sheet export
+    pa.field("value_difference", pa.float64()),
+    pa.field("rationale", pa.string()),
+    pa.field("body", pa.string()),
+    pa.field("neck", pa.string()),
+    pa.field("fretboard", pa.string()),
+    pa.field("frets", pa.string()),
+    pa.field("electrics", pa.string()),
+    pa.field("hardware", pa.string()),
+    pa.field("case", pa.string()),
+    pa.field("notes", pa.list_(pa.string())),
+    pa.field("full_description", pa.string()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([SCHEMA.field("sale_id"), SCHEMA.field("scraped_date")]),
+    flavor="hive",
+)
+
+
+def _value_difference(row: dict) -> float | None:
+    values = [row["estimate_low"], row["estimate_high"], row["value_estimate_low"], row["value_estimate_high"]]
+    if any(value is None for value in values):
+        return None
+    return (values[2] + values[3]) / 2 - (values[0] + values[1]) / 2
+
+
+def _export_row(lot_url: str, entry: dict, scraped_at: datetime) -> dict:
+    row = Lot.from_entry(lot_url, entry).to_row()
+    row["scraped_at"] = scraped_at
+    row["scraped_date"] = scraped_at.date()
+    row["value_difference"] = _value_difference(row)
+    return row
+
+
+def _write_table(table: pa.Table, root: str, basename_template: str, row_group_size: int, file_options):
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=basename_template,
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=file_options,
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=min(row_group_size, table.num_rows),
+        # Keep the sort so row group statistics stay selective
+        preserve_order=True,
+    )
+
+
+def _sort_key(row: dict) -> tuple:
+    return (row["brand"] is None, row["brand"] or "", row["estimate_low"] or 0)
+
+
+def export_lots(
+        records: Iterable,
+        root: str,
+        scraped_at: datetime | None = None,
+        batch_size: int = 100_000,
+        row_group_size: int = 10_000,
+        compression: str = "zstd",
+    ) -> int:
+    """
+    Appends [lot_url, entry] records to the Parquet dataset at root.
+
+    Exporting the same lots twice stores them twice, so export each crawl's
+    output once (or deduplicate on lot_url when reading).
+
+    Args:
+        records: [lot_url, entry] pairs, e.g. from load_data_from_disk. Consumed lazily.
+        root: Dataset directory, created if it doesn't exist.
+        scraped_at: Scrape time recorded for the lots, defaults to now.
+        batch_size: Records converted and written at a time.
+        row_group_size: Maximum rows per Parquet row group.
+        compression: Parquet compression codec.
+
+    Returns:
+        Number of lots written.
+
+    Example Usage:
+        export_lots(load_data_from_disk("sale_249.jsonl.gz"), "data/lots")
+    """
+    if scraped_at is None:
+        scraped_at = datetime.now(timezone.utc)
+    file_options = ds.ParquetFileFormat().make_write_options(compression=compression)
+    # Unique per call so appends never overwrite earlier files
+    token = uuid.uuid4().hex
+    records = iter(records)
+    written = 0
+    for batch_number in count():
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        rows = sorted((_export_row(lot_url, entry, scraped_at) for lot_url, entry in batch), key=_sort_key)
+        _write_table(
+            pa.Table.from_pylist(rows, schema=SCHEMA),
+            root,
+            f"part-{token}-{batch_number}-{{i}}.parquet",
+            row_group_size,
+            file_options,
+        )
+        written += len(rows)
+    return written
+
+
+def lots_dataset(root: str) -> ds.Dataset:
+    """
+    Opens the Parquet dataset at root for querying, with typed partition columns.
+
+    Filters on sale_id and scraped_date prune whole directories, and filters on
+    other columns skip row groups using their statistics.
+
+    Example Usage:
+        import pyarrow.dataset as ds
+        fender_over_2k = lots_dataset("data/lots").to_table(
+            columns=["lot_url", "title", "estimate_low", "estimate_high"],
+            filter=(ds.field("brand") == "Fender") & (ds.field("estimate_low") > 2000),
+        )
+    """
+    return ds.dataset(root, schema=SCHEMA, format="parquet", partitioning=PARTITIONING)
+
+
+def export_batch(
+        batch: LotBatch,
+        root: str,
+        scraped_at: datetime | None = None,
+        row_group_size: int = 10_000,
+        compression: str = "zstd",
+    ) -> int:
+    """
+    Appends a LotBatch to the Parquet dataset at root, like export_lots but
+    converting whole columns at once instead of row by row.
+
+    Lots keep their own scraped_at where they have one, the others get
+    scraped_at (default now). Extra fields that aren't columns are not exported.
+
+    Returns:
+        Number of lots written.
+    """
+    if not len(batch):
+        return 0
+    if scraped_at is None:
+        scraped_at = datetime.now(timezone.utc)
+    table = batch.to_arrow(include_extras=False)
+    scraped = pc.fill_null(table.column("scraped_at"), pa.scalar(scraped_at, SCHEMA.field("scraped_at").type))
+    table = table.set_column(table.schema.get_field_index("scraped_at"), "scraped_at", scraped)
+    table = table.append_column("scraped_date", scraped.cast(pa.date32()))
+    table = table.append_column("value_difference", pc.subtract(
+        pc.divide(pc.add(table.column("value_estimate_low").cast(pa.float64()),
+                         table.column("value_estimate_high")), 2),
+        pc.divide(pc.add(table.column("estimate_low").cast(pa.float64()),
+                         table.column("estimate_high")), 2),
+    ))
+    table = table.select(SCHEMA.names).cast(SCHEMA)
+    # Dictionary columns can't be sorted directly, order by the decoded brand
+    sort_keys = pa.table({"brand": table.column("brand").cast(pa.string()), "estimate_low": table.column("estimate_low")})
+    table = table.take(pc.sort_indices(sort_keys, [("brand", "ascending"), ("estimate_low", "ascending")]))
+    _write_table(
+        table,
+        root,
+        f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        row_group_size,
+        ds.ParquetFileFormat().make_write_options(compression=compression),
+    )
+    return table.num_rows
+
+
+def read_batch(root: str, filter: ds.Expression | None = None) -> LotBatch:
+    """
+    Reads lots from the Parquet dataset at root into a LotBatch, keeping brand,
+    type and made-in dictionary encoded.
+
+    Example Usage:
+        batch = read_batch("data/lots", filter=ds.field("sale_id") == 249)
+    """
+    columns = [name for name in SCHEMA.names if name not in ("scraped_date", "value_difference")]
+    return LotBatch.from_arrow(lots_dataset(root).to_table(columns=columns, filter=filter))
@@ -9,16 +9,37 @@ TODO:
 - Add typer
 """
 
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import TYPE_CHECKING
+
+from urllib.parse import parse_qs, urljoin, urlparse
 import re
 
-from src.scraping.base_scraper import BaseScraper
+from .base_scraper import BaseScraper
+from .parsing import extract_last_page_number, extract_lot_details, extract_lot_image_links, extract_lot_links
+
+if TYPE_CHECKING:
+    from .frontier import CrawlFrontier
+    from .parse_pool import ParsePool
+
+# Frontier priorities, lower first: listing pages before lots, open sales before closed ones
+LISTING_PRIORITY = 0
+LOT_PRIORITY = 1
+CLOSED_SALE_PRIORITY = 2
+
+# /sale/<id>/<sale slug>, lot pages add /<lot number>-<lot slug>
+_LISTING_PATH = re.compile(r"^/sale/\d+/[^/]+/?$")
 
 class GuitarAuctionScraper(BaseScraper):
 
-    def __init__(self, base_url= "https://www.guitar-auctions.co.uk"):
-        super().__init__(base_url)
+    # Listing page 1 is the sale URL itself
+    DEFAULT_QUERY_PARAMS = {"page": "1"}
+
+    def __init__(self, base_url= "https://www.guitar-auctions.co.uk", **kwargs):
+        super().__init__(base_url, **kwargs)
 
     def get_lot_links(self, html_content, base_url):
         """
@@ -26,48 +47,268 @@ class GuitarAuctionScraper(BaseScraper):
         
         Now, each lot is contained in a <div> with classes "cell large-3 medium-3 small-12"
         and the lot link is the href of the <a> tag within that cell.
+
+        Accepts raw HTML, an lxml tree or an already-parsed BeautifulSoup object.
         """
-        soup = BeautifulSoup(html_content, "lxml")
-        lot_links = []
-        
-        # Find all lot cells based on the known classes
-        lot_cells = soup.find_all("div", class_="cell large-3 medium-3 small-12")
-        for cell in lot_cells:
-            a_tag = cell.find("a")
-            if a_tag and a_tag.get("href"):
-                full_url = urljoin(base_url, a_tag["href"])
-                lot_links.append(full_url)
-        
-        return lot_links
+        with self.metrics.parse_seconds.time("listing"):
+            return extract_lot_links(html_content, base_url)
 
+    def parse_lot_page(self, html_content) -> dict:
+        """
+        Parses a lot detail page and returns a dictionary with:
+            - 'description': The detailed guitar description.
+            - 'estimate': The price estimate.
 
-    # def parse_lot_page(html):
-    #     """
-    #     Parses a lot detail page's HTML and returns a dictionary with:
-    #     - 'description': The detailed guitar description.
-    #     - 'estimate': The price estimate.
-        
-    #     This function assumes the detailed lot page contains a 
-    #     <div class="cell large-7 medium-3 small-12"> that holds the description,
-    #     and a <p> tag with text that includes "Estimate:".
-    #     """
-    #     soup = BeautifulSoup(html, "lxml")
-        
-    #     # Extract the container with the detailed description
-    #     container = soup.find("div", class_="cell large-7 medium-3 small-12")
-    #     description = ""
-    #     if container:
-    #         # Get the text node directly within the container
-    #         description_node = container.find(string=True, recursive=False)
-    #         if description_node:
-    #             description = description_node.strip()
-        
-    #     # Extract the price estimate from a <p> tag containing "Estimate:"
-    #     estimate_tag = soup.find("p", string=lambda text: text and "Estimate:" in text)
-    #     estimate = estimate_tag.get_text(strip=True) if estimate_tag else "Not found"
-        
-    #     return {"description": description, "estimate": estimate}
+        Accepts raw HTML, an lxml tree or an already-parsed BeautifulSoup object.
+        """
+        with self.metrics.parse_seconds.time("lot"):
+            return extract_lot_details(html_content)
+
+    def get_lot_image_links(self, html_content, base_url=None) -> list[str]:
+        """
+        Returns full URLs of the photos in a lot detail page's gallery, the
+        <img> tags inside its <li class="orbit-slide"> slides.
+
+        Accepts raw HTML, an lxml tree or an already-parsed BeautifulSoup object.
+        """
+        if base_url is None:
+            base_url = self.base_url
+        with self.metrics.parse_seconds.time("lot_images"):
+            return extract_lot_image_links(html_content, base_url)
+
+    @staticmethod
+    def listing_page_url(sale_url: str, page: int) -> str:
+        """Returns the URL of a sale listing page, page 1 has no query parameter."""
+        if page == 1:
+            return sale_url
+        separator = "&" if urlparse(sale_url).query else "?"
+        return f"{sale_url}{separator}page={page}"
+
+    @staticmethod
+    def last_page_number(html_content, sale_url: str) -> int | None:
+        """
+        Returns the highest page number linked from the pagination markup of a listing page.
+
+        Only links back to the same sale are considered. Returns None if the page has no
+        pagination links. Accepts raw HTML, an lxml tree or an already-parsed BeautifulSoup object.
+        """
+        return extract_last_page_number(html_content, sale_url)
+
+    async def parse_listing(
+            self,
+            html_content,
+            sale_url: str,
+            parse_pool: "ParsePool | None" = None,
+        ) -> tuple[list[str], int | None]:
+        """
+        Returns the lot links and the last linked page number of a listing page.
+
+        With a parse_pool, html_content must be raw HTML and is parsed in a worker
+        process, otherwise it is parsed here like get_lot_links.
+        """
+        if parse_pool is None:
+            return self.get_lot_links(html_content, self.base_url), self.last_page_number(html_content, sale_url)
+        # Includes time spent waiting for a free worker
+        with self.metrics.parse_seconds.time("listing_pool"):
+            listing = await parse_pool.parse_listing(html_content, self.base_url, sale_url)
+        return listing["lot_links"], listing["last_page"]
+
+    async def iter_sale_lot_links(
+            self,
+            sale_url: str,
+            probe_window: int = 4,
+            parse_pool: "ParsePool | None" = None,
+        ) -> AsyncIterator[str]:
+        """
+        Yields the lot URLs of every listing page of a sale, deduplicated and in page order.
+
+        Page 1 is fetched first. If it has pagination links, all remaining pages up to the
+        last linked page are fetched concurrently (and the range is extended if later
+        pages link further). Otherwise pages are probed probe_window at a time until a
+        page without lots is found, or a whole window fails to fetch. Pages that can't
+        be fetched are logged and skipped.
+
+        Args:
+            sale_url: URL of the first listing page of the sale.
+            probe_window: Number of pages fetched per round when the last page is unknown.
+            parse_pool: Optional ParsePool, listing pages are then parsed in worker processes.
+
+        Example Usage:
+            async with scraper:
+                lot_urls = [url async for url in scraper.iter_sale_lot_links(sale_url)]
+        """
+        sale_url = urljoin(self.base_url, sale_url)
+        # page number -> its lot links, None if it couldn't be fetched
+        pages: dict[int, list[str] | None] = {}
+        seen = set()
+        last_page = 1       # highest page number known to exist
+        requested = 0       # highest page number requested so far
+        next_page = 1       # next page to yield lots from
+        paginated = False   # whether last_page came from pagination markup
+
+        while True:
+            if requested == 0:
+                batch = [1]
+            elif paginated:
+                batch = list(range(requested + 1, last_page + 1))
+            else:
+                batch = list(range(requested + 1, requested + 1 + probe_window))
+            if not batch:
+                return
+            requested = batch[-1]
+            page_numbers = {self.listing_page_url(sale_url, page): page for page in batch}
+            failed = 0
+
+            listing_pages = self.fetch_many(page_numbers, raw=parse_pool is not None)
+            async with aclosing(listing_pages):
+                async for page_url, page in listing_pages:
+                    if page is None:
+                        pages[page_numbers[page_url]] = None
+                        failed += 1
+                    else:
+                        pages[page_numbers[page_url]], linked_last_page = await self.parse_listing(
+                            page, sale_url, parse_pool
+                        )
+                        if linked_last_page:
+                            paginated = True
+                            last_page = max(last_page, linked_last_page)
+
+                    # Yield any pages that are now contiguous with what was already yielded
+                    while next_page in pages:
+                        lot_links = pages.pop(next_page)
+                        if lot_links is None:
+                            logging.warning(
+                                "Could not fetch page %i of %s, skipping it.",
+                                next_page,
+                                sale_url
+                            )
+                            next_page += 1
+                            continue
+                        if not lot_links:
+                            logging.info(
+                                "No lot links found on page %i. Assuming this is the last page.",
+                                next_page
+                            )
+                            return
+                        logging.info(
+                            "Found %i lots on page %i of %s",
+                            len(lot_links),
+                            next_page,
+                            sale_url
+                        )
+                        for lot_link in map(self.canonicalize_url, lot_links):
+                            if lot_link not in seen:
+                                seen.add(lot_link)
+                                yield lot_link
+                        next_page += 1
+
+            if not paginated and failed == len(batch):
+                # Nothing to tell whether the sale goes on, rather than probing forever
+                logging.warning(
+                    "Could not fetch pages %i to %i of %s, stopping.",
+                    batch[0],
+                    batch[-1],
+                    sale_url
+                )
+                return
+
+    @staticmethod
+    def sale_priority(closed: bool = False) -> int:
+        """Frontier priority for the listing pages of a sale, its lots get LOT_PRIORITY more."""
+        return CLOSED_SALE_PRIORITY if closed else LISTING_PRIORITY
+
+    @staticmethod
+    def is_listing_url(url: str) -> bool:
+        """Whether url is a page of a sale's lot listing rather than a lot page."""
+        return _LISTING_PATH.match(urlparse(url).path) is not None
+
+    def _expand_listing(
+            self,
+            frontier: "CrawlFrontier",
+            page_url: str,
+            priority: int,
+            lot_links: list[str],
+            last_page: int | None,
+        ):
+        """Adds the lots of a listing page and the listing pages after it to the frontier."""
+        if not lot_links:
+            return
+        frontier.add_many(lot_links, priority + LOT_PRIORITY)
+        page_query = parse_qs(urlparse(page_url).query).get("page", ["1"])[0]
+        page = int(page_query) if page_query.isdigit() else 1
+        sale_url = page_url.split("?", 1)[0]
+        # Without pagination links, probe one page further
+        next_pages = range(page + 1, (last_page or page + 1) + 1)
+        frontier.add_many((self.listing_page_url(sale_url, n) for n in next_pages), priority)
+
+    async def crawl_frontier(
+            self,
+            frontier: "CrawlFrontier",
+            max_in_flight: int | None = None,
+            parse_pool: "ParsePool | None" = None,
+        ) -> AsyncIterator[tuple[str, bytes]]:
+        """
+        Fetches URLs from the frontier in priority order, up to max_in_flight at
+        once, and yields (lot_url, raw HTML) for each lot page.
+
+        Listing pages are handled here: their lots and the listing pages after
+        them are added to the frontier, and they are marked done. Lot pages are
+        left for the caller to mark done once it has stored them. URLs that
+        can't be fetched stay pending for the next run.
+
+        Args:
+            frontier: Frontier seeded with sale URLs, e.g. frontier.add(sale_url, scraper.sale_priority()).
+            max_in_flight: Defaults to 4 * max_concurrency_per_host.
+            parse_pool: Optional ParsePool, listing pages are then parsed in worker processes.
+
+        Example Usage:
+            async with scraper:
+                async for lot_url, html_content in scraper.crawl_frontier(frontier):
+                    ...
+                    frontier.done(lot_url)
+        """
+        if max_in_flight is None:
+            max_in_flight = 4 * self.max_concurrency_per_host
+
+        async def fetch_one(url, priority):
+            if not self.is_listing_url(url):
+                return url, priority, await self.fetch_raw_async(url)
+            if parse_pool is None:
+                page = await self.fetch_page_async(url)
+            else:
+                page = await self.fetch_raw_async(url)
+            if page is None:
+                return url, priority, None
+            # (lot links, last page number), parsed while other fetches run
+            return url, priority, await self.parse_listing(page, url.split("?", 1)[0], parse_pool)
 
+        in_flight = self.metrics.stage_in_flight
+        pending: set[asyncio.Future] = set()
+        try:
+            while True:
+                while len(pending) < max_in_flight:
+                    popped = frontier.pop()
+                    if popped is None:
+                        break
+                    pending.add(asyncio.ensure_future(fetch_one(*popped)))
+                in_flight.set(len(pending), "fetch")
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, priority, page = task.result()
+                    if page is None:
+                        logging.warning("Failed to fetch %s, it stays in the frontier for the next run", url)
+                    elif self.is_listing_url(url):
+                        self._expand_listing(frontier, url, priority, *page)
+                        frontier.done(url)
+                    else:
+                        self.metrics.stage_items.inc(1, "fetch")
+                        yield url, page
+        finally:
+            for task in pending:
+                task.cancel()
+            in_flight.set(0, "fetch")
 
     # def parse_lot_data(lot_data):
     #     # Initialize a dictionary for results.
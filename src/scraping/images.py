@@ -0,0 +1,361 @@
+"""
+Content-addressed storage and concurrent download of lot photos.
+
+Images are streamed to disk in chunks over the scraper's pooled aiohttp
+session, within the same per-host concurrency limits and retries as page
+fetches, and stored under the sha256 of their content:
+
+    <root>/index.jsonl                       one StoredImage per line, latest line per URL wins
+    <root>/objects/ab/abcd....jpg            image files keyed by sha256
+    <root>/thumbnails/ab/abcd..._256.jpg     thumbnails, if made
+
+A URL already in the index isn't downloaded again, and an image whose content
+is already stored (a relisted lot, a shared stock photo) only adds an index
+line. Thumbnails are made in worker processes when a pool is given, which
+needs Pillow.
+"""
+
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import time
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Iterable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlparse
+
+from .pipeline import map_concurrently
+
+if TYPE_CHECKING:
+    from .guitar_auctions_scraper import GuitarAuctionScraper
+    from .parse_pool import ParsePool
+
+# Temporary files untouched for this long are partial downloads of a run that
+# died; downloads in progress write to theirs with every chunk
+STALE_TMP_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    """Metadata for one downloaded image. The file is stored separately by sha256."""
+    url: str
+    sha256: str
+    size: int
+    extension: str
+    content_type: str | None
+    fetched_at: str
+
+
+def _extension(content_type: str | None, url: str) -> str:
+    if content_type:
+        extension = mimetypes.guess_extension(content_type.split(";")[0].strip())
+        if extension:
+            return extension
+    return PurePosixPath(urlparse(url).path).suffix.lower()
+
+
+def make_thumbnail(source: str, destination: str, size: int) -> bool:
+    """
+    Worker function: writes a JPEG no larger than size x size pixels of the
+    image at source to destination. Returns False if source isn't a readable image.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    tmp_path = f"{destination}.tmp"
+    try:
+        with Image.open(source) as original:
+            # Lets JPEGs decode at a fraction of their full size
+            original.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((size, size))
+            image.convert("RGB").save(tmp_path, "JPEG", quality=85)
+    except (UnidentifiedImageError, OSError):
+        return False
+    os.replace(tmp_path, destination)
+    return True
+
+
+class ImageStore():
+    """
+    Append-only, content-addressed store of downloaded images on local disk.
+    Several processes can download into the same store, as long as only one
+    of them is appending to the index at a time.
+
+    Example Usage:
+        store = ImageStore("data/images")
+        image = store.latest(image_url)
+        if image is not None:
+            path = store.object_path(image)
+    """
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.thumbnails_dir = self.root / "thumbnails"
+        self.tmp_dir = self.root / "tmp"
+        self.index_path = self.root / "index.jsonl"
+        for directory in [self.objects_dir, self.thumbnails_dir, self.tmp_dir]:
+            directory.mkdir(parents=True, exist_ok=True)
+        self.remove_stale_tmp_files()
+        self._latest: dict[str, StoredImage] = {}
+        # sha256 -> extension of the stored file
+        self._objects: dict[str, str] = {}
+        self.duplicates = 0
+        self.bytes_deduplicated = 0
+        self._load_index()
+
+    def remove_stale_tmp_files(self, max_age: float = STALE_TMP_SECONDS) -> int:
+        """
+        Deletes the partial downloads of interrupted runs, leaving any that
+        another process is still writing to.
+
+        Returns:
+            Number of files deleted.
+        """
+        removed = 0
+        cutoff = time.time() - max_age
+        for tmp_path in self.tmp_dir.iterdir():
+            try:
+                if tmp_path.stat().st_mtime < cutoff:
+                    tmp_path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                # Finished or removed by another process meanwhile
+                pass
+        return removed
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        valid_bytes = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Truncated by a crash mid-write
+                    break
+                if line.strip():
+                    try:
+                        image = StoredImage(**json.loads(line))
+                    except json.JSONDecodeError:
+                        break
+                    self._latest[image.url] = image
+                    self._objects.setdefault(image.sha256, image.extension)
+                valid_bytes += len(line.encode("utf-8"))
+        # Drop a truncated tail so new records start on a fresh line
+        with open(self.index_path, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    def object_path(self, image: StoredImage) -> Path:
+        return self.objects_dir / image.sha256[:2] / f"{image.sha256}{image.extension}"
+
+    def thumbnail_path(self, image: StoredImage, size: int) -> Path:
+        return self.thumbnails_dir / image.sha256[:2] / f"{image.sha256}_{size}.jpg"
+
+    def temp_path(self) -> Path:
+        """A fresh path to download into, on the same filesystem as the objects."""
+        return self.tmp_dir / uuid.uuid4().hex
+
+    def add(
+            self,
+            url: str,
+            tmp_path: Path,
+            sha256: str,
+            size: int,
+            content_type: str | None = None,
+        ) -> tuple[StoredImage, bool]:
+        """
+        Moves a downloaded file into the store, or deletes it if the same content
+        is already stored, and appends an index record for url.
+
+        Returns:
+            (image, True if its content is new to the store).
+        """
+        extension = self._objects.get(sha256)
+        is_new = extension is None
+        if extension is None:
+            extension = _extension(content_type, url)
+        image = StoredImage(
+            url=url,
+            sha256=sha256,
+            size=size,
+            extension=extension,
+            content_type=content_type,
+            fetched_at=datetime.now(timezone.utc).isoformat(),
+        )
+        if is_new:
+            path = self.object_path(image)
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, path)
+            self._objects[sha256] = extension
+        else:
+            tmp_path.unlink()
+            self.duplicates += 1
+            self.bytes_deduplicated += size
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(image)) + "\n")
+        self._latest[url] = image
+        return image, is_new
+
+    def latest(self, url: str) -> StoredImage | None:
+        """Returns the stored image last downloaded from url, if any."""
+        return self._latest.get(url)
+
+    def stats(self) -> dict:
+        return {
+            "urls": len(self._latest),
+            "objects": len(self._objects),
+            "duplicates": self.duplicates,
+            "bytes_deduplicated": self.bytes_deduplicated,
+        }
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._latest
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+
+class ImageDownloader():
+    """
+    Downloads images into an ImageStore with a scraper's session, host limits and retries.
+
+    Concurrent requests for the same URL share one download. With a
+    thumbnail_pool (a ParsePool, whose workers run make_thumbnail), a
+    thumbnail_size thumbnail is made for every image new to the store.
+
+    Example Usage:
+        async with GuitarAuctionScraper() as scraper:
+            downloader = ImageDownloader(scraper, ImageStore("data/images"))
+            image = await downloader.download(image_url)
+    """
+
+    def __init__(
+            self,
+            scraper: "GuitarAuctionScraper",
+            store: ImageStore,
+            thumbnail_pool: "ParsePool | None" = None,
+            thumbnail_size: int = 256,
+            chunk_size: int = 64 * 1024,
+        ):
+        self.scraper = scraper
+        self.store = store
+        self.thumbnail_pool = thumbnail_pool
+        self.thumbnail_size = thumbnail_size
+        self.chunk_size = chunk_size
+        self._in_flight: dict[str, asyncio.Future] = {}
+        if thumbnail_pool is not None:
+            # Fail now rather than in every worker
+            import PIL  # noqa: F401
+
+    async def download(self, image_url: str) -> StoredImage | None:
+        """Returns the stored image for image_url, downloading it if it isn't stored yet."""
+        image_url = urljoin(self.scraper.base_url, image_url)
+        image = self.store.latest(image_url)
+        if image is not None:
+            self.scraper.metrics.image_downloads.inc(1, "stored")
+            return image
+        task = self._in_flight.get(image_url)
+        if task is None:
+            task = self._in_flight[image_url] = asyncio.ensure_future(self._download(image_url))
+            task.add_done_callback(lambda _: self._in_flight.pop(image_url, None))
+        return await task
+
+    async def _download(self, image_url: str) -> StoredImage | None:
+        tmp_path = self.store.temp_path()
+        try:
+            result = await self.scraper.download_async(image_url, tmp_path, chunk_size=self.chunk_size)
+            if result is None:
+                self.scraper.metrics.image_downloads.inc(1, "failed")
+                return None
+            headers, sha256, size = result
+            content_type = {name.lower(): value for name, value in headers.items()}.get("content-type")
+            image, is_new = self.store.add(image_url, tmp_path, sha256, size, content_type)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.scraper.metrics.image_downloads.inc(1, "new" if is_new else "duplicate")
+        if is_new and self.thumbnail_pool is not None:
+            await self.make_thumbnail(image)
+        return image
+
+    async def make_thumbnail(self, image: StoredImage) -> Path | None:
+        """Makes the thumbnail of a stored image in the pool, if it doesn't exist yet."""
+        if self.thumbnail_pool is None:
+            raise ValueError("Making thumbnails needs a thumbnail_pool")
+        path = self.store.thumbnail_path(image, self.thumbnail_size)
+        if path.exists():
+            return path
+        path.parent.mkdir(exist_ok=True)
+        with self.scraper.metrics.parse_seconds.time("thumbnail"):
+            made = await self.thumbnail_pool.run(
+                make_thumbnail, str(self.store.object_path(image)), str(path), self.thumbnail_size
+            )
+        if not made:
+            logging.warning("Could not make a thumbnail of %s", image.url)
+            return None
+        return path
+
+
+async def image_stage(
+        downloader: ImageDownloader,
+        lots: AsyncIterable[tuple[str, list[str]]],
+        concurrency: int = 8,
+    ) -> AsyncIterator[tuple[str, list[StoredImage | None]]]:
+    """
+    Downloads the images of each lot, up to concurrency lots at a time with
+    all of a lot's images requested at once (the scraper's host limits decide
+    how many are actually in flight).
+
+    Yields:
+        (lot_url, images) in completion order, images in the order of the
+        lot's image URLs with None for each failed download.
+    """
+    metrics = downloader.scraper.metrics
+
+    async def download_lot(lot_url, image_urls):
+        images = await asyncio.gather(*(downloader.download(image_url) for image_url in image_urls))
+        metrics.stage_items.inc(len(image_urls), "images")
+        return lot_url, images
+
+    async for result in map_concurrently(
+        lots,
+        download_lot,
+        concurrency,
+        lambda depth: metrics.stage_in_flight.set(depth, "images"),
+    ):
+        yield result
+
+
+async def download_lot_images(
+        scraper: "GuitarAuctionScraper",
+        lot_urls: Iterable[str],
+        downloader: ImageDownloader,
+        concurrency: int = 8,
+    ) -> AsyncIterator[tuple[str, list[StoredImage | None]]]:
+    """
+    Fetches lot pages (from the page cache if they were just scraped), extracts
+    their gallery links and downloads the images.
+
+    Yields:
+        (lot_url, images) for each lot page that could be fetched, with None
+        for each image that failed to download, as image_stage.
+
+    Example Usage:
+        async with GuitarAuctionScraper() as scraper:
+            downloader = ImageDownloader(scraper, ImageStore("data/images"))
+            async for lot_url, images in download_lot_images(scraper, lot_urls, downloader):
+                ...
+    """
+    async def image_links():
+        async for lot_url, html_content in scraper.fetch_many(lot_urls, raw=True):
+            if html_content is None:
+                logging.warning("Failed to fetch the lot page %s", lot_url)
+                continue
+            yield lot_url, scraper.get_lot_image_links(html_content, lot_url)
+
+    async for result in image_stage(downloader, image_links(), concurrency):
+        yield result
@@ -0,0 +1,130 @@
+"""
+JSON Lines storage of scraped records.
+
+Files are gzip-compressed when their name ends in .gz, read lazily, and
+written either in one go or appended to with periodic checkpoints. Kept
+free of scraping and database imports so offline tools load quickly.
+"""
+
+import gzip
+import json
+import logging
+import os
+from collections.abc import Iterable, Iterator
+
+
+def _open_jsonl(filename, mode):
+    """Opens a JSON Lines file, gzip-compressed if the filename ends in .gz."""
+    if str(filename).endswith(".gz"):
+        return gzip.open(filename, mode + "t", encoding="utf-8")
+    return open(filename, mode, encoding="utf-8")
+
+
+def _read_records(filename) -> Iterator[tuple[object, bool]]:
+    """
+    Yields (record, ok) pairs. ok is False once, at the end, if the file has a
+    truncated tail (e.g. from a crash mid-write).
+    """
+    try:
+        with _open_jsonl(filename, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    yield None, False
+                    return
+                yield record, True
+    except (EOFError, gzip.BadGzipFile):
+        yield None, False
+
+
+def load_data_from_disk(filename="scraped_data.jsonl") -> Iterator:
+    """
+    Lazily loads records from a JSON Lines file (gzip-compressed if it ends in .gz).
+
+    Yields:
+        One record per line, typically a [lot_url, entry] pair.
+    """
+    for record, ok in _read_records(filename):
+        if not ok:
+            logging.warning("Ignoring truncated record at the end of %s", filename)
+            return
+        yield record
+
+
+def save_data_to_disk(data: Iterable, filename="scraped_data.jsonl"):
+    """
+    Saves records to a JSON Lines file, writing each one as it is produced.
+
+    Parameters:
+      data: Any iterable of JSON-serialisable records, including a generator.
+      filename (str): The filename to write to, gzip-compressed if it ends in .gz.
+    """
+    with _open_jsonl(filename, "w") as f:
+        for record in data:
+            f.write(json.dumps(record) + "\n")
+
+
+class JsonlSink():
+    """
+    Appends records to a JSON Lines file and flushes them to disk every
+    checkpoint_every records.
+
+    On open, a truncated tail left by a crash is dropped so that appended
+    records stay readable.
+    """
+
+    def __init__(self, filename, checkpoint_every: int = 25):
+        self.filename = filename
+        self.checkpoint_every = checkpoint_every
+        self.records_written = 0
+        self._file = None
+
+    def open(self):
+        if os.path.exists(self.filename):
+            self._repair()
+        self._file = _open_jsonl(self.filename, "a")
+        return self
+
+    def _repair(self):
+        if all(ok for _, ok in _read_records(self.filename)):
+            return
+        logging.warning("Dropping truncated record at the end of %s", self.filename)
+        # Keep the suffix so the copy uses the same compression
+        head, tail = os.path.split(self.filename)
+        tmp_filename = os.path.join(head, f".tmp-{tail}")
+        save_data_to_disk(load_data_from_disk(self.filename), tmp_filename)
+        os.replace(tmp_filename, self.filename)
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self.records_written += 1
+        if self.records_written % self.checkpoint_every == 0:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Makes everything written so far durable."""
+        self._file.flush()
+        if not isinstance(self._file, gzip.GzipFile):
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def completed_lot_urls(filename) -> set[str]:
+    """Returns the lot URLs already present in an output file, for resuming."""
+    if not os.path.exists(filename):
+        return set()
+    return {record[0] for record in load_data_from_disk(filename)}
@@ -0,0 +1,342 @@
+"""
+Async LLM enrichment of scraped lots.
+
+Talks to an OpenAI-compatible chat-completions endpoint over a pooled aiohttp
+session, so it can be pointed at a local stand-in server (see
+benchmarks/fake_llm_server.py) for testing. Requests are limited by token
+buckets for requests and tokens per minute, and 429/5xx responses are retried
+with jittered exponential backoff.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING
+
+import aiohttp
+from dotenv import load_dotenv
+
+from .concurrency import RETRY_STATUSES, backoff_delay, retry_after_seconds
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    # LLMCache needs SQLAlchemy, which uncached callers shouldn't have to import
+    from .llm_cache import LLMCache
+
+DEFAULT_LLM_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_MODEL = "gpt-4o-mini"
+
+TITLE_SYSTEM = "You are an assistant that extracts structured guitar details from a title."
+TITLE_PROMPT = """
+    Extract the following fields from the guitar title and return a valid JSON object with keys "brand", "model", and "type".
+    Only use the following set of values for the "type" field: {{electric, hollow body electric, acoustic, bass}}.
+    If the guitar type in the title does not match any of these, return "other" for the type.
+
+    Examples:
+    Title: "Epiphone Les Paul Standard electric guitar"
+    Output: {{"brand": "Epiphone", "model": "Les Paul Standard", "type": "electric"}}
+
+    Title: "Gibson EB-5 five string bass guitar, made in USA"
+    Output: {{"brand": "Gibson", "model": "EB-5", "type": "electric"}}
+
+    Title: "Lowden F22 acoustic guitar, made in Ireland"
+    Output: {{"brand": "Lowden", "model": "F22", "type": "acoustic"}}
+
+    Title: "Heritage H-575 hollow body electric guitar, made in USA"
+    Output: {{"brand": "Heritage", "model": "H-575", "type": "hollow body electric"}}
+
+    Now, extract the fields from the following title:
+    "{title}"
+
+    RETURN ONLY A VALID JSON WITH THE SPECIFIED KEYS."""
+
+VALUATION_SYSTEM = "You are a market analyst who provides valuations for guitars"
+VALUATION_PROMPT = """
+    You are a market analyst specialized in evaluating guitars.
+    Evaluate the second-hand market value for the following guitar details:
+    {description}
+
+    Your valuation should:
+        - Focus on the UK market
+        - Take into account:
+            - Any information on condition
+            - The materials the guitar is made of
+            - Supplied accesories
+            - Desirability of the specific model
+            - Brand reputation
+            - Year of manufacture
+        - Include upper and lower value estimates for this market (in £s)
+        - Include a brief explanation of your evaluation, consisting of no more than 250 characters.
+
+    Use the high and low value estimates to define a range of possible values that reflects the confidence in your evaluation. The same value should not be repeated in both fields unless you are highly confident in your estimate!
+
+    Th output should be a valid JSON object of the following format:
+
+    {{
+        "value_estimate_low": <lower end of value estimate range>,
+        "value_estimate_high": <upper end of value estimate range>,
+        "rationale": <explanation of value estimate>
+    }}
+
+    RETURN ONLY A VALID JSON WITH THE SPECIFIED KEYS - THE RETURNED JSON OBJECT SHOULD BE PARSABLE USING THE json.loads METHOD."""
+
+
+class TokenBucket():
+    """
+    Async token bucket refilled continuously at rate_per_minute.
+
+    Callers wait in acquire() until enough tokens are available, in FIFO order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _estimate_tokens(*texts: str) -> int:
+    # Roughly 4 characters per token for English text
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+def _parse_json_content(content: str) -> dict:
+    content = content.strip()
+    if content.startswith("```"):
+        # Strip a markdown code fence, with or without a language tag
+        content = content.split("\n", 1)[-1].rsplit("```", 1)[0]
+    return json.loads(content)
+
+
+class LLMClient():
+    """
+    Rate-limited async client for an OpenAI-compatible chat-completions API.
+
+    Example Usage:
+        async with LLMClient(requests_per_minute=500, tokens_per_minute=200_000) as llm:
+            data = await llm.call_llm_for_json(system, prompt)
+    """
+
+    def __init__(
+            self,
+            base_url: str | None = None,
+            api_key: str | None = None,
+            model: str = DEFAULT_MODEL,
+            requests_per_minute: float = 500,
+            tokens_per_minute: float = 200_000,
+            max_retries: int = 5,
+            backoff_base: float = 1.0,
+            backoff_max: float = 60.0,
+            timeout: float = 60.0,
+            cache: "LLMCache | None" = None,
+            metrics: Metrics | None = None,
+        ):
+        load_dotenv()
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.request_limiter = TokenBucket(requests_per_minute)
+        self.token_limiter = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.cache = cache
+        # Pass the scraper's Metrics to report LLM latency and tokens alongside the crawl
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._session: aiohttp.ClientSession | None = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        """Seconds to wait before retry number attempt, honouring Retry-After."""
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after_seconds(retry_after))
+
+    async def complete(
+            self,
+            system: str,
+            prompt: str,
+            model: str | None = None,
+            temperature: float = 0.0,
+        ) -> str | None:
+        """Returns the content of the first completion choice, or None on failure."""
+        model = model or self.model
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": temperature,
+        }
+        session = await self._get_session()
+        for attempt in range(self.max_retries + 1):
+            await self.request_limiter.acquire()
+            await self.token_limiter.acquire(_estimate_tokens(system, prompt))
+            retry_after = None
+            # Timed from after the rate limiters so throttling by this client isn't counted
+            start = time.perf_counter()
+            status: int | str = "error"
+            try:
+                async with session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+                    status = response.status
+                    if response.status in RETRY_STATUSES:
+                        retry_after = response.headers.get("Retry-After")
+                        error = f"HTTP {response.status}"
+                    else:
+                        response.raise_for_status()
+                        data = await response.json()
+                        self.metrics.llm_request_seconds.observe(time.perf_counter() - start, model, status)
+                        content = data["choices"][0]["message"]["content"]
+                        if not isinstance(content, str):
+                            raise TypeError(f"content is {type(content).__name__}")
+                        usage = data.get("usage") or {}
+                        prompt_tokens = usage.get("prompt_tokens", 0)
+                        completion_tokens = usage.get("completion_tokens", 0)
+                        self.prompt_tokens += prompt_tokens
+                        self.completion_tokens += completion_tokens
+                        self.metrics.llm_tokens.inc(prompt_tokens, model, "prompt")
+                        self.metrics.llm_tokens.inc(completion_tokens, model, "completion")
+                        return content
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, aiohttp.ClientResponseError):
+                    # Non-retryable status, e.g. 400 or 401
+                    self.metrics.llm_request_seconds.observe(time.perf_counter() - start, model, status)
+                    logging.warning("Error calling LLM: %s", e)
+                    return None
+                error = str(e) or type(e).__name__
+            except (ValueError, LookupError, TypeError, AttributeError) as e:
+                # Not a chat completion, e.g. invalid JSON or no choices; retrying won't help
+                logging.warning("LLM returned a malformed response: %r", e)
+                return None
+            self.metrics.llm_request_seconds.observe(time.perf_counter() - start, model, status)
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            self.retries += 1
+            self.metrics.llm_retries.inc(1, model)
+            logging.info("LLM request failed (%s), retrying in %.1fs", error, delay)
+            await asyncio.sleep(delay)
+        logging.warning("Error calling LLM: giving up after %i attempts (%s)", self.max_retries + 1, error)
+        return None
+
+    async def call_llm_for_json(
+            self,
+            system: str,
+            prompt: str,
+            model: str | None = None,
+            temperature: float = 0.0,
+        ) -> dict:
+        """
+        Sends the prompt to the LLM and returns its response parsed as JSON, or {} on failure.
+
+        Responses are served from and stored in self.cache when one is set. Failures are
+        not cached.
+        """
+        model = model or self.model
+        if self.cache is not None:
+            key = self.cache.key(model, system, prompt, temperature)
+            # The cache is a database, keep it off the event loop
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+        content = await self.complete(system, prompt, model, temperature)
+        if content is None:
+            return {}
+        try:
+            data = _parse_json_content(content)
+        except json.JSONDecodeError as e:
+            logging.warning("LLM returned invalid JSON: %s", e)
+            return {}
+        if not isinstance(data, dict):
+            logging.warning("LLM returned a JSON %s instead of an object", type(data).__name__)
+            return {}
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.set, key, model, data)
+        return data
+
+    async def parse_title_with_llm(self, title: str) -> dict:
+        """Extracts 'brand', 'model' and 'type' from a guitar title."""
+        return await self.call_llm_for_json(TITLE_SYSTEM, TITLE_PROMPT.format(title=title))
+
+    async def get_llm_valuation(self, guitar_description: str) -> dict:
+        """Returns 'value_estimate_low', 'value_estimate_high' and 'rationale' for a guitar."""
+        return await self.call_llm_for_json(
+            VALUATION_SYSTEM,
+            VALUATION_PROMPT.format(description=guitar_description),
+            temperature=0.25,
+        )
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+class LLMEnricher():
+    """
+    Adds LLM title fields and valuation to parsed lot records.
+
+    Title parsing and valuation for one lot run concurrently, and at most
+    max_workers lots are enriched at once.
+
+    Example Usage:
+        llm = LLMClient()
+        enricher = LLMEnricher(llm, title_parser=TitleParser(llm=llm))
+        await scrape_lots(scraper, lot_urls, enrich=enricher.enrich, enrich_concurrency=16)
+    """
+
+    def __init__(self, client: LLMClient, max_workers: int = 16, title_parser=None):
+        self.client = client
+        # A TitleParser resolves most titles locally and only falls back to the LLM on misses
+        self.parse_title = title_parser.parse if title_parser is not None else client.parse_title_with_llm
+        self._workers = asyncio.Semaphore(max_workers)
+
+    async def enrich(self, record: dict) -> dict:
+        """
+        Returns record merged with the LLM title fields and valuation.
+
+        Uses record["title"] for title parsing and record["full_description"]
+        (or record["description"]) for the valuation.
+        """
+        description = record.get("full_description", record.get("description", ""))
+        async with self._workers:
+            if record.get("title"):
+                title_fields, valuation = await asyncio.gather(
+                    self.parse_title(record["title"]),
+                    self.client.get_llm_valuation(description),
+                )
+            else:
+                title_fields, valuation = {}, await self.client.get_llm_valuation(description)
+        return record | title_fields | valuation
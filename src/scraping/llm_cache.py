@@ -0,0 +1,139 @@
+import hashlib
+import json
+import re
+import time
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.engine import Engine
+
+from .db import LLMCacheEntry, get_engine, upsert
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LLMCache():
+    """
+    Persistent memoization of LLM JSON responses, stored in the llm_cache table.
+
+    Entries are keyed on a hash of (model, system, prompt, temperature). With
+    normalize=True, whitespace is collapsed and text lower-cased before hashing
+    so trivially different prompts share an entry. Entries older than ttl
+    seconds are misses, and the least recently used entries are pruned once
+    there are more than max_entries. An entry's last use is only written
+    back once it is more than touch_interval seconds old, so hits are
+    mostly read-only.
+
+    Calls block on the database, LLMClient makes them from a worker thread.
+
+    Example Usage:
+        cache = LLMCache(ttl=30 * 24 * 3600, max_entries=100_000)
+        llm = LLMClient(cache=cache)
+    """
+
+    def __init__(
+            self,
+            engine: Engine | None = None,
+            ttl: float | None = None,
+            max_entries: int | None = None,
+            normalize: bool = False,
+            prune_every: int = 1000,
+            touch_interval: float = 3600,
+        ):
+        self.engine = engine if engine is not None else get_engine()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.normalize = normalize
+        self.prune_every = prune_every
+        self.touch_interval = touch_interval
+        self._upsert = upsert(self.engine, LLMCacheEntry.__table__, ["key"])(
+            ["model", "response", "created_at", "last_used_at"]
+        )
+        self._sets_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _normalize(self, text: str) -> str:
+        return _WHITESPACE.sub(" ", text).strip().lower()
+
+    def key(self, model: str, system: str, prompt: str, temperature: float) -> str:
+        """Returns the cache key for an LLM call."""
+        if self.normalize:
+            system, prompt = self._normalize(system), self._normalize(prompt)
+        payload = json.dumps([model, system, prompt, temperature])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached response for key, or None on a miss."""
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(LLMCacheEntry.response, LLMCacheEntry.created_at, LLMCacheEntry.last_used_at)
+                .where(LLMCacheEntry.key == key)
+            ).first()
+            if row is None:
+                self.misses += 1
+                return None
+            if self.ttl is not None and now - row.created_at > self.ttl:
+                conn.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key == key))
+                self.expired += 1
+                self.misses += 1
+                return None
+            if now - row.last_used_at > self.touch_interval:
+                conn.execute(
+                    update(LLMCacheEntry)
+                    .where(LLMCacheEntry.key == key)
+                    .values(last_used_at=now)
+                )
+        self.hits += 1
+        return row.response
+
+    def set(self, key: str, model: str, response: dict):
+        """Stores a response, pruning the least recently used entries every prune_every sets."""
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(self._upsert, {
+                "key": key,
+                "model": model,
+                "response": response,
+                "created_at": now,
+                "last_used_at": now,
+            })
+        self._sets_since_prune += 1
+        bounded = self.max_entries is not None or self.ttl is not None
+        if bounded and self._sets_since_prune >= self.prune_every:
+            self.prune()
+
+    def prune(self):
+        """Deletes expired entries and the least recently used ones over max_entries."""
+        self._sets_since_prune = 0
+        with self.engine.begin() as conn:
+            if self.ttl is not None:
+                result = conn.execute(
+                    delete(LLMCacheEntry).where(LLMCacheEntry.created_at < time.time() - self.ttl)
+                )
+                self.expired += result.rowcount
+            if self.max_entries is None:
+                return
+            count = conn.execute(select(func.count()).select_from(LLMCacheEntry)).scalar()
+            excess = count - self.max_entries
+            if excess > 0:
+                oldest = (
+                    select(LLMCacheEntry.key)
+                    .order_by(LLMCacheEntry.last_used_at)
+                    .limit(excess)
+                )
+                result = conn.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(oldest)))
+                self.evictions += result.rowcount
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the cache counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
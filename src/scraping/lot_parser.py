@@ -0,0 +1,98 @@
+"""
+Parsing of lot descriptions and estimates into structured fields.
+
+Same output as parse_lot_data in guitar_auctions_v1 minus the LLM title
+fields, which are added by the enrichment stage. No network I/O happens here,
+so archived sales can be re-parsed in bulk, straight into a columnar LotBatch
+with parse_lot_data_batch.
+"""
+
+import re
+from collections.abc import Iterable
+
+from .models import Lot, LotBatch
+
+_ESTIMATE = re.compile(r"£(\d+)-(\d+)")
+_YEAR_TITLE = re.compile(r"^(?P<year>\d{4})\s+(?P<title>.+)$")
+_MADE_IN = re.compile(r"made in\s+([^,;]+)", re.IGNORECASE)
+
+SPEC_KEYS = frozenset([
+    "body", "neck", "fretboard", "frets", "electrics", "hardware", "case", "weight",
+    "overall condition",
+])
+
+def parse_lot_data(lot_data: dict) -> dict:
+    """
+    Parses the 'description' and 'estimate' of a lot page into structured fields.
+
+    The description is split on "*" into the body and trailing notes, and the body
+    on ";" into a summary ("[year] title, made in ...") followed by "key: value"
+    spec parts. Parts that aren't recognised specs are kept as notes.
+    """
+    result: dict = {}
+
+    match = _ESTIMATE.search(lot_data["estimate"])
+    if match:
+        result["estimate_low"] = int(match.group(1))
+        result["estimate_high"] = int(match.group(2))
+
+    description = lot_data["description"]
+    result["full_description"] = description
+
+    body, *notes = description.split("*")
+    if notes:
+        result["notes"] = [note for note in map(str.strip, notes) if note]
+
+    parts = [part for part in map(str.strip, body.split(";")) if part]
+    if not parts:
+        return result
+
+    summary = parts[0]
+    match = _YEAR_TITLE.match(summary)
+    if match:
+        result["year"] = match.group("year")
+        result["title"] = match.group("title")
+    else:
+        result["title"] = summary
+    made_in_match = _MADE_IN.search(summary)
+    if made_in_match:
+        result["made_in"] = made_in_match.group(1).strip()
+
+    for part in parts[1:]:
+        key, colon, value = part.partition(":")
+        key = key.strip().lower()
+        if colon and key in SPEC_KEYS:
+            value = value.strip()
+            if key == "weight":
+                try:
+                    result[key] = float(value.replace("kg", ""))
+                except ValueError:
+                    result.setdefault("notes", []).append(part)
+                continue
+            result[key] = value
+        else:
+            result.setdefault("notes", []).append(part)
+
+    return result
+
+
+def parse_lot_data_batch(records: Iterable) -> LotBatch:
+    """
+    Parses many [lot_url, entry] records into one LotBatch, a lot at a time,
+    so only the columns are held in memory.
+
+    Entries with a 'description' and 'estimate' get the fields of
+    parse_lot_data, overriding any they already had; the raw description and
+    estimate, and any other keys, are kept in extras. Other entries are added
+    as they are.
+
+    Example Usage:
+        batch = parse_lot_data_batch(load_data_from_disk("sale_249.jsonl.gz"))
+        estimates = np.frombuffer(batch.column("estimate_low"), dtype=np.int32)
+    """
+    batch = LotBatch()
+    for lot_url, entry in records:
+        if "description" in entry and "estimate" in entry:
+            entry = entry | parse_lot_data(entry)
+        batch.append(Lot.from_entry(lot_url, entry))
+    return batch
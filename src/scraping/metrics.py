@@ -0,0 +1,319 @@
+"""
+In-process metrics for the scraper, pipeline and LLM client.
+
+Counters, gauges and fixed-bucket histograms keyed by label values, cheap
+enough to leave on in production (an observation is a dict lookup, a bisect
+and a few additions under a lock). Snapshots come from Metrics.snapshot(),
+and the same data can be rendered in the Prometheus text format, written to
+a file for the node_exporter textfile collector, or served over HTTP.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from typing import TypeVar, cast
+
+PREFIX = "guitar_safari_"
+
+# Seconds, spanning cached lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric():
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: tuple) -> str:
+        return ",".join(f"{name}={value}" for name, value in zip(self.label_names, labels))
+
+    def snapshot(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+_MetricT = TypeVar("_MetricT", bound=_Metric)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+        if not self.label_names:
+            return values.get((), 0)
+        return {self._key(labels): value for labels, value in values.items()}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+        return [
+            f"{PREFIX}{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    """Value per label combination that can go up and down, e.g. a queue depth."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, amount: float = 1, *labels):
+        self.inc(-amount, *labels)
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values per label combination, counted into fixed buckets.
+
+    Snapshots include p50/p99 estimated by linear interpolation within buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        """Observes the duration of the with block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _quantile(self, counts: list[int], total: int, q: float) -> float:
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    # Above the largest bucket, nothing better to report than its bound
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        summaries = {}
+        for labels, (counts, total) in series.items():
+            count = sum(counts)
+            summaries[self._key(labels)] = {
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "p50": self._quantile(counts, count, 0.5),
+                "p99": self._quantile(counts, count, 0.99),
+            }
+        if not self.label_names:
+            return summaries.get("", {"count": 0, "sum": 0.0, "mean": 0.0, "p50": 0.0, "p99": 0.0})
+        return summaries
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = sorted(
+                ((labels, list(counts), total) for labels, (counts, total) in self._series.items()),
+                key=lambda item: tuple(map(str, item[0])),
+            )
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{PREFIX}{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+                )
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{PREFIX}{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{PREFIX}{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Metrics():
+    """
+    Registry of the metrics recorded by the scraper, pipeline and LLM client.
+
+    One instance can be shared between components (e.g. passed to both
+    GuitarAuctionScraper and LLMClient) so a single snapshot or dump covers a
+    whole run.
+
+    Example Usage:
+        metrics = Metrics()
+        async with GuitarAuctionScraper(metrics=metrics) as scraper, LLMClient(metrics=metrics) as llm:
+            ...
+        metrics.write_prometheus("/var/lib/node_exporter/guitar_safari.prom")
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._callbacks: list[Callable[["Metrics"], None]] = []
+
+        self.fetch_seconds = self.histogram(
+            "fetch_seconds", "Page fetch latency, including waiting for a per-host slot.", ("host", "status"))
+        self.fetch_bytes = self.counter(
+            "fetch_bytes_total", "Response body bytes downloaded.", ("host",))
+        self.fetch_retries = self.counter(
+            "fetch_retries_total", "Page fetches retried after a throttled or failed response.", ("host",))
+        self.host_concurrency_limit = self.gauge(
+            "host_concurrency_limit", "Current adaptive concurrency limit per host.", ("host",))
+        self.parse_seconds = self.histogram(
+            "parse_seconds", "Time spent parsing a page.", ("kind",))
+        self.cache_lookups = self.counter(
+            "cache_lookups_total", "Page cache lookups.", ("result",))
+        self.image_downloads = self.counter(
+            "image_downloads_total", "Images requested, by new, duplicate, stored or failed.", ("result",))
+        self.stage_in_flight = self.gauge(
+            "stage_in_flight", "Items being processed or waiting in a pipeline stage.", ("stage",))
+        self.stage_items = self.counter(
+            "stage_items_total", "Items that have passed through a pipeline stage.", ("stage",))
+        self.llm_request_seconds = self.histogram(
+            "llm_request_seconds", "LLM request latency per attempt.", ("model", "status"))
+        self.llm_tokens = self.counter(
+            "llm_tokens_total", "LLM tokens used, as reported by the API.", ("model", "kind"))
+        self.llm_retries = self.counter(
+            "llm_retries_total", "LLM requests retried.", ("model",))
+
+    def _register(self, metric: _MetricT) -> _MetricT:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+            return cast(_MetricT, existing)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            label_names: tuple[str, ...] = (),
+            buckets=DEFAULT_BUCKETS,
+        ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def add_callback(self, callback: Callable[["Metrics"], None]):
+        """
+        Registers callback(metrics), called before every snapshot or render, to
+        update gauges from state that's cheaper to read on demand (cache sizes,
+        queue lengths) than to track on every change.
+        """
+        self._callbacks.append(callback)
+
+    def _collect(self):
+        for callback in self._callbacks:
+            callback(self)
+
+    def snapshot(self) -> dict:
+        """
+        Returns {metric name: value}. Labelled metrics map "label=value,..." keys
+        to values, and histograms give count, sum, mean, p50 and p99.
+        """
+        self._collect()
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def to_prometheus(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        self._collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {PREFIX}{name} {metric.documentation}")
+            lines.append(f"# TYPE {PREFIX}{name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Writes the Prometheus text format to path, replacing it atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        """
+        Serves the Prometheus text format at http://host:port/metrics until the
+        returned aiohttp AppRunner is cleaned up.
+        """
+        # Imported here so recording metrics doesn't pay for the web server import
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(
+                text=self.to_prometheus(),
+                content_type="text/plain",
+                headers={"X-Content-Type-Options": "nosniff"},
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
@@ -0,0 +1,505 @@
+"""
+Typed, memory-compact records for scraped lots.
+
+Lot is a slotted dataclass with one typed attribute per column of the lots
+table, converting from and to the scraper's [lot_url, entry] JSON Lines
+records, SQL rows and Arrow tables. Categorical strings (type, brand, model,
+made in) and the keys of untyped extra fields are interned, so a sale's
+worth of "Fender" or "Electric Guitar" is stored once.
+
+LotBatch holds many lots column by column, with numbers in typed arrays and
+categorical columns dictionary-encoded, for bulk work over hundreds of
+thousands of historical lots. Its numeric columns support the buffer
+protocol, so they can be wrapped by NumPy without copying.
+
+Only the standard library is imported here; pyarrow is imported by the
+Arrow conversions when they are used.
+"""
+
+import json
+import math
+import re
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+
+# Columns of the lots table, in table order (scraped_at is set by the database)
+COLUMNS = (
+    "lot_url", "sale_id", "title", "type", "brand", "model", "year", "made_in", "weight",
+    "overall_condition", "estimate_low", "estimate_high", "value_estimate_low", "value_estimate_high",
+    "rationale", "body", "neck", "fretboard", "frets", "electrics", "hardware", "case", "notes",
+    "full_description",
+)
+
+# Low-cardinality string fields, interned in Lot and dictionary-encoded in LotBatch
+CATEGORY_FIELDS = ("type", "brand", "model", "made_in")
+
+# Integer fields and their array typecodes (int16 for year, int32 otherwise)
+INT_FIELDS = {
+    "sale_id": "i", "year": "h", "estimate_low": "i", "estimate_high": "i",
+    "value_estimate_low": "i", "value_estimate_high": "i",
+}
+
+TEXT_FIELDS = tuple(
+    name for name in COLUMNS if name not in CATEGORY_FIELDS and name not in INT_FIELDS
+    and name not in ("weight", "notes")
+)
+
+# Stands in for None in LotBatch's integer columns (weight uses NaN)
+MISSING = -1
+
+_SALE_ID = re.compile(r"/sale/(\d+)")
+
+# Keys used by the scraper's lot dicts that differ from the field names
+_KEY_TO_FIELD = {"overall condition": "overall_condition"}
+_FIELD_TO_KEY = {field: key for key, field in _KEY_TO_FIELD.items()}
+
+# Fields stored in a scraped lot dict, lot_url and sale_id come from the URL
+_ENTRY_FIELDS = tuple(name for name in COLUMNS if name not in ("lot_url", "sale_id"))
+_ENTRY_FIELD_SET = frozenset(_ENTRY_FIELDS)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_notes(value) -> tuple[str, ...] | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+
+def _to_str(value):
+    return value if isinstance(value, str) else None
+
+
+def sale_id_from_url(lot_url: str) -> int | None:
+    match = _SALE_ID.search(lot_url)
+    return int(match.group(1)) if match else None
+
+
+@dataclass(slots=True)
+class Lot():
+    """
+    One scraped lot, with the fields of the lots table.
+
+    Values that don't convert to their field's type (e.g. a year of "1960s")
+    are kept as given in extras, along with any keys that aren't columns, such
+    as the raw description and estimate. extras is None when there are none.
+
+    Example Usage:
+        lots = [Lot.from_record(record) for record in load_data_from_disk("sale_249.jsonl.gz")]
+        save_data_to_disk((lot.to_record() for lot in lots), "sale_249_copy.jsonl.gz")
+    """
+
+    lot_url: str
+    sale_id: int | None = None
+    title: str | None = None
+    type: str | None = None
+    brand: str | None = None
+    model: str | None = None
+    year: int | None = None
+    made_in: str | None = None
+    weight: float | None = None
+    overall_condition: str | None = None
+    estimate_low: int | None = None
+    estimate_high: int | None = None
+    value_estimate_low: int | None = None
+    value_estimate_high: int | None = None
+    rationale: str | None = None
+    body: str | None = None
+    neck: str | None = None
+    fretboard: str | None = None
+    frets: str | None = None
+    electrics: str | None = None
+    hardware: str | None = None
+    case: str | None = None
+    notes: tuple[str, ...] | None = None
+    full_description: str | None = None
+    scraped_at: datetime | None = None
+    extras: dict | None = None
+
+    def __post_init__(self):
+        for name in CATEGORY_FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, str):
+                setattr(self, name, sys.intern(value))
+
+    @classmethod
+    def from_entry(cls, lot_url: str, entry: dict, scraped_at: datetime | None = None) -> "Lot":
+        """Builds a Lot from a scraped lot dict, as stored in [lot_url, entry] records."""
+        values = {}
+        extras = {}
+        for key, value in entry.items():
+            name = _KEY_TO_FIELD.get(key, key)
+            if name not in _ENTRY_FIELD_SET:
+                extras[sys.intern(key)] = value
+                continue
+            if name in INT_FIELDS:
+                converted = _to_int(value)
+            elif name == "weight":
+                converted = _to_float(value)
+            elif name == "notes":
+                converted = _to_notes(value)
+            else:
+                converted = _to_str(value)
+            if converted is None and value is not None:
+                extras[sys.intern(key)] = value
+            values[name] = converted
+        return cls(
+            lot_url,
+            sale_id=sale_id_from_url(lot_url),
+            scraped_at=scraped_at,
+            extras=extras or None,
+            **values,
+        )
+
+    @classmethod
+    def from_record(cls, record: list) -> "Lot":
+        """Builds a Lot from a [lot_url, entry] JSON Lines record."""
+        lot_url, entry = record
+        return cls.from_entry(lot_url, entry)
+
+    def to_entry(self) -> dict:
+        """
+        Returns the scraper's lot dict, without lot_url and sale_id (which come
+        from the URL) and without fields that are None.
+        """
+        entry = {}
+        for name in _ENTRY_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                entry[_FIELD_TO_KEY.get(name, name)] = list(value) if name == "notes" else value
+        if self.extras:
+            entry.update(self.extras)
+        return entry
+
+    def to_record(self) -> list:
+        """Returns the [lot_url, entry] JSON Lines record."""
+        return [self.lot_url, self.to_entry()]
+
+    @classmethod
+    def from_row(cls, row: Mapping) -> "Lot":
+        """Builds a Lot from a lots table row mapping, e.g. a SQLAlchemy Row's _mapping."""
+        values = {name: row[name] for name in COLUMNS if name in row}
+        values["notes"] = _to_notes(values.get("notes"))
+        return cls(scraped_at=row.get("scraped_at"), **values)
+
+    def to_row(self) -> dict:
+        """Returns a row for the lots table, with a value for every column except scraped_at."""
+        row = {name: getattr(self, name) for name in COLUMNS}
+        if self.notes is not None:
+            row["notes"] = list(self.notes)
+        return row
+
+
+_LOT_FIELDS = tuple(field.name for field in fields(Lot))
+
+
+class LotBatch():
+    """
+    Many lots stored column by column.
+
+    Integer columns are array('h') / array('i') with MISSING for None, weight
+    is array('d') with NaN for None and scraped_at is array('q') of epoch
+    milliseconds. Categorical columns are int32 codes into a list of distinct
+    values (MISSING for None), and the remaining columns are lists. A lot costs
+    a few dozen bytes plus its text, against well over a kilobyte as a dict.
+
+    Example Usage:
+        batch = LotBatch.from_records(load_data_from_disk("history.jsonl.gz"))
+        fenders = batch.take(batch.where(brand="Fender"))
+        estimates = np.frombuffer(fenders.column("estimate_low"), dtype=np.int32)
+    """
+
+    def __init__(self):
+        self._ints = {name: array(typecode) for name, typecode in INT_FIELDS.items()}
+        self._weight = array("d")
+        self._scraped_at = array("q")
+        self._codes = {name: array("i") for name in CATEGORY_FIELDS}
+        self._categories: dict[str, list[str]] = {name: [] for name in CATEGORY_FIELDS}
+        self._category_index: dict[str, dict[str, int]] = {name: {} for name in CATEGORY_FIELDS}
+        self._text: dict[str, list] = {name: [] for name in TEXT_FIELDS}
+        self._notes: list[tuple[str, ...] | None] = []
+        self._extras: list[dict | None] = []
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def _code(self, name: str, value: str | None) -> int:
+        if value is None:
+            return MISSING
+        index = self._category_index[name]
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self._categories[name])
+            self._categories[name].append(sys.intern(value))
+        return code
+
+    def append(self, lot: Lot):
+        for name, column in self._ints.items():
+            value = getattr(lot, name)
+            column.append(MISSING if value is None else value)
+        self._weight.append(math.nan if lot.weight is None else lot.weight)
+        self._scraped_at.append(
+            MISSING if lot.scraped_at is None else round(lot.scraped_at.timestamp() * 1000)
+        )
+        for name, codes in self._codes.items():
+            codes.append(self._code(name, getattr(lot, name)))
+        for name, column in self._text.items():
+            column.append(getattr(lot, name))
+        self._notes.append(lot.notes)
+        self._extras.append(lot.extras)
+
+    def extend(self, lots: Iterable[Lot]):
+        for lot in lots:
+            self.append(lot)
+
+    @classmethod
+    def from_lots(cls, lots: Iterable[Lot]) -> "LotBatch":
+        batch = cls()
+        batch.extend(lots)
+        return batch
+
+    def __getitem__(self, index: int) -> Lot:
+        values = {name: column[index] for name, column in self._text.items()}
+        for name, column in self._ints.items():
+            value = column[index]
+            values[name] = None if value == MISSING else value
+        weight = self._weight[index]
+        values["weight"] = None if math.isnan(weight) else weight
+        scraped_at = self._scraped_at[index]
+        if scraped_at != MISSING:
+            values["scraped_at"] = datetime.fromtimestamp(scraped_at / 1000, timezone.utc)
+        for name, codes in self._codes.items():
+            code = codes[index]
+            values[name] = None if code == MISSING else self._categories[name][code]
+        values["notes"] = self._notes[index]
+        values["extras"] = self._extras[index]
+        return Lot(**values)
+
+    def __iter__(self) -> Iterator[Lot]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name: str):
+        """
+        Returns a column: the backing array for numeric columns (shared, not
+        copied), decoded values for categorical ones and the backing list otherwise.
+        """
+        if name in self._ints:
+            return self._ints[name]
+        if name == "weight":
+            return self._weight
+        if name == "scraped_at":
+            return self._scraped_at
+        if name in self._codes:
+            categories = self._categories[name]
+            return [None if code == MISSING else categories[code] for code in self._codes[name]]
+        if name in self._text:
+            return self._text[name]
+        if name == "notes":
+            return self._notes
+        if name == "extras":
+            return self._extras
+        raise KeyError(name)
+
+    def codes(self, name: str) -> tuple[array, list[str]]:
+        """Returns the codes and distinct values of a categorical column."""
+        return self._codes[name], self._categories[name]
+
+    def where(self, **values) -> list[int]:
+        """
+        Indices of the lots whose categorical fields equal all the given values,
+        compared as integer codes.
+
+        Example Usage:
+            indices = batch.where(brand="Gibson", model="Les Paul Standard")
+        """
+        wanted = []
+        for name, value in values.items():
+            code = self._category_index[name].get(value)
+            if code is None:
+                return []
+            wanted.append((self._codes[name], code))
+        if not wanted:
+            return list(range(len(self)))
+        (first, first_code), *rest = wanted
+        return [
+            index for index, code in enumerate(first)
+            if code == first_code and all(codes[index] == other for codes, other in rest)
+        ]
+
+    def take(self, indices: Iterable[int]) -> "LotBatch":
+        """Returns a new batch of the lots at indices, sharing the category values."""
+        indices = list(indices)
+        batch = LotBatch()
+        for name, column in self._ints.items():
+            batch._ints[name] = array(column.typecode, [column[index] for index in indices])
+        batch._weight = array("d", [self._weight[index] for index in indices])
+        batch._scraped_at = array("q", [self._scraped_at[index] for index in indices])
+        for name, codes in self._codes.items():
+            batch._codes[name] = array("i", [codes[index] for index in indices])
+            batch._categories[name] = list(self._categories[name])
+            batch._category_index[name] = dict(self._category_index[name])
+        for name, column in self._text.items():
+            batch._text[name] = [column[index] for index in indices]
+        batch._notes = [self._notes[index] for index in indices]
+        batch._extras = [self._extras[index] for index in indices]
+        return batch
+
+    @classmethod
+    def from_records(cls, records: Iterable) -> "LotBatch":
+        """Builds a batch from [lot_url, entry] records, e.g. from load_data_from_disk."""
+        return cls.from_lots(Lot.from_record(record) for record in records)
+
+    def to_records(self) -> Iterator[list]:
+        """Yields [lot_url, entry] records, e.g. for save_data_to_disk."""
+        for lot in self:
+            yield lot.to_record()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping]) -> "LotBatch":
+        """
+        Builds a batch from lots table row mappings.
+
+        Example Usage:
+            with get_engine().connect() as conn:
+                batch = LotBatch.from_rows(conn.execute(select(db.Lot.__table__)).mappings())
+        """
+        return cls.from_lots(Lot.from_row(row) for row in rows)
+
+    def to_rows(self) -> Iterator[dict]:
+        """Yields rows for the lots table."""
+        for lot in self:
+            yield lot.to_row()
+
+    def to_arrow(self, include_extras: bool = True):
+        """
+        Returns a pyarrow Table with a column per Lot field. Numeric columns are
+        copied in one block each (wrapping the arrays would pin them, so the
+        batch couldn't grow while the table is alive), categorical columns
+        become dictionary arrays over the codes, and extras is JSON text (left
+        out, as the slowest column to convert, unless include_extras).
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def numeric(values: array, arrow_type):
+            data = pa.py_buffer(values.tobytes())
+            wrapped = pa.Array.from_buffers(arrow_type, len(values), [None, data])
+            if arrow_type == pa.float64():
+                valid = pc.invert(pc.is_nan(wrapped))
+            else:
+                valid = pc.not_equal(wrapped, MISSING)
+            # A boolean array without nulls is a ready-made validity bitmap
+            return pa.Array.from_buffers(arrow_type, len(values), [valid.buffers()[1], data])
+
+        int_types = {"h": pa.int16(), "i": pa.int32()}
+        columns = {}
+        for name in _LOT_FIELDS:
+            if name in self._ints:
+                column = self._ints[name]
+                columns[name] = numeric(column, int_types[column.typecode])
+            elif name == "weight":
+                columns[name] = numeric(self._weight, pa.float64())
+            elif name == "scraped_at":
+                columns[name] = numeric(self._scraped_at, pa.int64()).cast(pa.timestamp("ms", tz="UTC"))
+            elif name in self._codes:
+                columns[name] = pa.DictionaryArray.from_arrays(
+                    numeric(self._codes[name], pa.int32()),
+                    pa.array(self._categories[name], pa.string()),
+                )
+            elif name in self._text:
+                columns[name] = pa.array(self._text[name], pa.string())
+            elif name == "notes":
+                columns[name] = pa.array(
+                    [None if notes is None else list(notes) for notes in self._notes],
+                    pa.list_(pa.string()),
+                )
+            elif include_extras:
+                columns[name] = pa.array(
+                    [None if extras is None else json.dumps(extras) for extras in self._extras],
+                    pa.string(),
+                )
+        return pa.table(columns)
+
+    @classmethod
+    def from_arrow(cls, table) -> "LotBatch":
+        """
+        Builds a batch from a pyarrow Table, e.g. from to_arrow or a Parquet
+        dataset. Columns that aren't Lot fields are ignored and missing ones are
+        None; lot_url is required.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        def to_array(column, typecode: str, arrow_type, fill) -> array:
+            values = pc.fill_null(column.cast(arrow_type), fill).combine_chunks()
+            result = array(typecode)
+            if len(values):
+                start = values.offset * result.itemsize
+                result.frombytes(memoryview(values.buffers()[1])[start:start + len(values) * result.itemsize])
+            return result
+
+        batch = cls()
+        length = table.num_rows
+        names = set(table.column_names)
+        int_types = {"h": pa.int16(), "i": pa.int32()}
+        for name, typecode in INT_FIELDS.items():
+            if name in names:
+                batch._ints[name] = to_array(table.column(name), typecode, int_types[typecode], MISSING)
+            else:
+                batch._ints[name] = array(typecode, [MISSING]) * length
+        if "weight" in names:
+            batch._weight = to_array(table.column("weight"), "d", pa.float64(), math.nan)
+        else:
+            batch._weight = array("d", [math.nan]) * length
+        if "scraped_at" in names:
+            milliseconds = table.column("scraped_at").cast(pa.timestamp("ms", tz="UTC")).cast(pa.int64())
+            batch._scraped_at = to_array(milliseconds, "q", pa.int64(), MISSING)
+        else:
+            batch._scraped_at = array("q", [MISSING]) * length
+        for name in CATEGORY_FIELDS:
+            if name not in names:
+                batch._codes[name] = array("i", [MISSING]) * length
+                continue
+            column = table.column(name)
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column)
+            column = column.unify_dictionaries()
+            categories = column.chunk(0).dictionary.to_pylist() if column.num_chunks else []
+            indices = pa.chunked_array(
+                [chunk.indices for chunk in column.chunks], column.type.index_type
+            )
+            batch._codes[name] = to_array(indices, "i", pa.int32(), MISSING)
+            batch._categories[name] = [sys.intern(category) for category in categories]
+            batch._category_index[name] = {category: code for code, category in enumerate(categories)}
+        for name in TEXT_FIELDS:
+            batch._text[name] = table.column(name).to_pylist() if name in names else [None] * length
+        if "notes" in names:
+            batch._notes = [_to_notes(notes) for notes in table.column("notes").to_pylist()]
+        else:
+            batch._notes = [None] * length
+        if "extras" in names:
+            batch._extras = [
+                None if extras is None else {sys.intern(key): value for key, value in json.loads(extras).items()}
+                for extras in table.column("extras").to_pylist()
+            ]
+        else:
+            batch._extras = [None] * length
+        return batch
@@ -0,0 +1,75 @@
+"""
+Process pool for CPU-bound HTML parsing.
+
+Fetchers hand raw HTML bytes to worker processes, which parse them and return
+plain dicts and lists instead of parse trees, so parsing scales across cores
+instead of contending for the GIL with the event loop.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .parsing import (
+    extract_base_href,
+    extract_last_page_number,
+    extract_lot_details,
+    extract_lot_links,
+    parse_tree,
+)
+
+
+def parse_listing_html(html_content: bytes, base_url: str, sale_url: str | None = None) -> dict:
+    """
+    Worker function: lot links, <base> href and, given the sale_url, last
+    linked page number (None without pagination) of a sale listing page.
+    """
+    tree = parse_tree(html_content)
+    return {
+        "lot_links": extract_lot_links(tree, base_url),
+        "base_href": extract_base_href(tree),
+        "last_page": extract_last_page_number(tree, sale_url) if sale_url is not None else None,
+    }
+
+
+def parse_lot_html(html_content: bytes) -> dict:
+    """Worker function: description and estimate of a lot detail page."""
+    return extract_lot_details(html_content)
+
+
+class ParsePool():
+    """
+    Runs the parse functions above in a ProcessPoolExecutor from async code.
+
+    max_pending is the number of pages callers should keep in flight to keep
+    every worker busy, the pipeline uses it to size its parse window.
+
+    Example Usage:
+        with ParsePool() as pool:
+            await scrape_lots(scraper, lot_urls, parse_pool=pool)
+    """
+
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self._executor = ProcessPoolExecutor(self.max_workers)
+
+    async def run(self, func, *args):
+        """Runs func(*args) in a worker process."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def parse_listing(self, html_content: bytes, base_url: str, sale_url: str | None = None) -> dict:
+        return await self.run(parse_listing_html, html_content, base_url, sale_url)
+
+    async def parse_lot(self, html_content: bytes) -> dict:
+        return await self.run(parse_lot_html, html_content)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
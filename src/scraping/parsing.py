@@ -0,0 +1,165 @@
+"""
+Fast extraction of the few elements the scrapers need from a page.
+
+Each function accepts raw HTML (str or bytes), an lxml tree from parse_tree, or an
+already-parsed BeautifulSoup object, so a document never has to be parsed twice.
+Raw HTML is parsed with lxml and queried with precompiled XPath expressions, which is
+several times faster than building a BeautifulSoup tree.
+"""
+
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import lxml.html
+from bs4 import BeautifulSoup
+from lxml import etree
+
+LOT_CELL_CLASS = "cell large-3 medium-3 small-12"
+DESCRIPTION_CLASS = "cell large-7 medium-3 small-12"
+GALLERY_SLIDE_CLASS = "orbit-slide"
+
+_BASE_HREF = etree.XPath("(//base)[1]/@href")
+_LINK_HREFS = etree.XPath("//a/@href")
+_LOT_CELLS = etree.XPath(f"//div[@class='{LOT_CELL_CLASS}']")
+_FIRST_ANCHOR = etree.XPath("(.//a)[1]")
+_DESCRIPTION_CONTAINER = etree.XPath(f"(//div[@class='{DESCRIPTION_CLASS}'])[1]")
+_ESTIMATE_CANDIDATES = etree.XPath("//p[contains(., 'Estimate:')]")
+_GALLERY_IMAGE_SRCS = etree.XPath(
+    f"//li[contains(concat(' ', normalize-space(@class), ' '), ' {GALLERY_SLIDE_CLASS} ')]//img/@src"
+)
+
+
+def parse_tree(html_content) -> lxml.html.HtmlElement:
+    """Parses raw HTML into an lxml tree."""
+    if isinstance(html_content, str):
+        # lxml refuses str input that carries an XML encoding declaration
+        html_content = html_content.encode("utf-8")
+    return lxml.html.document_fromstring(html_content)
+
+
+def _as_tree(document):
+    if isinstance(document, (BeautifulSoup, lxml.html.HtmlElement)):
+        return document
+    return parse_tree(document)
+
+
+def extract_base_href(document) -> str | None:
+    """Returns the href of the first <base> tag, if present."""
+    tree = _as_tree(document)
+    if isinstance(tree, BeautifulSoup):
+        base_tag = tree.find("base")
+        return str(base_tag["href"]) if base_tag and base_tag.get("href") else None
+    hrefs = _BASE_HREF(tree)
+    return str(hrefs[0]) if hrefs and hrefs[0] else None
+
+
+def extract_lot_links(document, base_url: str) -> list[str]:
+    """Returns full URLs of the first link in each lot cell of a sale listing page."""
+    tree = _as_tree(document)
+    lot_links = []
+    if isinstance(tree, BeautifulSoup):
+        for cell in tree.find_all("div", class_=LOT_CELL_CLASS):
+            a_tag = cell.find("a")
+            if a_tag and a_tag.get("href"):
+                lot_links.append(urljoin(base_url, str(a_tag["href"])))
+        return lot_links
+    for cell in _LOT_CELLS(tree):
+        anchors = _FIRST_ANCHOR(cell)
+        if anchors and anchors[0].get("href"):
+            lot_links.append(urljoin(base_url, str(anchors[0].get("href"))))
+    return lot_links
+
+
+def extract_last_page_number(document, sale_url: str) -> int | None:
+    """
+    Returns the highest page number linked from the pagination of a sale listing
+    page, counting only links back to the same sale, or None if there are none.
+    """
+    tree = _as_tree(document)
+    if isinstance(tree, BeautifulSoup):
+        hrefs = [str(a["href"]) for a in tree.find_all("a", href=True)]
+    else:
+        hrefs = [str(href) for href in _LINK_HREFS(tree)]
+    sale_path = urlparse(sale_url).path
+    last_page = None
+    for href in hrefs:
+        if "page=" not in href:
+            continue
+        link = urlparse(urljoin(sale_url, href))
+        if link.path != sale_path:
+            continue
+        for value in parse_qs(link.query).get("page", []):
+            if value.isdigit():
+                last_page = max(last_page or 0, int(value))
+    return last_page
+
+
+def extract_lot_image_links(document, base_url: str) -> list[str]:
+    """Returns full URLs of the photos in a lot page's gallery, in order and without repeats."""
+    tree = _as_tree(document)
+    if isinstance(tree, BeautifulSoup):
+        srcs = [
+            str(img["src"])
+            for slide in tree.find_all("li", class_=GALLERY_SLIDE_CLASS)
+            for img in slide.find_all("img", src=True)
+        ]
+    else:
+        srcs = [str(src) for src in _GALLERY_IMAGE_SRCS(tree)]
+    return list(dict.fromkeys(urljoin(base_url, src) for src in srcs if src))
+
+
+def _single_string(element) -> str | None:
+    """lxml equivalent of BeautifulSoup's Tag.string: the text of a lone descendant string."""
+    while True:
+        if len(element) == 0:
+            return element.text
+        if len(element) > 1 or element.text or element[0].tail:
+            return None
+        element = element[0]
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions
+            return None
+
+
+def extract_lot_details(document) -> dict:
+    """
+    Returns the 'description' and 'estimate' of a lot detail page.
+
+    The description is the first text node directly inside the
+    <div class="cell large-7 medium-3 small-12"> container and the estimate is
+    the text of the first <p> whose string contains "Estimate:".
+    """
+    tree = _as_tree(document)
+    if isinstance(tree, BeautifulSoup):
+        return _extract_lot_details_soup(tree)
+
+    description = ""
+    containers = _DESCRIPTION_CONTAINER(tree)
+    if containers:
+        container = containers[0]
+        text_nodes = [container.text] + [child.tail for child in container]
+        description_node = next((text for text in text_nodes if text is not None), None)
+        if description_node:
+            description = description_node.strip()
+
+    estimate = "Not found"
+    for p in _ESTIMATE_CANDIDATES(tree):
+        text = _single_string(p)
+        if text and "Estimate:" in text:
+            estimate = text.strip()
+            break
+
+    return {"description": description, "estimate": estimate}
+
+
+def _extract_lot_details_soup(soup: BeautifulSoup) -> dict:
+    container = soup.find("div", class_=DESCRIPTION_CLASS)
+    description = ""
+    if container:
+        description_node = container.find(string=True, recursive=False)
+        if description_node:
+            description = description_node.strip()
+
+    estimate_tag = soup.find("p", string=lambda text: text and "Estimate:" in text)
+    estimate = estimate_tag.get_text(strip=True) if estimate_tag else "Not found"
+
+    return {"description": description, "estimate": estimate}
@@ -0,0 +1,323 @@
+"""
+Streaming scrape pipeline: fetch -> parse -> enrich -> sink.
+
+Every stage is an async generator that handles one lot at a time, and the sink
+appends each record to a JSON Lines file as soon as it is produced, so memory
+stays flat regardless of sale size and a crash loses at most the records since
+the last checkpoint. Re-running with the same output file resumes after the
+last completed lot.
+
+Records keep the [lot_url, entry] layout written by guitar_auctions_v1.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
+from typing import TYPE_CHECKING
+
+# load_data_from_disk and save_data_to_disk are re-exported for existing callers
+from .jsonl import JsonlSink, completed_lot_urls, load_data_from_disk, save_data_to_disk  # noqa: F401
+from .metrics import Metrics
+
+if TYPE_CHECKING:
+    # Only needed for annotations, importing them would pull in aiohttp, bs4 and
+    # SQLAlchemy for callers that only use the JSON Lines or enrichment parts
+    from bs4 import BeautifulSoup
+
+    from .frontier import CrawlFrontier
+    from .guitar_auctions_scraper import GuitarAuctionScraper
+    from .parse_pool import ParsePool
+    from .relistings import RelistingIndex
+    from .state import LotStateStore
+    from .writer import LotWriter
+
+
+async def map_concurrently(
+        items: AsyncIterable,
+        func: Callable,
+        concurrency: int,
+        report_in_flight: Callable[[int], None] | None = None,
+    ) -> AsyncIterator:
+    """
+    Yields await func(*item) for each item, with up to concurrency calls running at once.
+
+    Further items are pulled from upstream while calls run and results are yielded
+    in completion order. Upstream is only pulled when there is room, which applies
+    backpressure to earlier stages. report_in_flight, if given, is called with the
+    number of running calls whenever it changes.
+    """
+    upstream = aiter(items)
+
+    async def next_item():
+        try:
+            return await anext(upstream)
+        except StopAsyncIteration:
+            return None
+
+    pending: set[asyncio.Future] = set()
+    pulling: asyncio.Future | None = None
+    exhausted = False
+    try:
+        while True:
+            if pulling is None and not exhausted and len(pending) < concurrency:
+                pulling = asyncio.ensure_future(next_item())
+            waiting = (pending | {pulling}) if pulling is not None else pending
+            if not waiting:
+                return
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if pulling is not None and pulling in done:
+                item = pulling.result()
+                if item is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.ensure_future(func(*item)))
+                pulling = None
+            finished = done & pending
+            pending -= finished
+            if report_in_flight is not None:
+                report_in_flight(len(pending))
+            for task in finished:
+                yield task.result()
+    finally:
+        for task in pending | ({pulling} if pulling is not None else set()):
+            task.cancel()
+        if report_in_flight is not None:
+            report_in_flight(0)
+
+
+async def fetch_stage(
+        scraper: "GuitarAuctionScraper",
+        lot_urls: Iterable[str],
+        raw: bool = False,
+    ) -> AsyncIterator[tuple[str, "BeautifulSoup | bytes"]]:
+    """
+    Fetches lot pages concurrently, yielding (lot_url, page) as they arrive.
+
+    page is a BeautifulSoup object, or the raw HTML bytes if raw is True.
+    """
+    fetched = scraper.metrics.stage_items
+    async for lot_url, page in scraper.fetch_many(lot_urls, raw=raw):
+        if page is None:
+            logging.warning("Failed to fetch the lot page %s", lot_url)
+            continue
+        fetched.inc(1, "fetch")
+        yield lot_url, page
+
+
+async def parse_stage(
+        scraper: "GuitarAuctionScraper",
+        pages: AsyncIterable[tuple[str, "BeautifulSoup | bytes"]],
+        state: "LotStateStore | None" = None,
+        parse_pool: "ParsePool | None" = None,
+        on_skip: Callable[[str], None] | None = None,
+    ) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Extracts the description and estimate of each lot page, along with the
+    fields lot_parser.parse_lot_data parses from them.
+
+    With a parse_pool, pages must be raw HTML and are parsed in worker processes,
+    parse_pool.max_pending at a time. If state is given, lots whose content is
+    unchanged since they were last enriched are dropped here, and on_skip, if
+    given, is called with the URL of each.
+    """
+    from .lot_parser import parse_lot_data
+
+    if state is not None:
+        from .state import content_hash
+    if parse_pool is None:
+        async def parsed():
+            async for lot_url, soup in pages:
+                yield lot_url, scraper.parse_lot_page(soup)
+    else:
+        async def parse_one(lot_url, html_content):
+            # Includes time spent waiting for a free worker
+            start = time.perf_counter()
+            lot_data = await parse_pool.parse_lot(html_content)
+            metrics.parse_seconds.observe(time.perf_counter() - start, "lot_pool")
+            return lot_url, lot_data
+
+        def parsed():
+            return map_concurrently(
+                pages,
+                parse_one,
+                parse_pool.max_pending,
+                lambda depth: metrics.stage_in_flight.set(depth, "parse"),
+            )
+
+    metrics = scraper.metrics
+    async for lot_url, lot_data in parsed():
+        metrics.stage_items.inc(1, "parse")
+        if state is not None:
+            lot_hash = content_hash(lot_data)
+            state.record_fetch(lot_url, lot_hash)
+            if state.pending() >= state.batch_size:
+                await asyncio.to_thread(state.flush)
+            if not state.needs_enrichment(lot_url, lot_hash):
+                logging.info("Skipping unchanged lot %s", lot_url)
+                if on_skip is not None:
+                    on_skip(lot_url)
+                continue
+        if "description" in lot_data and "estimate" in lot_data:
+            # Records get their structured fields whether or not they're enriched
+            lot_data = lot_data | parse_lot_data(lot_data)
+        yield lot_url, lot_data
+
+
+async def enrich_stage(
+        lots: AsyncIterable[tuple[str, dict]],
+        enrich: Callable | None = None,
+        concurrency: int = 1,
+        metrics: Metrics | None = None,
+    ) -> AsyncIterator[tuple[str, dict, dict]]:
+    """
+    Applies enrich(lot_data) to each lot. enrich may be sync or async.
+
+    With concurrency > 1, up to that many async enrich calls run at once while
+    further lots are pulled from upstream, and results are yielded in completion
+    order. If metrics is given, enriched lots and calls in flight are recorded.
+
+    Yields:
+        (lot_url, lot_data, record) tuples, record being the enriched lot_data.
+    """
+    async def run(lot_url, lot_data):
+        record = lot_data
+        if enrich is not None:
+            record = enrich(lot_data)
+            if asyncio.iscoroutine(record):
+                record = await record
+        if metrics is not None:
+            metrics.stage_items.inc(1, "enrich")
+        return lot_url, lot_data, record
+
+    if concurrency <= 1:
+        async for lot_url, lot_data in lots:
+            yield await run(lot_url, lot_data)
+        return
+
+    report_in_flight = None
+    if metrics is not None:
+        report_in_flight = lambda depth: metrics.stage_in_flight.set(depth, "enrich")
+    async for result in map_concurrently(lots, run, concurrency, report_in_flight):
+        yield result
+
+
+async def scrape_lots(
+        scraper: "GuitarAuctionScraper",
+        lot_urls: Iterable[str],
+        filename="scraped_data.jsonl",
+        enrich: Callable | None = None,
+        state: "LotStateStore | None" = None,
+        writer: "LotWriter | None" = None,
+        checkpoint_every: int = 25,
+        resume: bool = True,
+        enrich_concurrency: int = 1,
+        parse_pool: "ParsePool | None" = None,
+        frontier: "CrawlFrontier | None" = None,
+        relistings: "RelistingIndex | None" = None,
+    ) -> int:
+    """
+    Runs the fetch -> parse -> enrich -> sink pipeline over lot_urls.
+
+    Args:
+        scraper: Scraper used to fetch and parse lot pages.
+        lot_urls: Lot URLs, consumed lazily.
+        filename: JSON Lines output, gzip-compressed if it ends in .gz.
+        enrich: Optional callable (sync or async) turning lot_data into the final record.
+        state: Optional LotStateStore. Unchanged lots are skipped, and each lot's
+            enrichment is recorded once its record is checkpointed.
+        writer: Optional LotWriter, records are also queued for the database.
+        checkpoint_every: Number of records between flushes to disk.
+        resume: Skip lots already present in filename.
+        enrich_concurrency: Number of lots enriched at once when enrich is async.
+        parse_pool: Optional ParsePool, lot pages are then parsed in worker processes.
+        frontier: Optional CrawlFrontier. lot_urls are added to it and pages are
+            crawled from it in priority order instead, listing pages included,
+            and each lot is marked done once its record is checkpointed, or
+            once state skips it as unchanged.
+        relistings: Optional RelistingIndex. Each lot's description is added to
+            it, and records of lots similar to one indexed before get
+            similar_lots, [[lot_url, similarity], ...] most similar first.
+
+    Returns:
+        Number of records written.
+
+    Example Usage:
+        async with GuitarAuctionScraper() as scraper:
+            lot_urls = scraper.iter_sale_lot_links(sale_url)
+            await scrape_lots(scraper, [url async for url in lot_urls], "sale_249.jsonl.gz")
+    """
+    if state is not None:
+        from .state import content_hash
+
+        # A full table read, which would stall every fetch if it ran on the event loop
+        await asyncio.to_thread(state.load)
+    done = completed_lot_urls(filename) if resume else set()
+    if done:
+        logging.info("Resuming, %i lots already in %s", len(done), filename)
+    todo = (lot_url for lot_url in lot_urls if lot_url not in done)
+    if frontier is None:
+        pages = fetch_stage(scraper, todo, raw=parse_pool is not None)
+    else:
+        # Lots written before the frontier recorded them as done are skipped too
+        for lot_url in done:
+            if frontier.is_pending(lot_url) or not frontier.seen(lot_url):
+                frontier.done(lot_url)
+        frontier.add_many(todo, scraper.sale_priority())
+        pages = scraper.crawl_frontier(frontier, parse_pool=parse_pool)
+    # Lots are only marked done in the frontier, and their enrichment recorded,
+    # once the sink has made them durable, or a lot lost in a crash would be
+    # skipped as done on the next run: [(lot_url, content hash or None), ...]
+    written_since_checkpoint: list[tuple[str, str | None]] = []
+
+    async def commit_written():
+        for written, lot_hash in written_since_checkpoint:
+            if frontier is not None:
+                frontier.done(written)
+            if state is not None and lot_hash is not None:
+                state.record_enrichment(written, lot_hash)
+        written_since_checkpoint.clear()
+        if frontier is not None:
+            frontier.checkpoint()
+        if state is not None and state.pending() >= state.batch_size:
+            await asyncio.to_thread(state.flush)
+
+    lots = enrich_stage(
+        parse_stage(
+            scraper,
+            pages,
+            state,
+            parse_pool,
+            # Skipped lots have nothing to wait for, or they'd be fetched again every run
+            frontier.done if frontier is not None else None,
+        ),
+        enrich,
+        enrich_concurrency,
+        scraper.metrics,
+    )
+    metrics = scraper.metrics
+    with JsonlSink(filename, checkpoint_every) as sink:
+        async for lot_url, lot_data, record in lots:
+            if relistings is not None:
+                with metrics.parse_seconds.time("relistings"):
+                    similar = relistings.add(lot_url, record)
+                if similar:
+                    similar_lots = [[url, round(similarity, 3)] for url, similarity in similar]
+                    record = record | {"similar_lots": similar_lots}
+            sink.write([lot_url, record])
+            metrics.stage_items.inc(1, "sink")
+            if writer is not None:
+                writer.write(lot_url, record)
+                metrics.stage_in_flight.set(writer.queue_depth(), "writer")
+            lot_hash = content_hash(lot_data) if state is not None and enrich is not None else None
+            written_since_checkpoint.append((lot_url, lot_hash))
+            # The sink checkpoints itself every checkpoint_every records
+            if sink.records_written % checkpoint_every == 0:
+                await commit_written()
+        sink.checkpoint()
+        await commit_written()
+    if relistings is not None:
+        relistings.checkpoint()
+    if state is not None:
+        await asyncio.to_thread(state.flush)
+    return sink.records_written
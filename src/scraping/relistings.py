@@ -0,0 +1,316 @@
+"""
+Near-duplicate detection of lot descriptions, to link relisted lots.
+
+The same guitar often comes back in a later sale with its description lightly
+edited. Each description is normalized (lower case, punctuation dropped) and
+split into overlapping word shingles, whose MinHash signature estimates the
+Jaccard similarity of two descriptions without comparing their text. An LSH
+index over bands of the signatures finds the lots likely to be above a
+similarity threshold by looking up one bucket per band, so a query doesn't
+grow with the archive the way comparing every pair does.
+
+With a path, signatures are appended to a JSON Lines log as lots are added and
+the index is rebuilt from it on open, so it can follow a crawl incrementally.
+
+Example Usage:
+    with RelistingIndex("data/relistings.jsonl") as index:
+        for lot_url, entry in load_data_from_disk("sale_250.jsonl"):
+            for similar_url, similarity in index.add(lot_url, entry):
+                print(f"{lot_url} looks like a relisting of {similar_url} ({similarity:.0%})")
+"""
+
+import base64
+import json
+import os
+import re
+import zlib
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+
+from .models import Lot
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# Permutations are (a * x + b) mod a Mersenne prime, truncated to 32 bits
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_text(text: str) -> list[str]:
+    """Returns the words of text, lower-cased with punctuation and extra whitespace removed."""
+    return _NON_WORD.sub(" ", text.lower()).split()
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Returns the distinct runs of size consecutive words of text, or the whole text if it's shorter."""
+    words = normalize_text(text)
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[start:start + size]) for start in range(len(words) - size + 1)}
+
+
+def lsh_parameters(threshold: float, num_perm: int, false_positive_weight: float = 0.5) -> tuple[int, int]:
+    """
+    Returns the (bands, rows per band) that minimize the weighted chance of
+    missing a pair above threshold and of checking a pair below it.
+
+    A pair with Jaccard similarity s shares at least one band with probability
+    1 - (1 - s ** rows) ** bands, an S-curve that rises around (1 / bands) ** (1 / rows).
+    """
+    below = np.linspace(0, threshold, 101)
+    above = np.linspace(threshold, 1, 101)
+    best, best_error = (1, num_perm), np.inf
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positives = (1 - (1 - below ** rows) ** bands).mean() * threshold
+            false_negatives = ((1 - above ** rows) ** bands).mean() * (1 - threshold)
+            error = false_positive_weight * false_positives + (1 - false_positive_weight) * false_negatives
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher():
+    """
+    MinHash signatures of text shingles: num_perm uint32 values per text, the
+    fraction of which two texts share estimates the Jaccard similarity of their
+    shingle sets. Hashers with the same arguments give the same signatures.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+        self._b = generator.integers(0, int(_MERSENNE_PRIME), num_perm, dtype=np.uint64)
+
+    def signature(self, text: str | None) -> np.ndarray | None:
+        """Returns the signature of text, or None if it has no words."""
+        if not text:
+            return None
+        text_shingles = shingles(text, self.shingle_size)
+        if not text_shingles:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in text_shingles),
+            dtype=np.uint64,
+            count=len(text_shingles),
+        )
+        # One row per shingle, one column per permutation; the products wrap around, which is fine for hashing
+        permuted = (hashes[:, np.newaxis] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+def _description(lot: "Lot | Mapping | str | None") -> str | None:
+    if lot is None or isinstance(lot, str):
+        return lot
+    if isinstance(lot, Mapping):
+        # Records that weren't parsed only have the raw description
+        return lot.get("full_description") or lot.get("description")
+    return lot.full_description
+
+
+class RelistingIndex():
+    """
+    LSH index of lot description signatures for finding likely relistings.
+
+    Args:
+        path: JSON Lines log to persist signatures to, or None to keep them in memory.
+        threshold: Estimated Jaccard similarity at or above which lots count as similar.
+        num_perm: Signature length, more is more accurate and larger (4 bytes each per lot).
+        shingle_size: Words per shingle.
+        seed: Seed of the hash permutations.
+        checkpoint_every: Lots added between flushes of the log.
+
+    num_perm, shingle_size and seed are fixed by the first log record, and
+    reopening a log with different ones raises ValueError. The threshold can
+    change between runs.
+
+    Example Usage:
+        index = RelistingIndex(threshold=0.7)
+        index.add_many(load_data_from_disk("history.jsonl"))
+        index.find_similar(lot)  # [(lot_url, similarity), ...], most similar first
+    """
+
+    def __init__(
+            self,
+            path: str | os.PathLike | None = None,
+            threshold: float = 0.7,
+            num_perm: int = 128,
+            shingle_size: int = 3,
+            seed: int = 1,
+            checkpoint_every: int = 100,
+        ):
+        self.path = path
+        self.threshold = threshold
+        self.checkpoint_every = checkpoint_every
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        # Row i of _signatures belongs to _lot_urls[i], the array grows by doubling
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._lot_urls: list[str] = []
+        self._positions: dict[str, int] = {}
+        # Per band, the bytes of a signature's band -> positions with that band
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self._unflushed = 0
+        self._file = None
+        if path is not None:
+            self._load()
+            self._file = open(path, "a", encoding="utf-8")
+            if not os.path.getsize(path):
+                self._file.write(json.dumps(self._parameters()) + "\n")
+
+    def _parameters(self) -> dict:
+        return {
+            "num_perm": self.hasher.num_perm,
+            "shingle_size": self.hasher.shingle_size,
+            "seed": self.hasher.seed,
+        }
+
+    def _load(self):
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Truncated by a crash mid-write
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if not valid_bytes:
+                    if record != self._parameters():
+                        raise ValueError(f"{self.path} was built with {record}, not {self._parameters()}")
+                    valid_bytes = len(line.encode("utf-8"))
+                    continue
+                signature = np.frombuffer(base64.b64decode(record["signature"]), dtype=np.uint32)
+                self._insert(record["lot_url"], signature)
+                valid_bytes += len(line.encode("utf-8"))
+        # Drop a truncated tail so new records start on a fresh line (and a
+        # truncated header, which is written again)
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _insert(self, lot_url: str, signature: np.ndarray):
+        position = len(self._lot_urls)
+        if position == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[position] = signature
+        self._lot_urls.append(lot_url)
+        self._positions[lot_url] = position
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(key, []).append(position)
+
+    def _query(
+            self,
+            signature: np.ndarray,
+            threshold: float,
+            exclude: str | None = None,
+            limit: int | None = None,
+        ) -> list[tuple[str, float]]:
+        candidates: set[int] = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+        if exclude is not None:
+            candidates.discard(self._positions.get(exclude))
+        if not candidates:
+            return []
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self._signatures[positions] == signature).mean(axis=1)
+        keep = similarities >= threshold
+        positions, similarities = positions[keep], similarities[keep]
+        order = np.argsort(-similarities, kind="stable")[:limit]
+        return [(self._lot_urls[positions[index]], float(similarities[index])) for index in order]
+
+    def find_similar(
+            self,
+            lot: "Lot | Mapping | str",
+            threshold: float | None = None,
+            limit: int | None = None,
+        ) -> list[tuple[str, float]]:
+        """
+        Returns (lot_url, estimated similarity) of the indexed lots whose
+        descriptions are at least threshold (default the index's) similar to
+        lot's, most similar first. lot is a Lot, a lot dict or the description
+        itself, and is never returned as similar to itself.
+
+        Thresholds below the index's miss more of the pairs in between, as
+        their band collisions become less likely.
+        """
+        signature = self.hasher.signature(_description(lot))
+        if signature is None:
+            return []
+        exclude = lot.lot_url if isinstance(lot, Lot) else None
+        return self._query(signature, self.threshold if threshold is None else threshold, exclude, limit)
+
+    def add(self, lot_url: str, lot: "Lot | Mapping | str | None") -> list[tuple[str, float]]:
+        """
+        Indexes the description of a lot (a Lot, a lot dict or the description
+        itself), unless the lot is already indexed or has no description.
+
+        Returns:
+            The lots it's similar to, as find_similar, looked up before adding it.
+        """
+        signature = self.hasher.signature(_description(lot))
+        if signature is None:
+            return []
+        similar = self._query(signature, self.threshold, exclude=lot_url)
+        if lot_url in self._positions:
+            return similar
+        self._insert(lot_url, signature)
+        if self._file is not None:
+            signature_text = base64.b64encode(signature.tobytes()).decode("ascii")
+            self._file.write(json.dumps({"lot_url": lot_url, "signature": signature_text}) + "\n")
+            self._unflushed += 1
+            if self._unflushed >= self.checkpoint_every:
+                self.checkpoint()
+        return similar
+
+    def add_many(self, records: Iterable) -> dict[str, list[tuple[str, float]]]:
+        """
+        Adds [lot_url, entry] records in order, e.g. from load_data_from_disk.
+
+        Returns:
+            {lot_url: similar lots} for the lots similar to one added before them.
+        """
+        found = {}
+        for lot_url, entry in records:
+            similar = self.add(lot_url, entry)
+            if similar:
+                found[lot_url] = similar
+        return found
+
+    def checkpoint(self):
+        """Makes everything added so far durable."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unflushed = 0
+
+    def close(self):
+        if self._file is not None:
+            self.checkpoint()
+            self._file.close()
+            self._file = None
+
+    def __contains__(self, lot_url: str) -> bool:
+        return lot_url in self._positions
+
+    def __len__(self) -> int:
+        return len(self._lot_urls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from .db import LotState, get_engine, upsert
+
+
+def content_hash(lot_data: dict) -> str:
+    """Hashes the parts of a lot page that feed parsing and enrichment."""
+    content = "\x1f".join([lot_data.get("description", ""), lot_data.get("estimate", "")])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class LotStateStore():
+    """
+    Tracks which lots have been fetched and enriched, and with what content.
+
+    Re-runs can skip lots whose content hash matches the hash they were last
+    enriched with, so only new or changed lots hit the LLM again.
+
+    The enriched hashes of every lot are read in one query by load(), or on
+    first use. record_fetch and record_enrichment only queue rows in memory,
+    flush() writes them in one transaction. In async code, call load() through
+    asyncio.to_thread before the first lot, and flush() once pending() reaches
+    batch_size and once at the end.
+
+    Example Usage:
+        with LotStateStore() as state:
+            lot_hash = content_hash(lot_data)
+            state.record_fetch(lot_url, lot_hash)
+            if state.needs_enrichment(lot_url, lot_hash):
+                ...
+                state.record_enrichment(lot_url, lot_hash)
+    """
+
+    def __init__(self, engine: Engine | None = None, batch_size: int = 500):
+        self.engine = engine if engine is not None else get_engine()
+        self.batch_size = batch_size
+        self._upsert = upsert(self.engine, LotState.__table__, ["lot_url"])
+        # lot_url -> enriched_hash, loaded in one query by load() or on first use
+        self._enriched_hashes: dict[str, str | None] | None = None
+        # lot_url -> row not yet written, a statement may not update a row twice
+        self._fetches: dict[str, dict] = {}
+        self._enrichments: dict[str, dict] = {}
+        # flush() may run in another thread while rows are recorded
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Reads the enriched hashes of every lot, unless they were read already."""
+        self._load_enriched_hashes()
+
+    def _load_enriched_hashes(self) -> dict[str, str | None]:
+        if self._enriched_hashes is None:
+            with self.engine.connect() as conn:
+                rows = conn.execute(select(LotState.lot_url, LotState.enriched_hash))
+                self._enriched_hashes = {lot_url: enriched_hash for lot_url, enriched_hash in rows}
+        return self._enriched_hashes
+
+    def needs_enrichment(self, lot_url: str, lot_hash: str) -> bool:
+        """Whether the lot is new or its content changed since it was last enriched."""
+        return self._load_enriched_hashes().get(lot_url) != lot_hash
+
+    def record_fetch(self, lot_url: str, lot_hash: str):
+        """Records that lot_url was fetched with the given content hash."""
+        with self._lock:
+            self._fetches[lot_url] = {
+                "lot_url": lot_url,
+                "content_hash": lot_hash,
+                "last_fetched_at": datetime.now(timezone.utc),
+            }
+        self._load_enriched_hashes().setdefault(lot_url, None)
+
+    def record_enrichment(self, lot_url: str, lot_hash: str):
+        """Records that lot_url was enriched from content with the given hash."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._enrichments[lot_url] = {
+                "lot_url": lot_url,
+                "content_hash": lot_hash,
+                "enriched_hash": lot_hash,
+                "last_fetched_at": now,
+                "last_enriched_at": now,
+            }
+        self._load_enriched_hashes()[lot_url] = lot_hash
+
+    def pending(self) -> int:
+        """Number of recorded rows not yet flushed."""
+        return len(self._fetches) + len(self._enrichments)
+
+    def flush(self):
+        """Writes the recorded rows, fetches before enrichments."""
+        with self._lock:
+            fetches, self._fetches = list(self._fetches.values()), {}
+            enrichments, self._enrichments = list(self._enrichments.values()), {}
+        if not fetches and not enrichments:
+            return
+        try:
+            with self.engine.begin() as conn:
+                if fetches:
+                    conn.execute(self._upsert(["content_hash", "last_fetched_at"]), fetches)
+                if enrichments:
+                    conn.execute(self._upsert(["content_hash", "enriched_hash", "last_enriched_at"]), enrichments)
+        except Exception:
+            with self._lock:
+                # Kept for the next flush, rows recorded since are newer
+                self._fetches = {row["lot_url"]: row for row in fetches} | self._fetches
+                self._enrichments = {row["lot_url"]: row for row in enrichments} | self._enrichments
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
@@ -0,0 +1,256 @@
+"""
+Local guitar title parsing with an LLM fallback.
+
+Brands and models are matched with a token trie built from a gazetteer, and
+the type comes from keyword rules. Each parse gets a confidence score, and
+only titles below the threshold are sent to the LLM. Confident LLM answers
+are fed back into the gazetteer so later titles resolve locally.
+"""
+
+import json
+import logging
+import os
+import re
+
+from .llm import LLMClient
+
+SEED_BRANDS = [
+    "Burns", "Charvel", "Collings", "Danelectro", "Eastman", "Epiphone", "ESP",
+    "Fender", "G&L", "Gibson", "Gretsch", "Guild", "Hagstrom", "Heritage", "Hofner",
+    "Ibanez", "Jackson", "Larrivee", "Lowden", "Martin", "Music Man", "PRS",
+    "Rickenbacker", "Schecter", "Squier", "Takamine", "Taylor", "Vox", "Washburn",
+    "Yamaha",
+]
+
+# Checked in order, the first matching keyword phrase decides the type
+TYPE_RULES = [
+    (("hollow", "body"), "hollow body electric"),
+    (("semi", "hollow"), "hollow body electric"),
+    (("semi-hollow",), "hollow body electric"),
+    (("hollowbody",), "hollow body electric"),
+    (("bass",), "bass"),
+    (("acoustic",), "acoustic"),
+    (("electro-acoustic",), "acoustic"),
+    (("electric",), "electric"),
+]
+
+# Words that end a model name when reading on from the brand
+_MODEL_STOP_WORDS = {"guitar", "electric", "acoustic", "bass", "hollow", "semi", "semi-hollow",
+                     "hollowbody", "electro-acoustic", "made", "with", "in"}
+
+_TOKEN = re.compile(r"[\w'&./+-]+")
+
+BRAND_SCORE = 0.4
+MODEL_SCORE = 0.4
+# Low enough that a guessed model stays under the default threshold of 0.8,
+# so those titles go to the LLM and its answer is learned
+GUESSED_MODEL_SCORE = 0.15
+TYPE_SCORE = 0.2
+
+
+def _tokens(text: str) -> list[str]:
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+class _TokenTrie():
+    """Multi-pattern matcher over lower-cased word tokens."""
+
+    _END = object()
+
+    def __init__(self):
+        self._root: dict = {}
+
+    def add(self, phrase: str):
+        node = self._root
+        for token in _tokens(phrase):
+            node = node.setdefault(token, {})
+        node[self._END] = phrase
+
+    def longest_match(self, tokens: list[str], start: int) -> tuple[str, int] | None:
+        """Returns (phrase, end index) of the longest phrase starting at tokens[start]."""
+        node = self._root
+        match = None
+        for index in range(start, len(tokens)):
+            next_node = node.get(tokens[index])
+            if next_node is None:
+                break
+            node = next_node
+            if self._END in node:
+                match = (node[self._END], index + 1)
+        return match
+
+    def find(self, tokens: list[str]) -> tuple[str, int, int] | None:
+        """Returns (phrase, start, end) of the leftmost, longest match in tokens."""
+        for start in range(len(tokens)):
+            match = self.longest_match(tokens, start)
+            if match:
+                return match[0], start, match[1]
+        return None
+
+
+class Gazetteer():
+    """
+    Known brands and their models, persisted as JSON: {"brands": {brand: [models]}}.
+
+    Example Usage:
+        gazetteer = Gazetteer.load("data/title_gazetteer.json")
+        gazetteer.add("Gibson", "Les Paul Standard")
+        gazetteer.save()
+    """
+
+    def __init__(self, brands: dict[str, set[str]] | None = None, path: str | None = None):
+        self.path = path
+        self.brands: dict[str, set[str]] = {}
+        self._canonical_brands: dict[str, str] = {}
+        self._brand_trie = _TokenTrie()
+        self._model_tries: dict[str, _TokenTrie] = {}
+        for brand in SEED_BRANDS:
+            self.add(brand)
+        for brand, models in (brands or {}).items():
+            self.add(brand)
+            for model in models:
+                self.add(brand, model)
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        """Loads a gazetteer from path, or starts from the seed brands if it doesn't exist."""
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["brands"], path=path)
+
+    def save(self, path: str | None = None):
+        path = path or self.path
+        if path is None:
+            raise ValueError("The gazetteer has no path to save to")
+        data = {"brands": {brand: sorted(models) for brand, models in sorted(self.brands.items())}}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def add(self, brand: str, model: str | None = None) -> bool:
+        """Adds a brand and optionally one of its models. Returns True if anything was new."""
+        canonical = self._canonical_brands.get(brand.lower())
+        added = False
+        if canonical is None:
+            canonical = brand
+            self._canonical_brands[brand.lower()] = canonical
+            self.brands[canonical] = set()
+            self._brand_trie.add(canonical)
+            self._model_tries[canonical] = _TokenTrie()
+            added = True
+        if model and model not in self.brands[canonical]:
+            self.brands[canonical].add(model)
+            self._model_tries[canonical].add(model)
+            added = True
+        return added
+
+    def match_brand(self, tokens: list[str]) -> tuple[str, int, int] | None:
+        return self._brand_trie.find(tokens)
+
+    def match_model(self, brand: str, tokens: list[str], start: int) -> tuple[str, int] | None:
+        """Longest known model of brand starting at tokens[start]."""
+        return self._model_tries[brand].longest_match(tokens, start)
+
+
+def guitar_type(tokens: list[str]) -> str | None:
+    """Applies TYPE_RULES to title tokens, returning None if no rule matches."""
+    for keywords, type_name in TYPE_RULES:
+        width = len(keywords)
+        for start in range(len(tokens) - width + 1):
+            if tuple(tokens[start:start + width]) == keywords:
+                return type_name
+    return None
+
+
+class TitleParser():
+    """
+    Extracts 'brand', 'model' and 'type' from guitar titles, locally where possible.
+
+    Example Usage:
+        parser = TitleParser(Gazetteer.load("data/title_gazetteer.json"), llm=LLMClient())
+        fields = await parser.parse("Gibson Les Paul Standard electric guitar, made in USA")
+    """
+
+    def __init__(
+            self,
+            gazetteer: Gazetteer | None = None,
+            llm: LLMClient | None = None,
+            threshold: float = 0.8,
+            save_every: int = 50,
+        ):
+        self.gazetteer = gazetteer if gazetteer is not None else Gazetteer()
+        self.llm = llm
+        self.threshold = threshold
+        self.save_every = save_every
+        self._learned_since_save = 0
+        self.local_hits = 0
+        self.llm_calls = 0
+
+    def parse_local(self, title: str) -> tuple[dict, float]:
+        """Returns the locally extracted fields and a confidence score between 0 and 1."""
+        # Only the part before the first comma names the guitar, e.g. ", made in USA"
+        words = _TOKEN.findall(title.split(",", 1)[0])
+        tokens = [word.lower() for word in words]
+        result = {"brand": "", "model": "", "type": guitar_type(tokens) or "other"}
+        confidence = TYPE_SCORE if result["type"] != "other" else 0.0
+
+        brand_match = self.gazetteer.match_brand(tokens)
+        if brand_match is None:
+            return result, confidence
+        brand, _, brand_end = brand_match
+        result["brand"] = brand
+        confidence += BRAND_SCORE
+
+        model_match = self.gazetteer.match_model(brand, tokens, brand_end)
+        if model_match is not None:
+            result["model"] = model_match[0]
+            confidence += MODEL_SCORE
+        else:
+            # Guess the model as the words between the brand and the type/"guitar"
+            model_words = []
+            for word in words[brand_end:]:
+                if word.lower() in _MODEL_STOP_WORDS:
+                    break
+                model_words.append(word)
+            if model_words:
+                result["model"] = " ".join(model_words)
+                confidence += GUESSED_MODEL_SCORE
+        return result, round(confidence, 2)
+
+    def learn(self, title: str, fields: dict):
+        """Adds an LLM answer to the gazetteer if its brand and model both appear in the title."""
+        brand, model = fields.get("brand") or "", fields.get("model") or ""
+        lowered = title.lower()
+        if not brand or brand.lower() not in lowered:
+            return
+        if model and model.lower() not in lowered:
+            model = ""
+        if self.gazetteer.add(brand, model or None):
+            self._learned_since_save += 1
+            if self.gazetteer.path and self._learned_since_save >= self.save_every:
+                self.gazetteer.save()
+                self._learned_since_save = 0
+
+    async def parse(self, title: str) -> dict:
+        """Parses title locally, falling back to the LLM below the confidence threshold."""
+        fields, confidence = self.parse_local(title)
+        if confidence >= self.threshold or self.llm is None:
+            self.local_hits += 1
+            return fields
+        self.llm_calls += 1
+        logging.info("Title parsed locally with confidence %.2f, asking the LLM: %s", confidence, title)
+        llm_fields = await self.llm.parse_title_with_llm(title)
+        if not llm_fields:
+            return fields
+        self.learn(title, llm_fields)
+        return llm_fields
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.llm_calls
+        return {
+            "local_hits": self.local_hits,
+            "llm_calls": self.llm_calls,
+            "local_rate": self.local_hits / total if total else 0.0,
+        }
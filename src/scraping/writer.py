@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.engine import Engine
+
+from . import models
+from .concurrency import backoff_delay
+from .db import Lot, LotSimilarity, get_engine, upsert
+
+LOT_COLUMNS = [column.name for column in Lot.__table__.columns if column.name != "scraped_at"]
+
+
+def lot_to_row(lot_url: str, entry: dict) -> dict:
+    """Converts a scraped [lot_url, entry] pair into a row for the lots table."""
+    return models.Lot.from_entry(lot_url, entry).to_row()
+
+
+def similarity_rows(lot_url: str, entry: dict) -> list[dict]:
+    """Rows for the lot_similarity table from an entry's similar_lots, see RelistingIndex."""
+    return [
+        {"lot_url": lot_url, "similar_url": similar_url, "similarity": similarity}
+        for similar_url, similarity in entry.get("similar_lots") or ()
+    ]
+
+
+class LotWriter():
+    """
+    Loads scraped lots into the lots table from a background thread.
+
+    Records are queued by write() and inserted in batches with a multi-row
+    INSERT ... ON CONFLICT DO UPDATE, one transaction per batch, so the
+    crawler never waits on the database. A full queue blocks write(), which
+    applies backpressure if the database falls behind. Lots' similar_lots, if
+    any, go to the lot_similarity table in the same transaction.
+
+    A failed batch is retried max_retries times with backoff. If it still
+    fails the writer thread stops, and the next write() or close() raises
+    RuntimeError rather than losing lots silently.
+
+    Example Usage:
+        with LotWriter() as writer:
+            for lot_url, entry in scraped_data:
+                writer.write(lot_url, entry)
+    """
+
+    def __init__(
+            self,
+            engine: Engine | None = None,
+            batch_size: int = 500,
+            flush_interval: float = 2.0,
+            max_queue_size: int = 10_000,
+            max_retries: int = 3,
+            backoff_base: float = 0.5,
+            backoff_max: float = 10.0,
+        ):
+        self.engine = engine if engine is not None else get_engine(pool_pre_ping=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._statement = upsert(self.engine, Lot.__table__, ["lot_url"])(
+            [column for column in LOT_COLUMNS if column != "lot_url"]
+        )
+        self._similarity_statement = upsert(
+            self.engine, LotSimilarity.__table__, ["lot_url", "similar_url"]
+        )(["similarity"])
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: threading.Thread | None = None
+        # Set by the writer thread when a batch fails for good
+        self._error: BaseException | None = None
+        self.rows_written = 0
+        # Failed attempts at writing a batch, retried ones included
+        self.failed_batches = 0
+        # (brand, model) of the lots written, e.g. for ComparableSales.refresh_price_summary
+        self.models_written: set[tuple[str | None, str | None]] = set()
+
+    def start(self):
+        """Starts the background writer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lot-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, lot_url: str, entry: dict):
+        """Queues one lot for insertion, starting the writer thread if needed."""
+        self.start()
+        self._put((lot_to_row(lot_url, entry), similarity_rows(lot_url, entry)))
+
+    def _put(self, item):
+        # Waits for room in the queue, unless the writer thread has failed
+        while True:
+            self._raise_if_failed()
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError("The lot writer failed to write a batch") from self._error
+
+    def queue_depth(self) -> int:
+        """Number of lots queued and not yet picked up by the writer thread."""
+        return self._queue.qsize()
+
+    def close(self):
+        """
+        Flushes queued lots and stops the writer thread.
+
+        Raises:
+            RuntimeError: if a batch could not be written.
+        """
+        if self._thread is not None:
+            if self._error is None:
+                self._put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_if_failed()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    # Flush whatever arrived within flush_interval
+                    if batch:
+                        self._flush(batch)
+                        batch = []
+                    deadline = time.monotonic() + self.flush_interval
+                    continue
+                if item is None:
+                    if batch:
+                        self._flush(batch)
+                    return
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+        except Exception as e:
+            self._error = e
+
+    def _flush(self, batch: list[tuple[dict, list[dict]]]):
+        # A single statement may not update the same row twice, keep the latest
+        rows = list({row["lot_url"]: row for row, _ in batch}.values())
+        links = list({
+            (link["lot_url"], link["similar_url"]): link for _, lot_links in batch for link in lot_links
+        }.values())
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(self._statement, rows)
+                    if links:
+                        conn.execute(self._similarity_statement, links)
+                break
+            except Exception:
+                self.failed_batches += 1
+                if attempt == self.max_retries:
+                    logging.exception("Failed to write a batch of %i lots, giving up", len(rows))
+                    raise
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logging.warning("Failed to write a batch of %i lots, retrying in %.1fs", len(rows), delay, exc_info=True)
+                time.sleep(delay)
+        self.rows_written += len(rows)
+        self.models_written.update((row["brand"], row["model"]) for row in rows)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.scraping.analytics import Valuations
+from src.scraping.models import LotBatch
+
+
+def lot(brand, kind, year, estimate, valuation=None) -> dict:
+    entry = {"brand": brand, "type": kind, "year": year, "estimate_low": estimate[0], "estimate_high": estimate[1]}
+    if valuation is not None:
+        entry |= {"value_estimate_low": valuation[0], "value_estimate_high": valuation[1]}
+    return entry
+
+
+# House midpoint, LLM midpoint and spread in the comments
+RECORDS = [
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/1", lot("Gibson", "electric", 1959, (1000, 2000), (2000, 4000))],  # 1500, 3000, 1500
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/2", lot("Gibson", "electric", 1959, (1000, 3000), (1000, 2000))],  # 2000, 1500, -500
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/3", lot("Gibson", "acoustic", 1965, (400, 600), (500, 700))],  # 500, 600, 100
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/4", lot("Fender", "electric", None, (800, 1200), (1000, 1400))],  # 1000, 1200, 200
+    # Not valued yet
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/5", lot("Fender", "electric", None, (800, 1200))],
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/6", lot(None, "acoustic", None, (100, 300), (200, 200))],  # 200, 200, 0
+]
+LOT_URLS = [lot_url for lot_url, _ in RECORDS]
+
+HAMMER_PRICES = {
+    LOT_URLS[0]: 2500,  # inside the LLM range
+    LOT_URLS[1]: 2500,  # above it
+    LOT_URLS[2]: 450,  # below it
+    LOT_URLS[3]: 1200,  # inside it
+    LOT_URLS[4]: 900,  # no LLM range
+    # Lot 6 didn't sell
+}
+
+
+@pytest.fixture
+def valuations() -> Valuations:
+    return Valuations.from_records(RECORDS)
+
+
+def test_derived_values(valuations):
+    np.testing.assert_array_equal(valuations.values("spread"), [1500, -500, 100, 200, np.nan, 0])
+    np.testing.assert_array_equal(valuations.values("ratio"), [2, 0.75, 1.2, 1.2, np.nan, 1])
+    np.testing.assert_array_equal(valuations.values("house_width"), [1000, 2000, 200, 400, 400, 200])
+    np.testing.assert_array_equal(valuations.values("log_ratio")[:2], [1, math.log2(0.75)])
+    with pytest.raises(KeyError):
+        valuations.values("hammer")
+
+
+def test_aggregate_skips_missing_values_and_orders_by_count(valuations):
+    table = valuations.aggregate("brand", "spread")
+    # Fender's unvalued lot drops out, leaving single-lot groups after Gibson
+    assert table["brand"].tolist() == ["Gibson", None, "Fender"]
+    assert table["count"].tolist() == [3, 1, 1]
+    np.testing.assert_allclose(table["mean"], [1100 / 3, 0, 200])
+    np.testing.assert_allclose(table["std"], [np.std([1500, -500, 100]), 0, 0])
+    # Interpolated between the sorted Gibson spreads -500, 100 and 1500
+    np.testing.assert_allclose(table["p10"], [-380, 0, 200])
+    np.testing.assert_allclose(table["p50"], [100, 0, 200])
+    np.testing.assert_allclose(table["p90"], [1220, 0, 200])
+
+    table = valuations.aggregate("brand", "spread", quantiles=(0.5,), min_count=2)
+    assert list(table) == ["brand", "count", "mean", "std", "p50"]
+    assert table["brand"].tolist() == ["Gibson"]
+
+
+def test_aggregate_by_several_fields(valuations):
+    table = valuations.aggregate(["brand", "year"], "ratio")
+    groups = {
+        (brand, year): (count, mean)
+        for brand, year, count, mean in zip(table["brand"], table["year"], table["count"], table["mean"])
+    }
+    assert groups == {
+        ("Gibson", 1959): (2, 1.375),
+        ("Gibson", 1965): (1, 1.2),
+        ("Fender", None): (1, 1.2),
+        (None, None): (1, 1.0),
+    }
+    assert table["count"][0] == 2
+
+
+def test_aggregate_of_nothing(valuations):
+    table = valuations.select(valuations.where(brand="Martin")).aggregate("brand", "spread")
+    assert table["brand"].tolist() == []
+    assert table["count"].tolist() == []
+
+
+def test_where_and_select(valuations):
+    assert valuations.where(brand="Gibson").tolist() == [True] * 3 + [False] * 3
+    assert np.flatnonzero(valuations.where(brand=["Gibson", "Fender"], year=1959)).tolist() == [0, 1]
+    assert np.flatnonzero(valuations.where(brand=None)).tolist() == [5]
+    assert np.flatnonzero(valuations.where(year=None, type="electric")).tolist() == [3, 4]
+    assert not valuations.where(brand="Martin").any()
+
+    gibsons = valuations.select(valuations.where(brand="Gibson"))
+    assert gibsons.lot_urls == LOT_URLS[:3]
+    assert gibsons.aggregate("type", "spread")["type"].tolist() == ["electric", "acoustic"]
+    picked = valuations.select([5, 0])
+    assert picked.lot_urls == [LOT_URLS[5], LOT_URLS[0]]
+    assert picked.labels("brand").tolist() == [None, "Gibson"]
+    assert picked.labels("year").tolist() == [None, 1959]
+    np.testing.assert_array_equal(picked.values("spread"), [0, 1500])
+
+
+@pytest.mark.parametrize("prices", [
+    HAMMER_PRICES,
+    [HAMMER_PRICES.get(lot_url, math.nan) for lot_url in LOT_URLS],
+    np.array([HAMMER_PRICES.get(lot_url, math.nan) for lot_url in LOT_URLS]),
+])
+def test_calibrate(valuations, prices):
+    result = valuations.calibrate(prices)
+    assert result.pop("count") == 4
+    # Hammer / LLM midpoint 0.83, 1.67, 0.75 and 1, errors 0.2, 0.4, 0.33 and 0, widths 0.67, 0.67, 0.33 and 0.33
+    assert result == pytest.approx({
+        "coverage": 0.5,
+        "below": 0.25,
+        "above": 0.25,
+        "median_ratio": (2500 / 3000 + 1) / 2,
+        "median_error": (0.2 + 150 / 450) / 2,
+        "median_width": 0.5,
+    })
+
+
+def test_calibrate_house_estimates(valuations):
+    result = valuations.calibrate(HAMMER_PRICES, source="house")
+    # Lot 5 has a house estimate, and 1200 is inside 800-1200
+    assert result["count"] == 5
+    assert result["coverage"] == pytest.approx(0.8)
+    assert (result["below"], result["above"]) == (0, pytest.approx(0.2))
+    with pytest.raises(ValueError):
+        valuations.calibrate(HAMMER_PRICES, source="auctioneer")
+
+
+def test_calibrate_by_group(valuations):
+    table = valuations.calibrate(HAMMER_PRICES, by="brand")
+    # Lot 6, the only one without a brand, didn't sell
+    assert table["brand"].tolist() == ["Gibson", "Fender"]
+    assert table["count"].tolist() == [3, 1]
+    np.testing.assert_allclose(table["coverage"], [1 / 3, 1])
+    np.testing.assert_allclose(table["below"], [1 / 3, 0])
+    np.testing.assert_allclose(table["above"], [1 / 3, 0])
+    np.testing.assert_allclose(table["median_ratio"], [2500 / 3000, 1])
+    assert valuations.calibrate(HAMMER_PRICES, by="brand", min_count=2)["brand"].tolist() == ["Gibson"]
+
+
+def test_calibrate_checks_the_number_of_prices(valuations):
+    with pytest.raises(ValueError):
+        valuations.calibrate([1000, 2000])
+    assert valuations.calibrate({}) == {"count": 0}
+
+
+def test_from_arrow_matches_from_batch():
+    pytest.importorskip("pyarrow")
+    batch = LotBatch.from_records(RECORDS)
+    from_arrow = Valuations.from_arrow(batch.to_arrow(include_extras=False))
+    from_batch = Valuations.from_batch(batch)
+    assert from_arrow.lot_urls == from_batch.lot_urls
+    np.testing.assert_array_equal(from_arrow.values("spread"), from_batch.values("spread"))
+    for by in ("brand", "year"):
+        expected = from_batch.aggregate(by, "ratio")
+        actual = from_arrow.aggregate(by, "ratio")
+        assert actual[by].tolist() == expected[by].tolist()
+        np.testing.assert_array_equal(actual["mean"], expected["mean"])
@@ -0,0 +1,58 @@
+from src.scraping.archive import ResponseArchive
+from src.scraping.base_scraper import BaseScraper
+
+URL = "https://example.com/lot/1"
+
+
+def test_replay_serves_archived_body(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    archive.store(URL, b"<html>lot</html>", 200, {"ETag": '"abc"'})
+    scraper = BaseScraper("https://example.com", archive=ResponseArchive(tmp_path), replay=True)
+    assert scraper.fetch_raw("/lot/1") == b"<html>lot</html>"
+    assert scraper.fetch_raw("/lot/2") is None
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    first = archive.store(URL, b"same", 200, {})
+    second = archive.store("https://example.com/lot/2", b"same", 200, {})
+    assert first.sha256 == second.sha256
+    assert len(list((tmp_path / "objects").rglob("*.gz"))) == 1
+
+
+def test_conditional_headers_from_latest_response(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    assert archive.conditional_headers(URL) == {}
+    archive.store(URL, b"v1", 200, {"etag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    assert archive.conditional_headers(URL) == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+
+def test_truncated_index_tail_is_dropped(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    archive.store(URL, b"v1", 200, {})
+    with open(tmp_path / "index.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"url": "https://example.com/lot/2", "sha')
+    reopened = ResponseArchive(tmp_path)
+    assert len(reopened) == 1
+    reopened.store("https://example.com/lot/3", b"v3", 200, {})
+    assert len(ResponseArchive(tmp_path)) == 2
+
+
+def test_not_modified_resolves_to_archived_body(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    archive.store(URL, b"v1", 200, {"ETag": '"v1"', "Content-Type": "text/html"})
+    scraper = BaseScraper("https://example.com", archive=archive)
+    assert scraper._record_response(URL, 304, {"etag": '"v1"'}, b"") == b"v1"
+    latest = archive.latest(URL)
+    assert latest.status == 200
+    assert latest.headers == {"Content-Type": "text/html", "etag": '"v1"'}
+
+
+def test_not_modified_without_archived_response_is_not_stored(tmp_path):
+    archive = ResponseArchive(tmp_path)
+    scraper = BaseScraper("https://example.com", archive=archive)
+    assert scraper._record_response(URL, 304, {}, b"") is None
+    assert URL not in archive
@@ -0,0 +1,90 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.scraping.base_scraper import BaseScraper
+
+
+def make_app(delays: dict[str, float] | None = None, requests: dict | None = None) -> web.Application:
+    """
+    Serves /page-<n> after delays.get(name, 0) seconds, and 404s for /missing-<n>.
+    requests, if given, gets the number of pages being served and its peak.
+    """
+    delays = delays or {}
+    requests = requests if requests is not None else {}
+    requests.update(running=0, peak=0)
+    app = web.Application()
+
+    async def page(request):
+        name = request.match_info["name"]
+        if name.startswith("missing"):
+            raise web.HTTPNotFound()
+        requests["running"] += 1
+        requests["peak"] = max(requests["peak"], requests["running"])
+        try:
+            await asyncio.sleep(delays.get(name, 0))
+        finally:
+            requests["running"] -= 1
+        return web.Response(text=f"<html><h1>{name}</h1></html>", content_type="text/html")
+
+    app.router.add_get("/{name}", page)
+    return app
+
+
+def fetch_all(app: web.Application, urls, **kwargs) -> list:
+    async def run():
+        async with TestServer(app) as server:
+            async with BaseScraper(str(server.make_url("/")), **kwargs) as scraper:
+                return [result async for result in scraper.fetch_many(urls)]
+
+    return asyncio.run(run())
+
+
+def test_pages_are_yielded_as_they_complete():
+    results = fetch_all(make_app({"page-0": 0.3}), ["/page-0", "/page-1", "/page-2"])
+    assert [url for url, _ in results][-1] == "/page-0"
+    assert {url: soup.h1.text for url, soup in results} == {
+        "/page-0": "page-0", "/page-1": "page-1", "/page-2": "page-2",
+    }
+
+
+def test_raw_pages_are_bytes():
+    async def run():
+        async with TestServer(make_app()) as server:
+            async with BaseScraper(str(server.make_url("/"))) as scraper:
+                return [page async for _, page in scraper.fetch_many(["/page-0"], raw=True)]
+
+    assert asyncio.run(run()) == [b"<html><h1>page-0</h1></html>"]
+
+
+def test_failed_fetches_yield_none():
+    results = fetch_all(make_app(), ["/page-0", "/missing-1"], max_retries=0)
+    assert {url: page is not None for url, page in results} == {"/page-0": True, "/missing-1": False}
+
+
+def test_urls_are_pulled_only_when_there_is_room():
+    pulled = 0
+    consumed_with_pulled = []
+
+    def urls():
+        nonlocal pulled
+        for number in range(12):
+            pulled += 1
+            yield f"/page-{number}"
+
+    requests: dict = {}
+    app = make_app({f"page-{number}": 0.02 for number in range(12)}, requests)
+
+    async def run():
+        async with TestServer(app) as server:
+            async with BaseScraper(str(server.make_url("/")), max_concurrency_per_host=8) as scraper:
+                async for _ in scraper.fetch_many(urls(), max_in_flight=3):
+                    consumed_with_pulled.append(pulled)
+                    # A slow consumer must not let fetches pile up
+                    await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert len(consumed_with_pulled) == 12
+    assert all(pulled <= consumed + 3 for consumed, pulled in enumerate(consumed_with_pulled, 1))
+    assert requests["peak"] <= 3
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from playwright.async_api import Error as PlaywrightError  # noqa: E402
+
+from src.scraping.browser_scraper import BrowserScraper  # noqa: E402
+
+
+class FakePage():
+    def __init__(self, browser: "FakeBrowser", context: "FakeContext"):
+        self.browser = browser
+        self.context = context
+        self.url = None
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        if self.context.closed:
+            raise PlaywrightError("Target page, context or browser has been closed")
+        if url in self.browser.hanging:
+            await asyncio.Event().wait()
+        if url in self.browser.failing:
+            raise PlaywrightError(f"net::ERR_FAILED at {url}")
+        self.url = url
+        # Like a same-document navigation, so render reports a 200
+        return None
+
+    async def content(self) -> str:
+        return f"<html>{self.url}</html>"
+
+
+class FakeContext():
+    def __init__(self, browser: "FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self) -> FakePage:
+        return FakePage(self.browser, self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser():
+    """Opens contexts that "render" a page as its URL, failing new_context while fail_new_contexts > 0."""
+
+    def __init__(self):
+        self.contexts: list[FakeContext] = []
+        self.failing: set[str] = set()
+        self.hanging: set[str] = set()
+        self.fail_new_contexts = 0
+
+    async def new_context(self) -> FakeContext:
+        if self.fail_new_contexts:
+            self.fail_new_contexts -= 1
+            raise PlaywrightError("Browser has been closed")
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+
+async def start(scraper: BrowserScraper) -> FakeBrowser:
+    """Gives scraper a pool of fake contexts in place of launching a browser."""
+    browser = scraper._browser = FakeBrowser()
+    slots: asyncio.Queue = asyncio.Queue()
+    for _ in range(scraper.pool_size):
+        slots.put_nowait(await scraper._new_slot())
+    scraper._slots = slots
+    return browser
+
+
+async def render(scraper: BrowserScraper, path: str):
+    # A slot lost from the pool would hang the next render
+    return await asyncio.wait_for(scraper.render(f"https://example.com/{path}"), 1)
+
+
+def test_contexts_are_replaced_after_max_uses():
+    async def run():
+        scraper = BrowserScraper("https://example.com", pool_size=1, max_uses=2)
+        browser = await start(scraper)
+        results = [await render(scraper, f"lot/{number}") for number in range(5)]
+        return scraper, browser, results
+
+    scraper, browser, results = asyncio.run(run())
+    assert results == [(200, {}, f"<html>https://example.com/lot/{number}</html>".encode()) for number in range(5)]
+    assert [context.closed for context in browser.contexts] == [True, True, False]
+    assert scraper._slots.qsize() == 1
+
+
+def test_failed_replacement_keeps_the_slot_in_the_pool():
+    async def run():
+        scraper = BrowserScraper("https://example.com", pool_size=1)
+        browser = await start(scraper)
+        browser.failing.add("https://example.com/broken")
+        browser.fail_new_contexts = 2
+        # The failed render's context is closed, and replacing it fails
+        assert await render(scraper, "broken") is None
+        assert scraper._slots.qsize() == 1
+        # So does the retry before the next render, which then fails on the closed page
+        assert await render(scraper, "lot/1") is None
+        assert scraper._slots.qsize() == 1
+        assert await render(scraper, "lot/2") == (200, {}, b"<html>https://example.com/lot/2</html>")
+        return scraper, browser
+
+    scraper, browser = asyncio.run(run())
+    assert [context.closed for context in browser.contexts] == [True, False]
+    assert scraper._slots.qsize() == 1
+
+
+def test_cancelled_render_returns_its_slot():
+    async def run():
+        scraper = BrowserScraper("https://example.com", pool_size=1)
+        browser = await start(scraper)
+        browser.hanging.add("https://example.com/slow")
+        task = asyncio.create_task(scraper.render("https://example.com/slow"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scraper._slots.qsize() == 1
+        return await render(scraper, "lot/1")
+
+    assert asyncio.run(run()) == (200, {}, b"<html>https://example.com/lot/1</html>")
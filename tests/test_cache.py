@@ -0,0 +1,55 @@
+from src.scraping.cache import PageCache
+
+
+def test_get_returns_stored_html():
+    cache = PageCache()
+    cache.set("https://example.com/a", "<html>a</html>")
+    assert cache.get("https://example.com/a") == b"<html>a</html>"
+    assert cache.get("https://example.com/b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used_over_max_entries():
+    cache = PageCache(max_entries=2)
+    cache.set("a", b"a")
+    cache.set("b", b"b")
+    cache.get("a")
+    cache.set("c", b"c")
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.evictions == 1
+
+
+def test_evicts_over_max_bytes_and_skips_oversized_pages():
+    cache = PageCache(max_entries=None, max_bytes=200)
+    cache.set("a", bytes(range(100)))
+    cache.set("b", bytes(range(100, 200)))
+    assert "a" not in cache
+    assert cache.size_bytes <= 200
+    cache.set("c", bytes(range(256)) * 4)
+    assert "c" not in cache
+    assert "b" in cache
+
+
+def test_replacing_an_entry_keeps_size_consistent():
+    cache = PageCache()
+    cache.set("a", b"x" * 1000)
+    cache.set("a", b"y")
+    assert len(cache) == 1
+    assert cache.get("a") == b"y"
+    cache.clear()
+    assert cache.size_bytes == 0
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.scraping.cache.time.monotonic", lambda: now[0])
+    cache = PageCache(ttl=10)
+    cache.set("a", b"a")
+    now[0] += 5
+    assert cache.get("a") == b"a"
+    now[0] += 10
+    assert cache.get("a") is None
+    assert "a" not in cache
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp.test_utils import TestServer
+from sqlalchemy import select
+
+from benchmarks.fake_site import LOTS_PER_PAGE, SALE_PATH, make_app
+from src.scraping import cli
+from src.scraping.db import Lot, get_engine
+from src.scraping.jsonl import load_data_from_disk, save_data_to_disk
+
+RAW_RECORDS = [
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/1", {
+        "description": "1959 Gibson Les Paul Standard electric guitar, made in USA; Weight: 4.2kg * Refret",
+        "estimate": "Estimate: £20000-30000",
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/2", {"title": "Unknown Maker acoustic guitar"}],
+]
+
+
+@pytest.fixture(scope="module")
+def sale_url():
+    """URL of a two page sale on the fake site, served from a thread as crawl runs its own event loop."""
+    loop = asyncio.new_event_loop()
+    server = TestServer(make_app(pages=2, image_size=10), loop=loop)
+    loop.run_until_complete(server.start_server())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield str(server.make_url(SALE_PATH))
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(server.close())
+    loop.close()
+
+
+def test_parser_dispatches_subcommands():
+    parser = cli.build_parser()
+    args = parser.parse_args([
+        "crawl", "https://www.guitar-auctions.co.uk/sale/249/x", "-o", "sale.jsonl.gz",
+        "--parse-workers", "2", "--db", "--enrich", "--model", "gpt-test",
+    ])
+    assert args.func is cli.crawl
+    assert (args.sale_url, args.output, args.parse_workers, args.db, args.enrich, args.model) == (
+        "https://www.guitar-auctions.co.uk/sale/249/x", "sale.jsonl.gz", 2, True, True, "gpt-test",
+    )
+    assert (args.state, args.frontier, args.no_resume, args.max_concurrency) == (False, None, False, 8)
+
+    args = parser.parse_args(["reparse", "in.jsonl", "out.jsonl"])
+    assert (args.func, args.input, args.output) == (cli.reparse, "in.jsonl", "out.jsonl")
+
+    args = parser.parse_args(["export", "in.jsonl", "data/lots", "--batch-size", "10"])
+    assert (args.func, args.input, args.root, args.batch_size) == (cli.export, "in.jsonl", "data/lots", 10)
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(["export", "in.jsonl"])
+    with pytest.raises(SystemExit):
+        parser.parse_args([])
+
+
+@pytest.mark.parametrize("use_frontier", [False, True])
+def test_crawl_writes_parsed_lots(sale_url, tmp_path, monkeypatch, capsys, use_frontier):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'lots.db'}")
+    output = tmp_path / "sale.jsonl"
+    argv = ["crawl", sale_url, "-o", str(output), "--db"]
+    if use_frontier:
+        argv += ["--frontier", str(tmp_path / "frontier.jsonl")]
+    assert cli.main(argv) == 0
+    assert f"Wrote {2 * LOTS_PER_PAGE} " in capsys.readouterr().out
+
+    records = list(load_data_from_disk(output))
+    assert len(records) == 2 * LOTS_PER_PAGE
+    # Parsed without --enrich
+    for _, entry in records:
+        assert entry["full_description"] == entry["description"]
+        assert (entry["estimate_low"], entry["estimate_high"]) != (None, None)
+    with get_engine().connect() as conn:
+        rows = conn.execute(select(Lot.lot_url, Lot.estimate_low, Lot.full_description)).all()
+    assert len(rows) == 2 * LOTS_PER_PAGE
+    assert all(row.estimate_low is not None and row.full_description for row in rows)
+
+
+def test_reparse(tmp_path, capsys):
+    save_data_to_disk(RAW_RECORDS, tmp_path / "raw.jsonl")
+    assert cli.main(["reparse", str(tmp_path / "raw.jsonl"), str(tmp_path / "parsed.jsonl.gz")]) == 0
+    assert capsys.readouterr().out == (
+        f"Re-parsed 1 lots into {tmp_path / 'parsed.jsonl.gz'}, 1 without a description\n"
+    )
+    (_, parsed), unchanged = load_data_from_disk(tmp_path / "parsed.jsonl.gz")
+    assert parsed["estimate_low"] == 20000
+    assert parsed["year"] == "1959"
+    assert parsed["notes"] == ["Refret"]
+    assert unchanged == RAW_RECORDS[1]
+
+
+def test_export(tmp_path, capsys):
+    pytest.importorskip("pyarrow")
+    from src.scraping.export import read_batch
+
+    save_data_to_disk(RAW_RECORDS, tmp_path / "lots.jsonl")
+    root = str(tmp_path / "lots")
+    assert cli.main(["export", str(tmp_path / "lots.jsonl"), root, "--batch-size", "1"]) == 0
+    assert capsys.readouterr().out == f"Exported 2 lots to {root}\n"
+    assert sorted(lot.lot_url for lot in read_batch(root)) == [lot_url for lot_url, _ in RAW_RECORDS]
@@ -0,0 +1,117 @@
+import pytest
+from sqlalchemy import insert, text
+
+from src.scraping.comparables import ComparableSales
+from src.scraping.db import Lot, get_engine
+
+BASE_URL = "https://www.guitar-auctions.co.uk"
+
+# (sale, lot, brand, model, year, estimate_low, estimate_high)
+LOTS = [
+    (249, 1, "Gibson", "Les Paul Standard", 1959, 20000, 30000),
+    (251, 2, "GIBSON", "les paul standard", 1960, 15000, 20000),
+    (250, 3, "gibson", "Les Paul Standard", 1958, 5000, 8000),
+    (251, 4, "Gibson", "Les Paul Custom", 1959, 10000, 15000),
+    (252, 5, "Epiphone", "Les Paul Standard", 1959, 500, 800),
+    (248, 6, "Gibson", "Les Paul Standard", None, None, None),
+    (251, 10, "Gibson", "Les Paul Standard", 1962, 2000, 3000),
+]
+
+INDEXES = {"ix_lots_brand_model_sale", "ix_lots_brand_model_year", "ix_lots_year", "ix_lots_estimate"}
+
+
+def lot_url(sale: int, lot: int) -> str:
+    return f"{BASE_URL}/sale/{sale}/lot/{lot}"
+
+
+def make_engine(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'lots.db'}")
+    with engine.begin() as conn:
+        conn.execute(insert(Lot), [
+            {
+                "lot_url": lot_url(sale, lot), "sale_id": sale, "brand": brand, "model": model,
+                "year": year, "estimate_low": low, "estimate_high": high,
+            }
+            for sale, lot, brand, model, year, low, high in LOTS
+        ])
+    return engine
+
+
+def lots_indexes(engine) -> set[str]:
+    with engine.connect() as conn:
+        return set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'lots' AND sql IS NOT NULL"
+        )).scalars())
+
+
+@pytest.fixture
+def sales(tmp_path) -> ComparableSales:
+    return ComparableSales(make_engine(tmp_path))
+
+
+def urls(lots) -> list[str]:
+    return [lot.lot_url for lot in lots]
+
+
+def test_brand_and_model_match_case_insensitively_newest_first(sales):
+    lots = sales.comparables("gibson", "LES PAUL STANDARD")
+    # Within a sale, by lot URL descending
+    assert urls(lots) == [lot_url(251, 2), lot_url(251, 10), lot_url(250, 3), lot_url(249, 1), lot_url(248, 6)]
+    assert (lots[0].brand, lots[0].model, lots[0].year, lots[0].estimate_low) == (
+        "GIBSON", "les paul standard", 1960, 15000,
+    )
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", limit=2)) == [lot_url(251, 2), lot_url(251, 10)]
+    assert sales.comparables("Gibson", "Les Paul") == []
+
+
+def test_year_filters(sales):
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", year=1959)) == [lot_url(249, 1)]
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", year=(1959, None))) == [
+        lot_url(251, 2), lot_url(251, 10), lot_url(249, 1),
+    ]
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", year=(None, 1959))) == [
+        lot_url(250, 3), lot_url(249, 1),
+    ]
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", year=(1959, 1960))) == [
+        lot_url(251, 2), lot_url(249, 1),
+    ]
+
+
+def test_estimate_filters_keep_overlapping_ranges(sales):
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", estimate=(10000, None))) == [
+        lot_url(251, 2), lot_url(249, 1),
+    ]
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", estimate=(None, 6000))) == [
+        lot_url(251, 10), lot_url(250, 3),
+    ]
+    # 2000-3000 ends below 4000, 20000-30000 starts above 6000
+    assert urls(sales.comparables("Gibson", "Les Paul Standard", estimate=(4000, 6000))) == [lot_url(250, 3)]
+
+
+def test_fuzzy_matching_needs_postgresql(sales):
+    with pytest.raises(ValueError):
+        sales.comparables("Gibson", "Les Paul", fuzzy=True)
+
+
+def test_indexes_are_created_on_an_existing_table(tmp_path):
+    engine = make_engine(tmp_path)
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    assert not lots_indexes(engine) & INDEXES
+
+    sales = ComparableSales(engine)
+    assert lots_indexes(engine) >= INDEXES
+    # Creating them again is a no-op
+    sales.create_indexes()
+    assert len(sales.comparables("Gibson", "Les Paul Standard")) == 5
+
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT lot_url FROM lots "
+            "WHERE lower(brand) = 'gibson' AND lower(model) = 'les paul standard' "
+            "ORDER BY sale_id DESC, lot_url DESC LIMIT 2"
+        )))
+    # Read in index order, without sorting
+    assert "ix_lots_brand_model_sale" in plan
+    assert "TEMP B-TREE" not in plan
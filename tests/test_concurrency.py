@@ -0,0 +1,83 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.scraping.base_scraper import BaseScraper
+from src.scraping.concurrency import AdaptiveLimiter, backoff_delay
+
+
+def test_backoff_delay_honours_retry_after_up_to_the_maximum():
+    assert backoff_delay(0, 1.0, 60.0, retry_after=5.0) == 5.0
+    assert backoff_delay(0, 1.0, 60.0, retry_after=600.0) == 60.0
+    assert 0 <= backoff_delay(10, 1.0, 4.0) <= 4.0
+
+
+def test_successes_grow_the_limit_additively():
+    limiter = AdaptiveLimiter(initial=2, max_limit=4, latency_window=10)
+    for _ in range(3):
+        limiter.on_success(0.01)
+    assert int(limiter.limit) == 3
+    for _ in range(100):
+        limiter.on_success(0.01)
+    assert limiter.limit == 4
+
+
+def test_throttles_halve_the_limit_once_per_round_trip():
+    limiter = AdaptiveLimiter(initial=16, min_limit=2)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    assert limiter.decreases == 1
+    limiter._last_decrease = float("-inf")
+    for _ in range(5):
+        limiter.on_error()
+        limiter._last_decrease = float("-inf")
+    assert limiter.limit == 2
+
+
+def test_latency_rise_shrinks_the_limit():
+    limiter = AdaptiveLimiter(initial=8, latency_window=20)
+    for _ in range(20):
+        limiter.on_success(0.01)
+    grown = limiter.limit
+    for _ in range(20):
+        limiter.on_success(1.0)
+    assert limiter.limit < grown
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def run():
+        limiter = AdaptiveLimiter(initial=1, max_limit=1)
+        running, peak = 0, 0
+
+        async def request():
+            nonlocal running, peak
+            async with limiter:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(request() for _ in range(5)))
+        return peak, limiter.in_flight
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_error_statuses_do_not_grow_the_limit(tmp_path):
+    async def not_found(request):
+        raise web.HTTPNotFound()
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/{name}", not_found)
+        async with TestServer(app) as server:
+            base_url = str(server.make_url("/"))
+            async with BaseScraper(base_url, initial_concurrency_per_host=2) as scraper:
+                for number in range(10):
+                    assert await scraper.fetch_raw_async(f"/page-{number}") is None
+                    assert await scraper.download_async(f"/file-{number}", tmp_path / "file") is None
+                return scraper._host_limiter(base_url).limit
+
+    assert asyncio.run(run()) == 2
@@ -0,0 +1,132 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import pyarrow.dataset as ds  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from src.scraping.export import SCHEMA, export_batch, export_lots, lots_dataset, read_batch  # noqa: E402
+from src.scraping.models import Lot, LotBatch  # noqa: E402
+
+SCRAPED_AT = datetime(2026, 10, 18, 9, 30, tzinfo=timezone.utc)
+
+RECORDS = [
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/1", {
+        "title": "Gibson Les Paul Standard electric guitar",
+        "type": "electric",
+        "brand": "Gibson",
+        "model": "Les Paul Standard",
+        "year": 1959,
+        "made_in": "USA",
+        "weight": 4.5,
+        "overall condition": "Good",
+        "estimate_low": 20000,
+        "estimate_high": 30000,
+        "value_estimate_low": 22000,
+        "value_estimate_high": 32000,
+        "notes": ["Refret", "Replaced tuners"],
+        "full_description": "Made in USA. Body: sunburst finish.",
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/2", {
+        "title": "Fender Stratocaster electric guitar",
+        "brand": "Fender",
+        "model": "Stratocaster",
+        "estimate_low": 1500,
+        "estimate_high": 2000,
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/3", {"title": "Unknown Maker acoustic guitar"}],
+]
+
+
+def rows_by_url(batch: LotBatch) -> dict[str, dict]:
+    return {lot.lot_url: lot.to_row() | {"scraped_at": lot.scraped_at} for lot in batch}
+
+
+def expected_rows(scraped_at: datetime = SCRAPED_AT) -> dict[str, dict]:
+    return {
+        lot_url: Lot.from_entry(lot_url, entry).to_row() | {"scraped_at": scraped_at}
+        for lot_url, entry in RECORDS
+    }
+
+
+def test_export_lots_round_trip(tmp_path):
+    root = str(tmp_path / "lots")
+    assert export_lots(iter(RECORDS), root, scraped_at=SCRAPED_AT) == 3
+    assert sorted(path.relative_to(root).parent.as_posix() for path in (tmp_path / "lots").rglob("*.parquet")) == [
+        "sale_id=249/scraped_date=2026-10-18",
+        "sale_id=250/scraped_date=2026-10-18",
+    ]
+    batch = read_batch(root)
+    assert rows_by_url(batch) == expected_rows()
+    # Brand stays dictionary encoded
+    assert sorted(batch.codes("brand")[1]) == ["Fender", "Gibson"]
+
+
+def test_export_lots_writes_typed_columns(tmp_path):
+    root = tmp_path / "lots"
+    export_lots(RECORDS, str(root), scraped_at=SCRAPED_AT)
+    file_schema = pq.read_schema(next((root / "sale_id=249").rglob("*.parquet")))
+    for name in ("year", "weight", "estimate_low", "scraped_at", "brand", "notes", "value_difference"):
+        assert file_schema.field(name).type == SCHEMA.field(name).type
+    table = lots_dataset(str(root)).to_table(filter=ds.field("sale_id") == 249).sort_by("lot_url")
+    assert table.schema == SCHEMA
+    assert table.column("value_difference").to_pylist() == [2000.0, None]
+    assert table.column("weight").to_pylist() == [4.5, None]
+    assert table.column("scraped_date").to_pylist() == [date(2026, 10, 18)] * 2
+
+
+def test_filters_prune_partitions_and_rows(tmp_path):
+    root = str(tmp_path / "lots")
+    export_lots(RECORDS, root, scraped_at=SCRAPED_AT)
+    # Appending a later crawl keeps the earlier files
+    later = datetime(2026, 10, 19, 9, 30, tzinfo=timezone.utc)
+    export_lots(RECORDS[1:], root, scraped_at=later)
+    assert lots_dataset(root).count_rows() == 5
+
+    assert [lot.lot_url for lot in read_batch(root, filter=ds.field("sale_id") == 250)] == [RECORDS[2][0]] * 2
+    assert len(read_batch(root, filter=ds.field("scraped_date") == date(2026, 10, 19))) == 2
+    table = lots_dataset(root).to_table(
+        columns=["lot_url", "estimate_low"],
+        filter=(ds.field("brand") == "Gibson") & (ds.field("estimate_low") > 10000),
+    )
+    assert table.to_pylist() == [{"lot_url": RECORDS[0][0], "estimate_low": 20000}]
+    assert lots_dataset(root).to_table(columns=["lot_url"], filter=ds.field("brand") == "Martin").num_rows == 0
+
+
+def test_export_batch_matches_export_lots(tmp_path):
+    lots = [Lot.from_record(record) for record in RECORDS]
+    own_scraped_at = datetime(2026, 10, 17, 23, 59, 59, 123000, tzinfo=timezone.utc)
+    lots[2].scraped_at = own_scraped_at
+    batch = LotBatch.from_lots(lots)
+    root = str(tmp_path / "lots")
+    assert export_batch(batch, root, scraped_at=SCRAPED_AT) == 3
+    expected = expected_rows()
+    expected[RECORDS[2][0]]["scraped_at"] = own_scraped_at
+    assert rows_by_url(read_batch(root)) == expected
+    # A lot keeps its own scrape date for partitioning
+    assert len(read_batch(root, filter=ds.field("scraped_date") == date(2026, 10, 17))) == 1
+
+    other_root = str(tmp_path / "other")
+    export_lots(RECORDS, other_root, scraped_at=SCRAPED_AT)
+    columns = ["lot_url", "value_difference", "scraped_date", "sale_id"]
+    assert (
+        lots_dataset(root).to_table(columns=columns, filter=ds.field("sale_id") == 249).sort_by("lot_url")
+        == lots_dataset(other_root).to_table(columns=columns, filter=ds.field("sale_id") == 249).sort_by("lot_url")
+    )
+
+
+def test_batches_can_grow_after_export_and_read(tmp_path):
+    root = str(tmp_path / "lots")
+    batch = LotBatch.from_records(RECORDS)
+    export_batch(batch, root, scraped_at=SCRAPED_AT)
+    # Nothing left from the export pins the arrays, so they can still be resized
+    batch.extend(Lot.from_record(record) for record in RECORDS)
+    assert len(batch) == 6
+
+    read = read_batch(root)
+    read.append(Lot.from_record(RECORDS[0]))
+    assert len(read) == 4
+    assert read.column("estimate_low")[-1] == 20000
+    assert len(read_batch(root)) == 3
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from src.scraping.db import get_engine
+from src.scraping.frontier import CrawlFrontier, canonicalize_url
+from src.scraping.metrics import Metrics
+from src.scraping.pipeline import parse_stage
+from src.scraping.state import LotStateStore, content_hash
+
+SALE = "https://www.guitar-auctions.co.uk/sale/249/the-guitar-auction"
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://WWW.Guitar-Auctions.co.uk:443/sale/249/the-guitar-auction", SALE),
+    (f"{SALE}?utm_source=newsletter&gclid=x#lot-112", SALE),
+    (f"{SALE}?page=1", SALE),
+    (f"{SALE}?sort=lot&page=2", f"{SALE}?page=2&sort=lot"),
+    ("https://www.guitar-auctions.co.uk//sale/./249/x/../the-guitar-auction", SALE),
+    ("https://www.guitar-auctions.co.uk/sale/%32%34%39/the%2dguitar%2Dauction", SALE),
+    ("http://example.com:8080", "http://example.com:8080/"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url, default_params={"page": "1"}) == expected
+
+
+def test_canonicalize_url_resolves_against_base():
+    assert canonicalize_url("/sale/249/the-guitar-auction", base_url="https://www.guitar-auctions.co.uk/") == SALE
+
+
+def test_equivalent_urls_are_queued_once():
+    frontier = CrawlFrontier()
+    assert frontier.add(SALE)
+    assert not frontier.add(f"{SALE}#top")
+    assert frontier.duplicates == 1
+    assert frontier.pop() == (SALE, 0)
+    assert frontier.pop() is None
+
+
+def test_pop_order_is_priority_then_insertion():
+    frontier = CrawlFrontier()
+    frontier.add_many(["https://example.com/b", "https://example.com/c"], priority=1)
+    frontier.add("https://example.com/a", priority=0)
+    assert [frontier.pop()[0] for _ in range(3)] == [
+        "https://example.com/a", "https://example.com/b", "https://example.com/c",
+    ]
+
+
+def test_resume_requeues_unfinished_urls(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    with CrawlFrontier(path) as frontier:
+        frontier.add_many(["https://example.com/1", "https://example.com/2", "https://example.com/3"])
+        frontier.pop()
+        frontier.done("https://example.com/1")
+        # Popped but not done, so in flight when the crawl stopped
+        frontier.pop()
+        frontier.done("https://example.com/3")
+    with CrawlFrontier(path) as frontier:
+        assert frontier.stats() == {"pending": 1, "completed": 2, "duplicates": 0}
+        assert not frontier.add("https://example.com/1")
+        assert frontier.pop() == ("https://example.com/2", 0)
+        assert frontier.pop() is None
+
+
+def test_resume_ignores_a_truncated_last_line(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    with CrawlFrontier(path) as frontier:
+        frontier.add("https://example.com/1")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"done": "https://exam')
+    with CrawlFrontier(path) as frontier:
+        assert frontier.is_pending("https://example.com/1")
+        frontier.done("https://example.com/1")
+    with CrawlFrontier(path) as frontier:
+        assert len(frontier) == 0
+        assert frontier.seen("https://example.com/1")
+
+
+def test_resume_ignores_a_last_line_without_its_newline(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    with CrawlFrontier(path) as frontier:
+        frontier.add("https://example.com/1")
+    # Valid JSON, but the crash came before the newline
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"done": "https://example.com/1"}')
+    with CrawlFrontier(path) as frontier:
+        assert frontier.is_pending("https://example.com/1")
+        assert frontier.completed == 0
+        frontier.add("https://example.com/2")
+    with CrawlFrontier(path) as frontier:
+        assert [frontier.pop()[0] for _ in range(2)] == ["https://example.com/1", "https://example.com/2"]
+
+
+def test_done_is_counted_once_per_url(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    with CrawlFrontier(path) as frontier:
+        frontier.add_many(["https://example.com/1", "https://example.com/2"])
+        frontier.pop()
+        frontier.done("https://example.com/1")
+        frontier.done("https://example.com/1#top")
+        # Still queued
+        frontier.done("https://example.com/2")
+        frontier.done("https://example.com/2")
+        assert frontier.stats() == {"pending": 0, "completed": 2, "duplicates": 0}
+    with CrawlFrontier(path) as frontier:
+        frontier.done("https://example.com/1")
+        # Never added
+        frontier.done("https://example.com/3")
+        assert frontier.completed == 3
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+
+
+class FakeScraper():
+    def __init__(self):
+        self.metrics = Metrics()
+
+    def parse_lot_page(self, html_content):
+        return {"description": html_content, "estimate": "£100 - £200"}
+
+
+def test_lots_skipped_as_unchanged_are_marked_done(tmp_path):
+    path = tmp_path / "frontier.jsonl"
+    state = LotStateStore(get_engine(f"sqlite:///{tmp_path / 'state.db'}"))
+    state.record_enrichment("https://example.com/1", content_hash(FakeScraper().parse_lot_page("same")))
+    state.flush()
+
+    async def pages():
+        yield "https://example.com/1", "same"
+        yield "https://example.com/2", "new"
+
+    async def run(frontier):
+        return [lot_url async for lot_url, _ in parse_stage(FakeScraper(), pages(), state, on_skip=frontier.done)]
+
+    with CrawlFrontier(path) as frontier:
+        frontier.add_many(["https://example.com/1", "https://example.com/2"])
+        assert asyncio.run(run(frontier)) == ["https://example.com/2"]
+    with CrawlFrontier(path) as frontier:
+        assert not frontier.is_pending("https://example.com/1")
+        assert frontier.is_pending("https://example.com/2")
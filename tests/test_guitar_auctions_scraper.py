@@ -0,0 +1,78 @@
+import asyncio
+import re
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.fake_site import _PAGINATION, FIXTURES, LOTS_PER_PAGE, SALE_PATH, listing_page
+from src.scraping.guitar_auctions_scraper import GuitarAuctionScraper
+
+TEMPLATE = (FIXTURES / "sale_listing.html").read_text(encoding="utf-8")
+_LOT_NUMBER = re.compile(r"/(\d+)-[^/]*$")
+
+
+def lots_of(page: int) -> list[int]:
+    first = 100 + (page - 1) * LOTS_PER_PAGE
+    return list(range(first, first + LOTS_PER_PAGE))
+
+
+def sale_lots(render, max_retries: int = 0) -> list[int]:
+    """Lot numbers yielded by iter_sale_lot_links for a sale whose listing page n is render(n)."""
+    async def listing(request):
+        html = render(int(request.query.get("page", 1)))
+        if html is None:
+            raise web.HTTPServiceUnavailable()
+        return web.Response(text=html, content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get(SALE_PATH, listing)
+        async with TestServer(app) as server:
+            base_url = str(server.make_url("/")).rstrip("/")
+            async with GuitarAuctionScraper(base_url, max_retries=max_retries) as scraper:
+                return [url async for url in scraper.iter_sale_lot_links(SALE_PATH, probe_window=2)]
+
+    return [int(_LOT_NUMBER.search(url).group(1)) for url in asyncio.run(run())]
+
+
+def test_linked_pages_are_all_fetched():
+    assert sale_lots(lambda page: listing_page(TEMPLATE, page, 4)) == [
+        lot for page in range(1, 5) for lot in lots_of(page)
+    ]
+
+
+def test_pagination_is_extended_by_later_pages():
+    # Each page only links the two pages after it
+    assert sale_lots(lambda page: listing_page(TEMPLATE, page, min(7, page + 2))) == [lot for page in range(1, 8) for lot in lots_of(page)]
+
+
+def unpaginated(pages: int, failing: frozenset[int] = frozenset()):
+    def render(page):
+        if page in failing:
+            return None
+        return _PAGINATION.sub("", listing_page(TEMPLATE, page, pages))
+
+    return render
+
+
+def test_pages_are_probed_until_one_has_no_lots():
+    assert sale_lots(unpaginated(5)) == [lot for page in range(1, 6) for lot in lots_of(page)]
+
+
+def test_probing_skips_pages_that_fail():
+    # Probe windows are pages 2-3, 4-5 and 6-7
+    assert sale_lots(unpaginated(5, frozenset([3, 4]))) == [
+        lot for page in (1, 2, 5) for lot in lots_of(page)
+    ]
+
+
+def test_probing_stops_when_a_whole_window_fails():
+    assert sale_lots(unpaginated(5, frozenset([2, 3, 4, 5, 6, 7]))) == lots_of(1)
+
+
+def test_lots_are_yielded_once_in_page_order():
+    # Page 3 lists page 2's lots again
+    def render(page):
+        return listing_page(TEMPLATE, 2 if page == 3 else page, 4)
+
+    assert sale_lots(render) == [lot for page in (1, 2, 4) for lot in lots_of(page)]
@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import os
+import time
+
+from src.scraping.images import ImageStore, image_stage
+from src.scraping.metrics import Metrics
+
+URL = "https://example.com/images/1.jpg"
+
+
+def add(store: ImageStore, url: str, content: bytes):
+    tmp_path = store.temp_path()
+    tmp_path.write_bytes(content)
+    return store.add(url, tmp_path, hashlib.sha256(content).hexdigest(), len(content), "image/jpeg")
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = ImageStore(tmp_path)
+    first, first_is_new = add(store, URL, b"photo")
+    second, second_is_new = add(store, "https://example.com/images/2.jpg", b"photo")
+    assert first_is_new and not second_is_new
+    assert store.object_path(first) == store.object_path(second)
+    assert store.object_path(first).read_bytes() == b"photo"
+    assert store.stats() == {"urls": 2, "objects": 1, "duplicates": 1, "bytes_deduplicated": 5}
+
+
+def test_reopen_drops_a_truncated_index_line(tmp_path):
+    store = ImageStore(tmp_path)
+    image, _ = add(store, URL, b"photo")
+    complete = store.index_path.read_bytes()
+    with open(store.index_path, "ab") as f:
+        f.write(b'{"url": "https://example.com/images/2.jpg", "sha')
+    reopened = ImageStore(tmp_path)
+    assert reopened.latest(URL) == image
+    assert len(reopened) == 1
+    assert store.index_path.read_bytes() == complete
+    add(reopened, "https://example.com/images/2.jpg", b"other")
+    assert len(ImageStore(tmp_path)) == 2
+
+
+def test_only_stale_partial_downloads_are_removed(tmp_path):
+    store = ImageStore(tmp_path)
+    stale, fresh = store.temp_path(), store.temp_path()
+    stale.write_bytes(b"partial")
+    fresh.write_bytes(b"in progress")
+    two_hours_ago = time.time() - 2 * 3600
+    os.utime(stale, (two_hours_ago, two_hours_ago))
+    ImageStore(tmp_path)
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+class FakeScraper():
+    def __init__(self):
+        self.metrics = Metrics()
+
+
+class FakeDownloader():
+    def __init__(self, images: dict):
+        self.scraper = FakeScraper()
+        self.images = images
+
+    async def download(self, image_url):
+        return self.images.get(image_url)
+
+
+def test_image_stage_marks_failed_downloads():
+    downloader = FakeDownloader({"a.jpg": "image a", "c.jpg": "image c"})
+
+    async def lots():
+        yield "lot/1", ["a.jpg", "b.jpg", "c.jpg"]
+        yield "lot/2", ["c.jpg"]
+
+    async def run():
+        return [result async for result in image_stage(downloader, lots())]
+
+    assert sorted(asyncio.run(run())) == [
+        ("lot/1", ["image a", None, "image c"]),
+        ("lot/2", ["image c"]),
+    ]
@@ -0,0 +1,56 @@
+import gzip
+
+import pytest
+
+from src.scraping.jsonl import JsonlSink, completed_lot_urls, load_data_from_disk, save_data_to_disk
+
+RECORDS = [["lot/1", {"description": "a"}], ["lot/2", {"description": "b"}]]
+
+
+@pytest.mark.parametrize("name", ["lots.jsonl", "lots.jsonl.gz"])
+def test_save_and_load_round_trip(tmp_path, name):
+    path = tmp_path / name
+    save_data_to_disk(iter(RECORDS), path)
+    assert list(load_data_from_disk(path)) == RECORDS
+    assert completed_lot_urls(path) == {"lot/1", "lot/2"}
+
+
+def test_missing_file_has_no_completed_lots(tmp_path):
+    assert completed_lot_urls(tmp_path / "lots.jsonl") == set()
+
+
+def test_sink_appends_and_checkpoints(tmp_path):
+    path = tmp_path / "lots.jsonl"
+    with JsonlSink(path, checkpoint_every=1) as sink:
+        sink.write(RECORDS[0])
+        # Durable before the sink is closed
+        assert list(load_data_from_disk(path)) == RECORDS[:1]
+    with JsonlSink(path) as sink:
+        sink.write(RECORDS[1])
+    assert list(load_data_from_disk(path)) == RECORDS
+    assert sink.records_written == 1
+
+
+def test_sink_drops_a_truncated_tail(tmp_path):
+    path = tmp_path / "lots.jsonl"
+    save_data_to_disk(RECORDS[:1], path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["lot/2", {"descri')
+    assert list(load_data_from_disk(path)) == RECORDS[:1]
+    with JsonlSink(path) as sink:
+        sink.write(RECORDS[1])
+    assert list(load_data_from_disk(path)) == RECORDS
+
+
+def test_sink_drops_a_truncated_gzip_stream(tmp_path):
+    path = tmp_path / "lots.jsonl.gz"
+    save_data_to_disk(RECORDS * 50, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    with pytest.raises(EOFError):
+        gzip.decompress(path.read_bytes())
+    with JsonlSink(path) as sink:
+        sink.write(["lot/3", {}])
+    records = list(load_data_from_disk(path))
+    assert records[-1] == ["lot/3", {}]
+    assert records[:-1] == (RECORDS * 50)[:len(records) - 1]
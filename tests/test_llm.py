@@ -0,0 +1,61 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.fake_llm_server import make_app
+from src.scraping.db import get_engine
+from src.scraping.llm import LLMClient, LLMEnricher
+from src.scraping.llm_cache import LLMCache
+
+TITLE = "Gibson EB-3 bass guitar, made in USA"
+
+
+async def _call(app: web.Application, cache: LLMCache | None = None, calls: int = 1) -> list[dict]:
+    async with TestServer(app) as server:
+        base_url = str(server.make_url("/v1"))
+        async with LLMClient(base_url, api_key="test", cache=cache, max_retries=0) as llm:
+            return [await llm.parse_title_with_llm(TITLE) for _ in range(calls)]
+
+
+def test_parses_title_fields():
+    [data] = asyncio.run(_call(make_app()))
+    assert data == {"brand": "Gibson", "model": "EB-3 bass", "type": "bass"}
+
+
+def test_second_call_is_a_cache_hit(tmp_path):
+    app = make_app()
+    cache = LLMCache(get_engine(f"sqlite:///{tmp_path / 'cache.db'}"))
+    first, second = asyncio.run(_call(app, cache, calls=2))
+    assert first == second
+    assert app["stats"]["requests"] == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_content_that_is_not_an_object_is_a_failure(tmp_path):
+    app = make_app(malformed_rate=1.0)
+    cache = LLMCache(get_engine(f"sqlite:///{tmp_path / 'cache.db'}"))
+    assert asyncio.run(_call(app, cache, calls=2)) == [{}, {}]
+    # Failures aren't cached
+    assert app["stats"]["requests"] == 2
+
+
+def test_malformed_completions_are_failures():
+    for body in [{"choices": []}, {"error": "no choices"}, [], {"choices": [{"message": {"content": None}}]}]:
+        app = web.Application()
+
+        async def chat_completions(request, body=body):
+            return web.json_response(body)
+
+        app.router.add_post("/v1/chat/completions", chat_completions)
+        assert asyncio.run(_call(app)) == [{}]
+
+
+def test_enrich_keeps_the_record_when_the_llm_misbehaves():
+    async def enrich():
+        async with TestServer(make_app(malformed_rate=1.0)) as server:
+            async with LLMClient(str(server.make_url("/v1")), api_key="test") as llm:
+                return await LLMEnricher(llm).enrich({"title": TITLE, "description": "A bass"})
+
+    assert asyncio.run(enrich()) == {"title": TITLE, "description": "A bass"}
@@ -0,0 +1,59 @@
+from sqlalchemy import select
+
+from src.scraping.db import LLMCacheEntry, get_engine
+from src.scraping.llm_cache import LLMCache
+
+
+def _cache(tmp_path, monkeypatch, now, **kwargs) -> LLMCache:
+    monkeypatch.setattr("src.scraping.llm_cache.time.time", lambda: now[0])
+    return LLMCache(get_engine(f"sqlite:///{tmp_path / 'cache.db'}"), **kwargs)
+
+
+def _last_used_at(cache: LLMCache, key: str) -> float:
+    with cache.engine.connect() as conn:
+        return conn.execute(select(LLMCacheEntry.last_used_at).where(LLMCacheEntry.key == key)).scalar_one()
+
+
+def test_hits_only_refresh_stale_last_use(tmp_path, monkeypatch):
+    now = [1000.0]
+    cache = _cache(tmp_path, monkeypatch, now, touch_interval=60)
+    key = cache.key("model", "system", "prompt", 0.0)
+    assert cache.get(key) is None
+    cache.set(key, "model", {"brand": "Gibson"})
+    now[0] += 30
+    assert cache.get(key) == {"brand": "Gibson"}
+    assert _last_used_at(cache, key) == 1000.0
+    now[0] += 60
+    assert cache.get(key) == {"brand": "Gibson"}
+    assert _last_used_at(cache, key) == 1090.0
+    assert cache.stats()["hits"] == 2
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    now = [1000.0]
+    cache = _cache(tmp_path, monkeypatch, now, ttl=100)
+    key = cache.key("model", "system", "prompt", 0.0)
+    cache.set(key, "model", {"brand": "Gibson"})
+    now[0] += 101
+    assert cache.get(key) is None
+    assert cache.expired == 1
+
+
+def test_prune_keeps_the_most_recently_used(tmp_path, monkeypatch):
+    now = [1000.0]
+    cache = _cache(tmp_path, monkeypatch, now, max_entries=2, prune_every=3, touch_interval=0)
+    keys = [cache.key("model", "system", f"prompt {number}", 0.0) for number in range(3)]
+    for key in keys[:2]:
+        cache.set(key, "model", {})
+        now[0] += 1
+    cache.get(keys[0])
+    now[0] += 1
+    cache.set(keys[2], "model", {})
+    assert cache.evictions == 1
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == {}
+
+
+def test_normalized_keys_ignore_case_and_whitespace(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, monkeypatch, [0.0], normalize=True)
+    assert cache.key("model", "System", "a  prompt\n", 0.0) == cache.key("model", "system", "A prompt", 0.0)
@@ -0,0 +1,54 @@
+from src.scraping.lot_parser import parse_lot_data, parse_lot_data_batch
+from src.scraping.models import Lot
+
+LOT = {
+    "description": (
+        "1959 Gibson Les Paul Standard electric guitar, made in USA; Body: sunburst finish; "
+        "Neck: good; Weight: 4.2kg; Overall condition: good; Serial no. 9 1234 * Refret * Case included"
+    ),
+    "estimate": "Estimate: £20000-30000",
+}
+
+RECORDS = [
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/1", LOT],
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/2", {
+        "description": "Fender Stratocaster electric guitar; Weight: heavy",
+        "estimate": "No estimate",
+        "brand": "Fender",
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/3", {"title": "Unknown Maker acoustic guitar"}],
+]
+
+
+def test_parse_lot_data():
+    assert parse_lot_data(LOT) == {
+        "estimate_low": 20000,
+        "estimate_high": 30000,
+        "full_description": LOT["description"],
+        "notes": ["Refret", "Case included", "Serial no. 9 1234"],
+        "year": "1959",
+        "title": "Gibson Les Paul Standard electric guitar, made in USA",
+        "made_in": "USA",
+        "body": "sunburst finish",
+        "neck": "good",
+        "weight": 4.2,
+        "overall condition": "good",
+    }
+
+
+def test_unparseable_weight_is_kept_as_a_note():
+    result = parse_lot_data({"description": "Fender Stratocaster; Weight: heavy", "estimate": ""})
+    assert "weight" not in result
+    assert result["notes"] == ["Weight: heavy"]
+
+
+def test_batch_matches_parse_lot_data_row_for_row():
+    batch = parse_lot_data_batch(iter(RECORDS))
+    assert len(batch) == len(RECORDS)
+    for (lot_url, entry), lot in zip(RECORDS, batch):
+        if "description" in entry:
+            entry = entry | parse_lot_data(entry)
+        assert lot == Lot.from_entry(lot_url, entry)
+    assert list(batch.column("year")) == [1959, -1, -1]
+    assert batch.column("brand") == [None, "Fender", None]
+    assert batch[0].extras == {"description": LOT["description"], "estimate": LOT["estimate"]}
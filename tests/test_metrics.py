@@ -0,0 +1,129 @@
+import pytest
+
+from src.scraping.metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(1.0, 2.0, 5.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == 6.5
+    assert snapshot["mean"] == 1.625
+    # Rank 2 is the first of the two observations in (1, 2]
+    assert snapshot["p50"] == 1.5
+    # Rank 3.96 is 96% of the way through the one observation in (2, 5]
+    assert snapshot["p99"] == pytest.approx(4.88)
+
+
+def test_histogram_bucket_bounds_are_inclusive():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(1.0, 2.0))
+    histogram.observe(1.0)
+    histogram.observe(2.0)
+    assert histogram.render()[:3] == [
+        'guitar_safari_latency_seconds_bucket{le="1"} 1',
+        'guitar_safari_latency_seconds_bucket{le="2"} 2',
+        'guitar_safari_latency_seconds_bucket{le="+Inf"} 2',
+    ]
+
+
+def test_histogram_quantiles_above_the_largest_bucket_report_its_bound():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(1.0, 2.0))
+    for value in (10.0, 20.0):
+        histogram.observe(value)
+    assert histogram.snapshot()["p50"] == histogram.snapshot()["p99"] == 2.0
+
+
+def test_empty_histogram_snapshot():
+    histogram = Histogram("latency_seconds", "Latency.")
+    assert histogram.snapshot() == {"count": 0, "sum": 0.0, "mean": 0.0, "p50": 0.0, "p99": 0.0}
+    assert histogram.render() == []
+
+
+def test_labelled_snapshots_are_keyed_by_label_values():
+    metrics = Metrics()
+    metrics.fetch_bytes.inc(100, "example.com")
+    metrics.fetch_bytes.inc(50, "example.com")
+    metrics.fetch_bytes.inc(10, "example.org")
+    metrics.fetch_seconds.observe(0.02, "example.com", 200)
+    snapshot = metrics.snapshot()
+    assert snapshot["fetch_bytes_total"] == {"host=example.com": 150, "host=example.org": 10}
+    assert metrics.fetch_bytes.value("example.com") == 150
+    assert metrics.fetch_bytes.value("example.net") == 0
+    assert list(snapshot["fetch_seconds"]) == ["host=example.com,status=200"]
+    assert snapshot["fetch_seconds"]["host=example.com,status=200"]["count"] == 1
+    assert snapshot["cache_lookups_total"] == {}
+
+
+def test_unlabelled_counter_snapshot_is_a_number():
+    metrics = Metrics()
+    pages = metrics.counter("pages_total", "Pages.")
+    assert metrics.snapshot()["pages_total"] == 0
+    pages.inc()
+    pages.inc(2)
+    assert metrics.snapshot()["pages_total"] == 3
+
+
+def test_registering_a_metric_again():
+    metrics = Metrics()
+    assert metrics.counter("fetch_bytes_total", "Bytes.", ("host",)) is metrics.fetch_bytes
+    with pytest.raises(ValueError):
+        metrics.counter("fetch_bytes_total", "Bytes.", ("host", "status"))
+    with pytest.raises(ValueError):
+        metrics.gauge("fetch_bytes_total", "Bytes.", ("host",))
+
+
+def test_callbacks_run_before_each_snapshot():
+    metrics = Metrics()
+    queue_depth = metrics.gauge("queue_depth", "Items queued.")
+    depths = iter([4, 7])
+    metrics.add_callback(lambda metrics: queue_depth.set(next(depths)))
+    assert metrics.snapshot()["queue_depth"] == 4
+    assert "guitar_safari_queue_depth 7\n" in metrics.to_prometheus()
+
+
+PROMETHEUS_TEXT = """\
+# HELP guitar_safari_test_requests_total Requests served.
+# TYPE guitar_safari_test_requests_total counter
+guitar_safari_test_requests_total{method="GET",path="/"} 3
+guitar_safari_test_requests_total{method="POST",path="say \\"hi\\"\\n\\\\"} 1
+# HELP guitar_safari_test_queue_depth Items queued.
+# TYPE guitar_safari_test_queue_depth gauge
+guitar_safari_test_queue_depth 3
+# HELP guitar_safari_test_latency_seconds Request latency.
+# TYPE guitar_safari_test_latency_seconds histogram
+guitar_safari_test_latency_seconds_bucket{method="GET",le="0.1"} 1
+guitar_safari_test_latency_seconds_bucket{method="GET",le="1"} 2
+guitar_safari_test_latency_seconds_bucket{method="GET",le="+Inf"} 3
+guitar_safari_test_latency_seconds_sum{method="GET"} 2.5625
+guitar_safari_test_latency_seconds_count{method="GET"} 3
+"""
+
+
+def test_prometheus_text_format(tmp_path):
+    metrics = Metrics()
+    requests = metrics.counter("test_requests_total", "Requests served.", ("method", "path"))
+    requests.inc(1, "POST", 'say "hi"\n\\')
+    requests.inc(1, "GET", "/")
+    requests.inc(2, "GET", "/")
+    queue_depth = metrics.gauge("test_queue_depth", "Items queued.")
+    queue_depth.set(5)
+    queue_depth.dec(2)
+    latency = metrics.histogram("test_latency_seconds", "Request latency.", ("method",), buckets=(0.1, 1.0))
+    for value in (0.0625, 0.5, 2.0):
+        latency.observe(value, "GET")
+
+    text = metrics.to_prometheus()
+    # Metrics nothing was recorded for still get their HELP and TYPE lines
+    assert text.startswith(
+        "# HELP guitar_safari_fetch_seconds Page fetch latency, including waiting for a per-host slot.\n"
+        "# TYPE guitar_safari_fetch_seconds histogram\n"
+        "# HELP guitar_safari_fetch_bytes_total "
+    )
+    assert text[text.index("# HELP guitar_safari_test_requests_total"):] == PROMETHEUS_TEXT
+
+    path = tmp_path / "guitar_safari.prom"
+    metrics.write_prometheus(str(path))
+    assert path.read_text(encoding="utf-8") == text
+    assert list(tmp_path.iterdir()) == [path]
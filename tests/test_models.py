@@ -0,0 +1,95 @@
+import math
+from datetime import datetime, timezone
+
+import pytest
+
+from src.scraping.models import Lot, LotBatch
+
+RECORDS = [
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/1", {
+        "title": "Gibson Les Paul Standard electric guitar",
+        "type": "electric",
+        "brand": "Gibson",
+        "model": "Les Paul Standard",
+        "year": 1959,
+        "made_in": "USA",
+        "weight": 4.2,
+        "overall condition": "Good",
+        "estimate_low": 20000,
+        "estimate_high": 30000,
+        "notes": ["Refret", "Replaced tuners"],
+        "full_description": "Made in USA. Body: sunburst finish.",
+        "description": "raw description",
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/249/lot/2", {
+        "title": "Fender Stratocaster electric guitar",
+        "brand": "Fender",
+        "model": "Stratocaster",
+        "year": "1960s",
+    }],
+    ["https://www.guitar-auctions.co.uk/sale/250/lot/3", {"title": "Unknown Maker acoustic guitar"}],
+]
+
+
+def test_lot_record_round_trip():
+    for record in RECORDS:
+        assert Lot.from_record(record).to_record() == record
+
+
+def test_lot_keeps_unconvertible_values_in_extras():
+    lot = Lot.from_record(RECORDS[1])
+    assert lot.sale_id == 249
+    assert lot.year is None
+    assert lot.extras == {"year": "1960s"}
+
+
+def test_lot_row_round_trip():
+    lot = Lot.from_record(RECORDS[0])
+    row = lot.to_row()
+    assert row["overall_condition"] == "Good"
+    assert row["notes"] == ["Refret", "Replaced tuners"]
+    # Rows have no extras
+    assert Lot.from_row(row) == Lot.from_record([RECORDS[0][0], {
+        key: value for key, value in RECORDS[0][1].items() if key != "description"
+    }])
+
+
+def test_batch_records_round_trip():
+    batch = LotBatch.from_records(RECORDS)
+    assert len(batch) == 3
+    assert list(batch.to_records()) == RECORDS
+    assert batch.where(brand="Fender") == [1]
+    assert batch.where(brand="Fender", model="Les Paul Standard") == []
+    assert list(batch.take([2, 0]).to_records()) == [RECORDS[2], RECORDS[0]]
+
+
+def test_batch_rows_round_trip():
+    lots = [Lot.from_record(record) for record in RECORDS]
+    batch = LotBatch.from_rows(lot.to_row() for lot in lots)
+    assert [lot.to_row() for lot in batch] == [lot.to_row() for lot in lots]
+
+
+def test_batch_arrow_round_trip():
+    pytest.importorskip("pyarrow")
+    scraped_at = datetime(2024, 12, 5, 10, 30, tzinfo=timezone.utc)
+    lots = [Lot.from_record(record) for record in RECORDS]
+    lots[0].scraped_at = scraped_at
+    batch = LotBatch.from_lots(lots)
+    table = batch.to_arrow()
+    assert table.column("year").to_pylist() == [1959, None, None]
+    assert table.column("weight").to_pylist() == [4.2, None, None]
+    assert table.column("brand").to_pylist() == ["Gibson", "Fender", None]
+    assert table.column("scraped_at").to_pylist()[0] == scraped_at
+    assert list(LotBatch.from_arrow(table)) == list(batch)
+    assert math.isnan(LotBatch.from_arrow(table.drop_columns(["weight"])).column("weight")[0])
+
+
+def test_batch_can_grow_while_its_table_is_alive():
+    pytest.importorskip("pyarrow")
+    batch = LotBatch.from_records(RECORDS[:2])
+    table = batch.to_arrow(include_extras=False)
+    batch.extend(Lot.from_record(record) for record in RECORDS)
+    assert len(batch) == 5
+    assert table.num_rows == 2
+    assert table.column("estimate_low").to_pylist() == [20000, None]
+    assert "extras" not in table.column_names
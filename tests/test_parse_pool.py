@@ -0,0 +1,80 @@
+import asyncio
+from urllib.parse import urlparse
+
+import pytest
+from aiohttp.test_utils import TestServer
+from bs4 import BeautifulSoup
+
+from benchmarks.fake_site import FIXTURES, SALE_PATH, listing_page, make_app
+from src.scraping.frontier import CrawlFrontier
+from src.scraping.guitar_auctions_scraper import GuitarAuctionScraper
+from src.scraping.parse_pool import ParsePool
+from src.scraping.parsing import extract_lot_details
+
+BASE_URL = "https://www.guitar-auctions.co.uk"
+SALE_URL = BASE_URL + SALE_PATH
+LOT_HTML = (FIXTURES / "lot_detail.html").read_bytes()
+LISTING_HTML = listing_page((FIXTURES / "sale_listing.html").read_text(encoding="utf-8"), 2, 9).encode("utf-8")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ParsePool(2) as pool:
+        yield pool
+
+
+def test_parse_lot_matches_beautifulsoup(pool):
+    lot_data = asyncio.run(pool.parse_lot(LOT_HTML))
+    assert lot_data == extract_lot_details(BeautifulSoup(LOT_HTML, "lxml"))
+    assert lot_data["estimate"].startswith("Estimate:")
+
+
+def test_parse_listing_matches_beautifulsoup(pool):
+    listing = asyncio.run(pool.parse_listing(LISTING_HTML, BASE_URL, SALE_URL))
+    scraper = GuitarAuctionScraper(BASE_URL)
+    soup = BeautifulSoup(LISTING_HTML, "lxml")
+    assert listing["lot_links"] == scraper.get_lot_links(soup, BASE_URL)
+    assert len(listing["lot_links"]) == 48
+    assert listing["last_page"] == scraper.last_page_number(soup, SALE_URL) == 9
+    assert asyncio.run(pool.parse_listing(LISTING_HTML, BASE_URL))["last_page"] is None
+
+
+def crawl_sale(parse_pool, use_frontier: bool) -> list[str]:
+    """Paths of the lots found in a three page sale on the fake site."""
+    async def run():
+        async with TestServer(make_app(pages=3, image_size=10)) as server:
+            base_url = str(server.make_url("/")).rstrip("/")
+            async with GuitarAuctionScraper(base_url) as scraper:
+                if not use_frontier:
+                    return [url async for url in scraper.iter_sale_lot_links(SALE_PATH, parse_pool=parse_pool)]
+                frontier = CrawlFrontier(canonicalize=scraper.canonicalize_url)
+                frontier.add(base_url + SALE_PATH)
+                lot_urls = []
+                async for lot_url, _ in scraper.crawl_frontier(frontier, parse_pool=parse_pool):
+                    lot_urls.append(lot_url)
+                    frontier.done(lot_url)
+                return sorted(lot_urls)
+
+    return [urlparse(lot_url).path for lot_url in asyncio.run(run())]
+
+
+class CountingPool():
+    """Forwards listing pages to a ParsePool, counting them."""
+
+    def __init__(self, pool: ParsePool):
+        self.pool = pool
+        self.listings = 0
+
+    async def parse_listing(self, *args):
+        self.listings += 1
+        return await self.pool.parse_listing(*args)
+
+
+@pytest.mark.parametrize("use_frontier", [False, True])
+def test_listing_pages_parse_the_same_in_the_pool(pool, use_frontier):
+    lot_urls = crawl_sale(None, use_frontier)
+    assert len(lot_urls) == 3 * 48
+    counting_pool = CountingPool(pool)
+    assert crawl_sale(counting_pool, use_frontier) == lot_urls
+    # The pages link each other, so none past the last is fetched
+    assert counting_pool.listings == 3
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from src.scraping.db import get_engine
+from src.scraping.jsonl import load_data_from_disk
+from src.scraping.metrics import Metrics
+from src.scraping.pipeline import map_concurrently, scrape_lots
+from src.scraping.state import LotStateStore, content_hash
+
+LOT_URLS = [f"https://example.com/lot/{number}" for number in range(1, 6)]
+
+
+async def aiter_of(items):
+    for item in items:
+        yield item
+
+
+def test_map_concurrently_bounds_calls_in_flight():
+    running, peak, reported = 0, 0, []
+
+    async def square(number):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Later items finish first
+        await asyncio.sleep(0.01 * (10 - number))
+        running -= 1
+        return number * number
+
+    async def run():
+        items = aiter_of([(number,) for number in range(10)])
+        return [result async for result in map_concurrently(items, square, 3, reported.append)]
+
+    results = asyncio.run(run())
+    assert sorted(results) == [number * number for number in range(10)]
+    assert results != sorted(results)
+    assert peak == 3
+    assert max(reported) <= 3
+    assert reported[-1] == 0
+
+
+def test_map_concurrently_cancels_calls_when_closed_early():
+    cancelled = []
+
+    async def wait(number):
+        try:
+            # Long enough for the others to start
+            await asyncio.sleep(0.05 if number == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return number
+
+    async def run():
+        results = map_concurrently(aiter_of([(number,) for number in range(4)]), wait, 4)
+        first = await anext(results)
+        await results.aclose()
+        # Let the cancellations land
+        await asyncio.sleep(0)
+        return first
+
+    assert asyncio.run(run()) == 0
+    assert sorted(cancelled) == [1, 2, 3]
+
+
+class FakeScraper():
+    """Serves every lot page from a dict, counting fetches."""
+
+    def __init__(self, pages: dict[str, str]):
+        self.pages = pages
+        self.fetched: list[str] = []
+        self.metrics = Metrics()
+
+    async def fetch_many(self, urls, raw=False):
+        for url in urls:
+            self.fetched.append(url)
+            yield url, self.pages.get(url)
+
+    def parse_lot_page(self, html_content) -> dict:
+        return {"description": html_content, "estimate": "£100 - £200"}
+
+
+def scrape(scraper, path, **kwargs) -> int:
+    return asyncio.run(scrape_lots(scraper, LOT_URLS, str(path), **kwargs))
+
+
+def test_resume_skips_lots_already_written(tmp_path):
+    path = tmp_path / "lots.jsonl"
+    pages = {url: f"lot {number}" for number, url in enumerate(LOT_URLS[:3], 1)}
+    assert scrape(FakeScraper(pages), path) == 3
+
+    scraper = FakeScraper({url: f"lot {number}" for number, url in enumerate(LOT_URLS, 1)})
+    assert scrape(scraper, path) == 2
+    assert scraper.fetched == LOT_URLS[3:]
+    assert [lot_url for lot_url, _ in load_data_from_disk(path)] == LOT_URLS
+
+
+def test_enrichment_is_recorded_only_once_checkpointed(tmp_path):
+    path = tmp_path / "lots.jsonl"
+    engine = get_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    scraper = FakeScraper({url: f"lot {number}" for number, url in enumerate(LOT_URLS, 1)})
+    lot_hashes = {url: content_hash(scraper.parse_lot_page(html)) for url, html in scraper.pages.items()}
+
+    def enrich(lot_data):
+        return lot_data | {"enriched": True}
+
+    def crash_on_lot_4(lot_data):
+        if lot_data["description"] == "lot 4":
+            raise RuntimeError("crashed")
+        return enrich(lot_data)
+
+    with pytest.raises(RuntimeError):
+        scrape(scraper, path, enrich=crash_on_lot_4, state=LotStateStore(engine, batch_size=1), checkpoint_every=2)
+    # Lot 3 was written after the last checkpoint, say it never reached the disk
+    with open(path, "r", encoding="utf-8") as f:
+        checkpointed = f.readlines()[:2]
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(checkpointed)
+
+    state = LotStateStore(engine)
+    assert not state.needs_enrichment(LOT_URLS[1], lot_hashes[LOT_URLS[1]])
+    assert state.needs_enrichment(LOT_URLS[2], lot_hashes[LOT_URLS[2]])
+
+    scraper.fetched.clear()
+    assert scrape(scraper, path, enrich=enrich, state=state) == 3
+    assert scraper.fetched == LOT_URLS[2:]
+    assert [lot_url for lot_url, _ in load_data_from_disk(path)] == LOT_URLS
+    assert not LotStateStore(engine).needs_enrichment(LOT_URLS[2], lot_hashes[LOT_URLS[2]])
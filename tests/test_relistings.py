@@ -0,0 +1,107 @@
+import pytest
+
+from src.scraping.models import Lot
+from src.scraping.relistings import RelistingIndex, lsh_parameters, shingles
+
+DESCRIPTION = (
+    "1959 Gibson Les Paul Standard electric guitar, made in USA, serial no. 9 1234. "
+    "Body: sunburst finish, some minor dings to the edges. Neck: good. Fretboard: rosewood, "
+    "light playwear. Frets: refret. Electrics: working, original PAF pickups. Hardware: replaced "
+    "tuners. Case: original brown case."
+)
+EDITED = DESCRIPTION.replace("some minor dings", "a few minor dings").replace("brown case", "brown hard case")
+OTHER = (
+    "2004 Fender American Deluxe Stratocaster electric guitar, made in USA. Body: olympic white "
+    "finish, buckle rash to the back. Neck: maple, good. Frets: good. Electrics: working. Case: gig bag."
+)
+
+
+def test_shingles_ignore_case_and_punctuation():
+    assert shingles("Gibson, Les Paul!") == {"gibson les paul"}
+    assert shingles("Gibson Les Paul Standard", size=3) == {"gibson les paul", "les paul standard"}
+    assert shingles("...") == set()
+
+
+def test_lsh_parameters_fit_num_perm():
+    bands, rows = lsh_parameters(0.7, 128)
+    assert bands * rows <= 128
+    # The S-curve rises around the threshold
+    assert 0.5 < (1 / bands) ** (1 / rows) < 0.9
+
+
+def test_relisting_is_found_and_unrelated_lot_is_not():
+    index = RelistingIndex()
+    assert index.add("sale/249/lot/1", DESCRIPTION) == []
+    assert index.add("sale/249/lot/2", OTHER) == []
+    similar = index.add("sale/250/lot/7", {"full_description": EDITED})
+    assert [lot_url for lot_url, _ in similar] == ["sale/249/lot/1"]
+    assert similar[0][1] >= 0.7
+    assert index.find_similar(OTHER) == [("sale/249/lot/2", 1.0)]
+    assert index.find_similar(Lot("sale/249/lot/2", full_description=OTHER)) == []
+
+
+def test_lots_without_a_description_are_not_indexed():
+    index = RelistingIndex()
+    assert index.add("sale/249/lot/1", {"title": "Gibson Les Paul"}) == []
+    assert index.add("sale/249/lot/2", None) == []
+    assert len(index) == 0
+
+
+def test_reopened_index_finds_earlier_lots(tmp_path):
+    path = tmp_path / "relistings.jsonl"
+    with RelistingIndex(path) as index:
+        index.add_many([["sale/249/lot/1", DESCRIPTION], ["sale/249/lot/2", OTHER]])
+    with RelistingIndex(path, threshold=0.6) as index:
+        assert len(index) == 2
+        assert "sale/249/lot/1" in index
+        assert index.add("sale/249/lot/1", DESCRIPTION) == []
+        assert [lot_url for lot_url, _ in index.add("sale/250/lot/7", EDITED)] == ["sale/249/lot/1"]
+    with RelistingIndex(path) as index:
+        assert len(index) == 3
+
+
+def test_reopening_with_other_parameters_raises(tmp_path):
+    path = tmp_path / "relistings.jsonl"
+    RelistingIndex(path).close()
+    with pytest.raises(ValueError):
+        RelistingIndex(path, num_perm=64)
+
+
+def test_truncated_last_record_is_dropped(tmp_path):
+    path = tmp_path / "relistings.jsonl"
+    with RelistingIndex(path) as index:
+        index.add("sale/249/lot/1", DESCRIPTION)
+    complete = path.read_bytes()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"lot_url": "sale/249/lot/2", "signa')
+    with RelistingIndex(path) as index:
+        assert len(index) == 1
+        assert path.read_bytes() == complete
+        index.add("sale/249/lot/2", OTHER)
+    with RelistingIndex(path) as index:
+        assert len(index) == 2
+
+
+def test_last_record_without_its_newline_is_dropped(tmp_path):
+    path = tmp_path / "relistings.jsonl"
+    with RelistingIndex(path) as index:
+        index.add("sale/249/lot/1", DESCRIPTION)
+    complete = path.read_bytes()
+    with RelistingIndex(path) as index:
+        index.add("sale/249/lot/2", OTHER)
+    # Valid JSON, but the crash came before the newline
+    path.write_bytes(path.read_bytes()[:-1])
+    with RelistingIndex(path) as index:
+        assert len(index) == 1
+        assert "sale/249/lot/2" not in index
+        assert path.read_bytes() == complete
+
+
+def test_truncated_header_is_written_again(tmp_path):
+    path = tmp_path / "relistings.jsonl"
+    RelistingIndex(path).close()
+    path.write_bytes(path.read_bytes()[:-1])
+    with RelistingIndex(path) as index:
+        index.add("sale/249/lot/1", DESCRIPTION)
+    with RelistingIndex(path) as index:
+        assert len(index) == 1
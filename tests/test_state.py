@@ -0,0 +1,57 @@
+from sqlalchemy import select
+
+from src.scraping.db import LotState, get_engine
+from src.scraping.state import LotStateStore, content_hash
+
+LOT = {"description": "1959 Gibson Les Paul Standard", "estimate": "£100,000 - £150,000"}
+
+
+def test_rows_are_written_on_flush(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    lot_hash = content_hash(LOT)
+    with LotStateStore(engine) as state:
+        state.record_fetch("lot/1", lot_hash)
+        state.record_fetch("lot/2", lot_hash)
+        state.record_enrichment("lot/1", lot_hash)
+        assert state.pending() == 3
+        assert not state.needs_enrichment("lot/1", lot_hash)
+        with engine.connect() as conn:
+            assert conn.execute(select(LotState)).all() == []
+    with engine.connect() as conn:
+        rows = {row.lot_url: row for row in conn.execute(select(LotState))}
+    assert rows["lot/1"].enriched_hash == lot_hash
+    assert rows["lot/2"].enriched_hash is None
+
+    reopened = LotStateStore(engine)
+    assert not reopened.needs_enrichment("lot/1", lot_hash)
+    assert reopened.needs_enrichment("lot/2", lot_hash)
+    assert reopened.needs_enrichment("lot/1", content_hash(LOT | {"estimate": "£1"}))
+
+
+def test_refetching_before_a_flush_keeps_the_latest_row(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    state = LotStateStore(engine)
+    state.record_fetch("lot/1", "a" * 64)
+    state.record_fetch("lot/1", "b" * 64)
+    assert state.pending() == 1
+    state.flush()
+    assert state.pending() == 0
+    with engine.connect() as conn:
+        assert conn.execute(select(LotState.content_hash)).scalar_one() == "b" * 64
+
+
+def test_lookups_after_load_do_not_query(tmp_path, monkeypatch):
+    engine = get_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    lot_hash = content_hash(LOT)
+    with LotStateStore(engine) as state:
+        state.record_enrichment("lot/1", lot_hash)
+    state = LotStateStore(engine)
+    state.load()
+
+    def connect():
+        raise AssertionError("queried the database")
+
+    monkeypatch.setattr(engine, "connect", connect)
+    assert not state.needs_enrichment("lot/1", lot_hash)
+    state.record_fetch("lot/2", lot_hash)
+    assert state.needs_enrichment("lot/2", lot_hash)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from src.scraping.titles import Gazetteer, TitleParser, guitar_type
+
+
+class FakeLLM():
+    def __init__(self, answer: dict):
+        self.answer = answer
+        self.titles: list[str] = []
+
+    async def parse_title_with_llm(self, title: str) -> dict:
+        self.titles.append(title)
+        return self.answer
+
+
+def test_guitar_type_rules():
+    assert guitar_type(["semi", "hollow", "body", "bass"]) == "hollow body electric"
+    assert guitar_type(["electric", "bass", "guitar"]) == "bass"
+    assert guitar_type(["ukulele"]) is None
+
+
+def test_known_model_is_parsed_locally():
+    parser = TitleParser(Gazetteer({"Gibson": {"Les Paul", "Les Paul Standard"}}))
+    fields, confidence = parser.parse_local("Gibson Les Paul Standard electric guitar, made in USA")
+    assert fields == {"brand": "Gibson", "model": "Les Paul Standard", "type": "electric"}
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize("title", [
+    "Gibson EB-5 five string bass guitar",
+    "Fender Custom Shop 1956 Relic Stratocaster electric guitar",
+    "Lowden F22 acoustic guitar, made in Ireland",
+    "Unknown Maker electric guitar",
+])
+def test_titles_without_a_known_model_go_to_the_llm(title):
+    parser = TitleParser(Gazetteer())
+    _, confidence = parser.parse_local(title)
+    assert confidence < parser.threshold
+
+
+def test_llm_answers_are_learned(tmp_path):
+    path = tmp_path / "gazetteer.json"
+    llm = FakeLLM({"brand": "Gibson", "model": "EB-5", "type": "bass"})
+    parser = TitleParser(Gazetteer.load(str(path)), llm=llm, save_every=1)
+    title = "Gibson EB-5 five string bass guitar"
+    assert asyncio.run(parser.parse(title)) == llm.answer
+    assert asyncio.run(parser.parse(title)) == {"brand": "Gibson", "model": "EB-5", "type": "bass"}
+    assert llm.titles == [title]
+    assert parser.stats()["local_hits"] == 1
+    assert "EB-5" in json.loads(path.read_text())["brands"]["Gibson"]
+
+
+def test_llm_models_not_in_the_title_are_not_learned():
+    parser = TitleParser(Gazetteer(), llm=FakeLLM({"brand": "Gibson", "model": "Les Paul", "type": "electric"}))
+    asyncio.run(parser.parse("Gibson LP electric guitar"))
+    assert parser.gazetteer.brands["Gibson"] == set()
+
+
+def test_failed_llm_calls_fall_back_to_the_local_guess():
+    parser = TitleParser(Gazetteer(), llm=FakeLLM({}))
+    fields = asyncio.run(parser.parse("Fender Jazzmaster electric guitar"))
+    assert fields == {"brand": "Fender", "model": "Jazzmaster", "type": "electric"}
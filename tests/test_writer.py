@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import func, select
+
+from src.scraping.db import Lot, LotSimilarity, get_engine
+from src.scraping.writer import LotWriter
+
+ENTRY = {
+    "title": "Gibson Les Paul",
+    "description": "1959 Gibson Les Paul Standard",
+    "estimate": "£100,000 - £150,000",
+    "similar_lots": [["lot/0", 0.9]],
+}
+
+
+def test_write_starts_the_thread_and_close_flushes(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'lots.db'}")
+    writer = LotWriter(engine, batch_size=2, max_queue_size=1)
+    for number in range(5):
+        writer.write(f"lot/{number + 1}", ENTRY)
+    writer.close()
+    assert writer.rows_written == 5
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Lot)).scalar_one() == 5
+        assert conn.execute(select(func.count()).select_from(LotSimilarity)).scalar_one() == 5
+
+
+def test_failed_batches_are_retried_then_raised(tmp_path, monkeypatch):
+    engine = get_engine(f"sqlite:///{tmp_path / 'lots.db'}")
+    writer = LotWriter(engine, max_queue_size=1, max_retries=1, backoff_base=0)
+    attempts = []
+
+    def begin():
+        attempts.append(1)
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(writer, "engine", type("Engine", (), {"begin": staticmethod(begin)}))
+    with pytest.raises(RuntimeError):
+        with writer:
+            for number in range(10):
+                writer.write(f"lot/{number}", ENTRY)
+    assert len(attempts) == 2
+    assert writer.failed_batches == 2
+    assert writer.rows_written == 0